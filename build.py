@@ -34,6 +34,7 @@ import time
 import sys
 import argparse
 import multiprocessing
+from shutil import which
 from hbuild.scheduler import BuildScheduler
 from hbuild.cvs import *
 from hbuild.builders.helenos import *
@@ -44,6 +45,8 @@ from hbuild.checkers.sycek import SycekBuildTask, SycekCheckTask
 from hbuild.web import *
 from hbuild.output import ConsolePrinter
 from hbuild.toolchain import check_tool, check_package
+from hbuild.jobserver import JobServer
+from hbuild.reuse import *
 
 REQUIRED_TOOLS = [
     'convert',
@@ -70,7 +73,7 @@ def create_checkout_task(name, url):
     if url.startswith("wip://"):
         return RsyncCheckoutTask(name, url[6:])
     else:
-        return GitCheckoutTask(name, url)
+        return GitCheckoutTask(name, url, config.git_mirror_dir)
 
 # Command-line options
 args = argparse.ArgumentParser(description='HelenOS integration build')
@@ -119,15 +122,23 @@ args.add_argument('--vm-memory-size', default=256, dest='vm_memory_size',
     metavar='RAM_SIZE_IN_MB',
     help='How much memory to give the virtual machine running the tests.'
 )
+args.add_argument('--tests-serial-console', default=False, dest='tests_serial_console',
+    action='store_true',
+    help='Read the console of QEMU tests from the serial port instead of screenshots.'
+)
 args.add_argument('--inline-log-lines', default=10, dest='inline_log_lines',
     type=int,
     metavar='LINES',
     help='How many lines of log to show on the web page.'
 )
 args.add_argument('--archive-format', default='tar.xz', dest='archive_format',
-    choices=['tar.xz', 'tar.gz'],
+    choices=['tar.xz', 'tar.gz', 'tar.zst'],
     metavar='FORMAT',
-    help='Format of the archives (tar.gz or tar.xz).'
+    help='Format of the archives (tar.gz, tar.xz or tar.zst).'
+)
+args.add_argument('--archive-benchmark', default=False, dest='archive_benchmark',
+    action='store_true',
+    help='Measure size and (de)compression time of harbour archives in all formats.'
 )
 args.add_argument('--no-source-browser', default=True, dest='code_browser',
     action='store_false',
@@ -150,6 +161,76 @@ args.add_argument('--jobs', default=multiprocessing.cpu_count(), dest='jobs',
     metavar='COUNT',
     help='Number of concurrent jobs.'
 )
+args.add_argument('--jobserver', default='auto', dest='jobserver',
+    choices=['auto', 'fifo', 'pipe', 'none'],
+    help='Jobserver shared by all make/ninja invocations (fifo needs make 4.4 or ninja 1.13, auto uses fifo when available).'
+)
+args.add_argument('--resource', default=[], dest='resources',
+    action='append',
+    metavar='NAME=AMOUNT',
+    help='Capacity of a resource pool (e.g. qemu-kvm=4 to allow 4 VMs at once or ram_mb=16384 to limit memory of concurrently running VMs).'
+)
+args.add_argument('--task-cache', default=None, dest='task_cache',
+    metavar='DIR',
+    help='Directory with cached results of tasks (tasks whose inputs did not change are not run again).'
+)
+args.add_argument('--task-cache-url', default=None, dest='task_cache_url',
+    metavar='URL',
+    help='Shared task cache served over HTTP (see cache-server.py) consulted when an entry is missing from --task-cache.'
+)
+args.add_argument('--task-cache-size', default=None, dest='task_cache_size',
+    metavar='SIZE',
+    help='Maximum size of --task-cache (e.g. 50G, same syntax as CCACHE_MAXSIZE), least recently used entries are removed.'
+)
+args.add_argument('--task-cache-connections', default=4, dest='task_cache_connections',
+    type=int,
+    metavar='COUNT',
+    help='How many concurrent connections to the shared task cache to use.'
+)
+args.add_argument('--workspace-method', default='auto', dest='workspace_method',
+    choices=['auto', 'reflink', 'hardlink', 'worktree', 'rsync'],
+    help='How to create private copies of the HelenOS sources for each build (auto tries them in this order, rsync is always used as the last resort).'
+)
+args.add_argument('--out-of-tree', default=False, dest='out_of_tree',
+    action='store_true',
+    help='Configure all HelenOS builds against the single checkout instead of copying the sources for each profile.'
+)
+args.add_argument('--artefact-store', default=None, dest='artefact_store',
+    metavar='DIR',
+    help='Publish downloadable files through content-addressed store shared by all builds (hard-linked into the artefact directory, use artefact-gc.py to remove unused ones).'
+)
+args.add_argument('--git-mirror-dir', default=None, dest='git_mirror_dir',
+    metavar='DIR',
+    help='Keep persistent bare mirrors of Git repositories here (only new commits are fetched, works offline too).'
+)
+args.add_argument('--harbour-metadata-cache', default=None, dest='harbour_metadata_cache',
+    metavar='FILE',
+    help='Keep metadata of evaluated HARBOUR files in this file across runs (only changed files are evaluated again).'
+)
+args.add_argument('--previous-report', default=None, dest='previous_report',
+    metavar='REPORT.xml',
+    help='Report of the previous build (to detect that nothing changed since, see --if-unchanged).'
+)
+args.add_argument('--if-unchanged', default='build', dest='if_unchanged',
+    choices=['build', 'exit', 'reuse'],
+    help='What to do when repository revisions and configuration are the same as in --previous-report: build anyway, exit (with exit code 3) or reuse the previous results.'
+)
+args.add_argument('--compiler-cache', default=None, dest='compiler_cache',
+    metavar='DIR',
+    help='Directory of ccache shared by all builds (ccache must be installed).'
+)
+args.add_argument('--compiler-cache-size', default='20G', dest='compiler_cache_size',
+    metavar='SIZE',
+    help='Maximum size of the compiler cache (least recently used entries are evicted).'
+)
+args.add_argument('--incremental', default=False, dest='incremental',
+    action='store_true',
+    help='Keep HelenOS build trees from the previous run in the build directory and rebuild only what changed.'
+)
+args.add_argument('--task-durations', default=None, dest='task_durations',
+    metavar='FILENAME.json',
+    help='Where to load and store durations of tasks (used to prioritize tasks on the critical path).'
+)
 args.add_argument('--no-colors', default=False, dest='no_colors',
     action='store_true',
     help='Disable colorful output'
@@ -175,10 +256,61 @@ if config.tool_check:
     except NotImplementedError:
         sys.exit(1)
 
+resources = {}
+for res in config.resources:
+    try:
+        ( name, amount ) = res.split('=', 1)
+        resources[name] = int(amount)
+    except ValueError:
+        args.error("invalid resource specification `{}'".format(res))
+
+if config.jobserver == 'auto':
+    config.jobserver = JobServer.detect_style()
+elif config.jobserver == 'none':
+    config.jobserver = None
+
+if (not config.task_cache_url is None) and (config.task_cache is None):
+    args.error("--task-cache-url requires --task-cache")
+
+if (not config.compiler_cache is None) and (which('ccache') is None):
+    args.error("--compiler-cache requires ccache")
+if (config.archive_format == 'tar.zst') and (which('zstd') is None):
+    args.error("--archive-format=tar.zst requires zstd")
+
+if config.incremental and config.out_of_tree:
+    args.error("--incremental cannot be combined with --out-of-tree")
+
+if config.workspace_method == 'auto':
+    config.workspace_method = None
+elif config.workspace_method == 'rsync':
+    config.workspace_method = [ 'rsync' ]
+else:
+    config.workspace_method = [ config.workspace_method, 'rsync' ]
+
 if config.vm_memory_size < 8:
     printer.print_warning("VM memory size too small, upgrading to 8MB.")
     config.vm_memory_size = 8
 
+#
+# Check whether anything changed since the previous build
+config_fingerprint = compute_config_fingerprint(config, config.self_path)
+reuse_previous = False
+if (not config.previous_report is None) and (config.if_unchanged != 'build'):
+    printer.print_starting("Checking for changes since the previous build ...")
+    previous = read_build_identity(config.previous_report)
+    revisions = {
+        'helenos': resolve_git_head(config.helenos_repository, config.git_mirror_dir),
+        'coastline': resolve_git_head(config.coastline_repository, config.git_mirror_dir),
+    }
+    if is_same_build(previous, revisions, config_fingerprint):
+        if config.if_unchanged == 'exit':
+            printer.print_ok("Nothing changed since build {}, exiting.".format(previous['number']))
+            sys.exit(EXIT_UNCHANGED)
+        printer.print_ok("Nothing changed since build {}, reusing its results.".format(previous['number']))
+        reuse_previous = True
+    else:
+        printer.print_ok("Changes found, building.")
+
 scheduler = BuildScheduler(
     max_workers=config.jobs,
     build=config.build_directory,
@@ -186,8 +318,32 @@ scheduler = BuildScheduler(
     build_id=config.build_id,
     printer=printer,
     inline_log_lines=config.inline_log_lines,
-    debug=config.debug
+    debug=config.debug,
+    task_durations=config.task_durations,
+    resources=resources,
+    jobserver=config.jobserver,
+    task_cache=config.task_cache,
+    task_cache_url=config.task_cache_url,
+    task_cache_connections=config.task_cache_connections,
+    task_cache_size=config.task_cache_size,
+    workspace_methods=config.workspace_method,
+    artefact_store=config.artefact_store,
+    compiler_cache=config.compiler_cache,
+    compiler_cache_size=config.compiler_cache_size
 )
+scheduler.add_build_info('config-fingerprint', config_fingerprint)
+
+if reuse_previous:
+    scheduler.submit("Reusing results of the previous build",
+        "reuse-previous",
+        ReusePreviousBuildTask(scheduler, config.previous_report))
+    scheduler.barrier()
+    scheduler.close_report()
+    scheduler.submit("Generate HTML report",
+        "html-report",
+        MakeHtmlReportTask(config.self_path, config.rss_url, config.web_resource_path))
+    scheduler.done()
+    sys.exit(0)
 
 #
 # Check-out both HelenOS and coastline repositories
@@ -217,7 +373,7 @@ if config.doxygen:
 if config.style_check:
     scheduler.submit("Build Sycek C style checker",
         "sycek-build",
-        SycekBuildTask(),
+        SycekBuildTask(config.git_mirror_dir),
         [])
 
     scheduler.submit("Check C style with Sycek",
@@ -236,7 +392,7 @@ scheduler.submit("Determininig available profiles",
 
 scheduler.submit("Schedule HelenOS builds",
     "helenos-build",
-    HelenOSScheduleBuildsTask(scheduler),
+    HelenOSScheduleBuildsTask(scheduler, config.out_of_tree, config.incremental),
     ["helenos-get-profiles"])
 
 
@@ -245,7 +401,7 @@ scheduler.submit("Schedule HelenOS builds",
 # for all HelenOS builds
 scheduler.submit("Determining available harbours",
     "coastline-get-harbours",
-     CoastlineGetHarboursTask(config.harbours.split(',')),
+     CoastlineGetHarboursTask(config.harbours.split(','), config.harbour_metadata_cache),
      ["coastline-checkout"])
 
 scheduler.submit("Schedule harbour tarballs fetches",
@@ -256,7 +412,7 @@ scheduler.submit("Schedule harbour tarballs fetches",
 
 scheduler.submit("Schedule Coastline builds",
     "coastline-build",
-    CoastlineScheduleBuildsTask(scheduler, config.archive_format),
+    CoastlineScheduleBuildsTask(scheduler, config.archive_format, config.archive_benchmark),
     [
         # Data dependencies
         "helenos-get-profiles", "coastline-get-harbours",
@@ -265,7 +421,7 @@ scheduler.submit("Schedule Coastline builds",
     ])
 
 
-extra_builds = HelenOSExtraBuildsManager(scheduler)
+extra_builds = HelenOSExtraBuildsManager(scheduler, config.incremental)
 
 #
 # Tests
@@ -279,7 +435,9 @@ scheduler.submit("Schedule tests",
     ScheduleTestsTask(scheduler,
         extra_builds,
         config.self_path,
-        [ "--memory={}".format(config.vm_memory_size) ]
+        [ "--memory={}".format(config.vm_memory_size) ],
+        { 'ram_mb': config.vm_memory_size },
+        config.tests_serial_console
     ),
     [
         "tests-get-list",
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import argparse
+
+from hbuild.cacheserver import CacheServer
+
+args = argparse.ArgumentParser(description='Shared task cache server for HelenOS integration builds')
+args.add_argument('--directory', default='cache-blobs', dest='directory',
+    metavar='DIR',
+    help='Where to store the cached blobs.'
+)
+args.add_argument('--address', default='', dest='address',
+    metavar='ADDRESS',
+    help='Address to listen on (all interfaces by default).'
+)
+args.add_argument('--port', default=8000, dest='port',
+    type=int,
+    metavar='PORT',
+    help='Port to listen on.'
+)
+args.add_argument('--verbose', default=False, dest='verbose',
+    action='store_true',
+    help='Log every request.'
+)
+
+config = args.parse_args()
+
+server = CacheServer(config.directory, (config.address, config.port), config.verbose)
+print("Serving task cache from {} at {}".format(server.directory, server.get_url()))
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    pass
+server.server_close()
@@ -58,19 +58,45 @@ CI_WEB_ROOT="$PWD/web-ci"
 CI_HISTORY_LENGTH=10
 CI_BUILD_DIR="$PWD/tmp-ci"
 CI_EXTRA_OPTS=""
+CI_TASK_DURATIONS="$PWD/task-durations.json"
+CI_GIT_MIRRORS="$PWD/git-mirrors"
+CI_HARBOUR_METADATA_CACHE="$PWD/harbour-metadata.json"
+# Compiler cache (used only when ccache is installed)
+CI_COMPILER_CACHE="$PWD/ccache"
+# Keep HelenOS build trees between runs and rebuild incrementally (yes/no)
+CI_KEEP_BUILD_TREES="no"
+# What to do when nothing changed since the last build (build, exit, reuse),
+# set to exit (or reuse) in ci.rc to avoid repeating identical builds
+CI_IF_UNCHANGED="build"
 
 # Load user configuration
 if [ -e "ci.rc" ]; then
     . ./ci.rc
 fi
 
+# Artefacts of all builds (must be on the same file system)
+[ -z "$CI_ARTEFACT_STORE" ] && CI_ARTEFACT_STORE="$CI_WEB_ROOT/.artefacts"
+
 
 #
 # Start the build
 #
 
 mkdir -p "$CI_BUILD_DIR"
-( cd "$CI_BUILD_DIR"; rm -rf * )
+if [ "$CI_KEEP_BUILD_TREES" = "yes" ]; then
+    # Remove everything except the HelenOS trees (build/<profile>/helenos
+    # and build/<profile>/extra-<harbours>)
+    (
+        cd "$CI_BUILD_DIR"
+        for i in *; do
+            [ "$i" = "build" ] || rm -rf "$i"
+        done
+        [ -d build ] && find build -mindepth 2 -maxdepth 2 ! -name helenos ! -name 'extra-*' -exec rm -rf {} +
+    )
+    CI_EXTRA_OPTS="--incremental $CI_EXTRA_OPTS"
+else
+    ( cd "$CI_BUILD_DIR"; rm -rf * )
+fi
 
 
 # Ensure we are the only ones running
@@ -102,13 +128,34 @@ fi
 WEB_DIR="$CI_WEB_ROOT/build-$BUILD_NUMBER"
 WEB_DIR_HIDDEN="$CI_WEB_ROOT/.build-$BUILD_NUMBER"
 
+PREVIOUS_REPORT_OPTS=""
+COMPILER_CACHE_OPTS=""
+if [ -n "$CI_COMPILER_CACHE" ] && which ccache >/dev/null 2>&1; then
+    COMPILER_CACHE_OPTS="--compiler-cache=$CI_COMPILER_CACHE"
+fi
+if [ -e "$CI_WEB_ROOT/latest/report.xml" ]; then
+    PREVIOUS_REPORT_OPTS="--previous-report=$CI_WEB_ROOT/latest/report.xml --if-unchanged=$CI_IF_UNCHANGED"
+fi
+
 $CI_HOME/build.py \
     "--build-id=$BUILD_NUMBER" \
     "--build-directory=$CI_BUILD_DIR" \
     "--artefact-directory=$WEB_DIR_HIDDEN" \
     "--rss-url=../rss.xml" \
     "--resource-path=../" \
+    "--task-durations=$CI_TASK_DURATIONS" \
+    "--artefact-store=$CI_ARTEFACT_STORE" \
+    "--git-mirror-dir=$CI_GIT_MIRRORS" \
+    "--harbour-metadata-cache=$CI_HARBOUR_METADATA_CACHE" \
+    $PREVIOUS_REPORT_OPTS \
+    $COMPILER_CACHE_OPTS \
     $CI_EXTRA_OPTS
+BUILD_EXIT_CODE=$?
+
+if [ "$BUILD_EXIT_CODE" -eq 3 ]; then
+    echo "Nothing changed since the last build, no new build created."
+    exit 0
+fi
 
 if ! [ -e "$WEB_DIR_HIDDEN/report.xml" ]; then
     echo "$WEB_DIR_HIDDEN/report.xml not found, aborting!" >&2
@@ -150,10 +197,12 @@ xsltproc \
     "$CI_HOME/hbuild/web/diff-rss.xsl" "$WEB_DIR/report.xml" \
     >"$CI_WEB_ROOT/diff-rss.xml"
 
-# Remove older builds
+# Remove older builds (their artefacts are only links to the store)
+# and artefacts no longer used by any build
 for i in `list_build_numbers "$CI_WEB_ROOT" | tail -n +$(( $CI_HISTORY_LENGTH + 1 ))`; do
     rm -rf "$CI_WEB_ROOT/build-$i"
 done
+$CI_HOME/artefact-gc.py "--store=$CI_ARTEFACT_STORE"
 
 # Keep latest/ pointing to the latest build
 (
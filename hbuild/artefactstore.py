@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Content-addressed store of published artefacts.
+
+Every published file is stored once as a read-only blob named after its
+SHA-256 digest and hard-linked (or reflinked when hard links are not
+possible) into the artefact directory of each build. The number of links
+is thus the reference count: blobs with a single link are referenced only
+by the store and are removed by collect_garbage().
+
+Publishing holds a shared lock on the store lock file, garbage collection
+an exclusive one so that it never sees a blob that is being linked.
+"""
+
+import fcntl
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+
+from hbuild.workspace import FICLONE
+
+def compute_file_digest(filename):
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        while True:
+            chunk = f.read(1024 * 1024)
+            if len(chunk) == 0:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+def clone_or_copy_file(src, dest):
+    """
+    Copy file, sharing the data via reflink when the file system allows it.
+    """
+    with open(src, 'rb') as fsrc:
+        with open(dest, 'wb') as fdest:
+            try:
+                fcntl.ioctl(fdest.fileno(), FICLONE, fsrc.fileno())
+                return
+            except OSError:
+                pass
+            shutil.copyfileobj(fsrc, fdest, 1024 * 1024)
+
+class ArtefactStore:
+    LOCK_FILENAME = '.lock'
+
+    # Temporary files younger than this (seconds) might belong to an add()
+    # in progress (add() alone does not take the lock), older ones were
+    # left behind by interrupted builds.
+    TEMP_FILE_GRACE_PERIOD = 24 * 60 * 60
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.published = 0
+        self.deduplicated = 0
+
+    def get_blob_path(self, digest):
+        return os.path.join(self.directory, digest[0:2], digest)
+
+    def add(self, filename):
+        """
+        Add file to the store, returns path to the blob.
+        """
+        digest = compute_file_digest(filename)
+        blob = self.get_blob_path(digest)
+        if os.path.exists(blob):
+            with self.lock:
+                self.deduplicated = self.deduplicated + 1
+            return blob
+
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        ( fd, tmp ) = tempfile.mkstemp(dir=os.path.dirname(blob), prefix='.add-')
+        os.close(fd)
+        try:
+            clone_or_copy_file(filename, tmp)
+            # Blobs are shared by all builds, nobody shall modify them
+            os.chmod(tmp, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(tmp, blob)
+            tmp = None
+        finally:
+            if not tmp is None:
+                os.remove(tmp)
+        return blob
+
+    def open_lock_file(self, operation):
+        lock = open(os.path.join(self.directory, ArtefactStore.LOCK_FILENAME), 'w')
+        fcntl.flock(lock, operation)
+        return lock
+
+    def publish(self, filename, target):
+        """
+        Place file at target path through the store.
+        """
+        with self.open_lock_file(fcntl.LOCK_SH):
+            blob = self.add(filename)
+            if os.path.lexists(target):
+                os.remove(target)
+            try:
+                os.link(blob, target)
+            except OSError:
+                # Different file system (or too many links)
+                clone_or_copy_file(blob, target)
+        with self.lock:
+            self.published = self.published + 1
+        return target
+
+    def collect_garbage(self, grace_period=TEMP_FILE_GRACE_PERIOD):
+        """
+        Remove blobs that are not linked from any build (and temporary
+        files older than grace_period seconds).
+        Returns number of removed blobs and bytes freed.
+        """
+        removed = 0
+        freed = 0
+        with self.open_lock_file(fcntl.LOCK_EX):
+            now = time.time()
+            for prefix in os.listdir(self.directory):
+                prefix_dir = os.path.join(self.directory, prefix)
+                if not os.path.isdir(prefix_dir):
+                    continue
+                for name in os.listdir(prefix_dir):
+                    path = os.path.join(prefix_dir, name)
+                    st = os.lstat(path)
+                    if name.startswith('.add-'):
+                        if now - st.st_mtime < grace_period:
+                            continue
+                    elif st.st_nlink != 1:
+                        continue
+                    os.remove(path)
+                    removed = removed + 1
+                    freed = freed + st.st_size
+        return ( removed, freed )
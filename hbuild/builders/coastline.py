@@ -29,56 +29,257 @@
 #
 
 import os
+import hashlib
+import json
+import multiprocessing
+import subprocess
+import time
+
+from collections import deque
+from shutil import which
 
 from hbuild.scheduler import Task, TaskException, RunCommandException
 
+# Compression level of tar.zst archives (compression is multithreaded,
+# the level is a compromise between the size and the time)
+ZSTD_LEVEL = 12
+
+# Compress and decompress commands for the supported archive formats
+# (both read stdin and write stdout).
+ARCHIVE_COMPRESSORS = {
+    'tar.gz': ( [ 'gzip', '-c' ], [ 'gzip', '-dc' ] ),
+    'tar.xz': ( [ 'xz', '-c' ], [ 'xz', '-dc' ] ),
+    'tar.zst': ( [ 'zstd', '-T0', '-{}'.format(ZSTD_LEVEL), '-qc' ], [ 'zstd', '-dqc' ] ),
+}
+
 def sorted_dir(root):
     list = os.listdir(root)
     list.sort()
     return list
 
+def get_hsct_format(archive_format):
+    """
+    Format of the archives created by hsct.sh (tar.zst archives are
+    recompressed from tar.gz as hsct.sh does not know zstd).
+    """
+    if archive_format == 'tar.zst':
+        return 'tar.gz'
+    return archive_format
+
+def run_pipeline(ctl, commands, input_filename, output_filename):
+    """
+    Run commands connected through pipes, reading input_filename and
+    writing the output of the last one to output_filename.
+    Returns the wall-clock duration in seconds.
+    """
+    ctl.append_line_to_log_file('{} < {} > {}'.format(
+        ' | '.join([ ' '.join(c) for c in commands ]), input_filename, output_filename))
+    start_time = time.time()
+    procs = []
+    with open(input_filename, 'rb') as inp, open(output_filename, 'wb') as out:
+        stdin = inp
+        for i, cmd in enumerate(commands):
+            stdout = out if i == len(commands) - 1 else subprocess.PIPE
+            proc = subprocess.Popen(cmd, stdin=stdin, stdout=stdout, stderr=subprocess.PIPE)
+            if not stdin is inp:
+                # Only the next command reads from the pipe
+                stdin.close()
+            stdin = proc.stdout
+            procs.append(proc)
+        for cmd, proc in zip(commands, procs):
+            errors = proc.stderr.read()
+            proc.wait()
+            if proc.returncode != 0:
+                raise RunCommandException(
+                    "`%s' failed: %s" % (' '.join(cmd), errors.decode('utf-8', 'replace').strip()),
+                    proc.returncode, [])
+    return time.time() - start_time
+
+def get_archive_format(filename):
+    """
+    Return archive format (key of ARCHIVE_COMPRESSORS) given by the file
+    name suffix.
+    """
+    name = os.path.basename(filename)
+    for fmt in ARCHIVE_COMPRESSORS:
+        if name.endswith('.' + fmt):
+            return fmt
+    raise TaskException('Unknown archive format of {}.'.format(filename))
+
+def recompress_archive(ctl, source_filename, target_filename):
+    """
+    Convert archive between formats (given by the file extensions).
+    """
+    source_format = get_archive_format(source_filename)
+    target_format = get_archive_format(target_filename)
+    return run_pipeline(ctl, [
+            ARCHIVE_COMPRESSORS[source_format][1],
+            ARCHIVE_COMPRESSORS[target_format][0]
+        ], source_filename, target_filename)
+
+# Prints one line per harbour: name, profiles and dependencies separated
+# by tabs (whitespace in the lists is collapsed the same way as with
+# plain echo). Every HARBOUR is evaluated in its own subshell, a broken
+# one yields no line.
+HARBOUR_METADATA_SCRIPT = '''
+for harbour in "$@"; do
+    (
+        shipprofiles=""
+        shiptugs=""
+        . "$HARBOURS_ROOT/$harbour/HARBOUR" >/dev/null 2>&1
+        printf '%s\\t%s\\t%s\\n' "$harbour" "$(echo $shipprofiles)" "$(echo $shiptugs)"
+    )
+done
+'''
+
+def compute_file_hash(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def topological_sort(dependencies):
+    """
+    Order items so that each comes after all its dependencies (dictionary
+    of item -> list of items it depends on). Items that become ready at
+    the same time are ordered by name.
+    Raises TaskException with the whole cycle when there is one.
+    """
+    dependents = {}
+    missing = {}
+    for item in dependencies:
+        dependents[item] = []
+    for item in dependencies:
+        unique = set(dependencies[item])
+        missing[item] = len(unique)
+        for d in unique:
+            dependents[d].append(item)
+
+    ready = deque(sorted([ i for i in dependencies if missing[i] == 0 ]))
+    order = []
+    while len(ready) > 0:
+        item = ready.popleft()
+        order.append(item)
+        unlocked = []
+        for d in dependents[item]:
+            missing[d] = missing[d] - 1
+            if missing[d] == 0:
+                unlocked.append(d)
+        ready.extend(sorted(unlocked))
+
+    if len(order) < len(dependencies):
+        cycle = find_cycle(dependencies, [ i for i in sorted(dependencies) if missing[i] > 0 ])
+        raise TaskException("Circular dependency found: {}".format(' -> '.join(cycle)))
+    return order
+
+def find_cycle(dependencies, unresolved):
+    """
+    Find a cycle among the unresolved items (each of them has at least
+    one unresolved dependency).
+    """
+    unresolved = set(unresolved)
+    path = []
+    position = {}
+    item = min(unresolved)
+    while not item in position:
+        position[item] = len(path)
+        path.append(item)
+        item = min([ d for d in dependencies[item] if d in unresolved ])
+    return path[position[item]:] + [ item ]
+
 class CoastlineGetHarboursTask(Task):
-    def __init__(self, harbour_filter):
+    def __init__(self, harbour_filter, metadata_cache=None):
+        """
+        metadata_cache is a (persistent) file with metadata of already
+        evaluated HARBOUR files, by default it is kept in the build
+        directory only.
+        """
         self.harbour_filter = harbour_filter
+        self.metadata_cache = metadata_cache
         Task.__init__(self, None)
 
-    def get_harbour_profiles(self, harbour_file):
-        try:
-            cmd = '. %s; echo $shipprofiles;' % harbour_file
-            res = self.ctl.run_command([ 'sh', '-c', cmd ], needs_output=True)
-            return res['stdout'].split()
-        except RunCommandException as e:
-            return []
+    def get_metadata_cache_filename(self):
+        if not self.metadata_cache is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.metadata_cache)), exist_ok=True)
+            return self.metadata_cache
+        return os.path.join(self.ctl.make_temp_dir('cache'), 'harbour-metadata.json')
 
-    def get_harbour_dependencies(self, harbour_file):
+    def load_metadata_cache(self):
         try:
-            cmd = '. %s; echo $shiptugs;' % harbour_file
-            res = self.ctl.run_command([ 'sh', '-c', cmd ], needs_output=True)
-            return res['stdout'].split()
-        except RunCommandException as e:
-            return []
+            with open(self.get_metadata_cache_filename()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_metadata_cache(self, cache):
+        filename = self.get_metadata_cache_filename()
+        # The file might be shared by concurrent runs
+        tmp_filename = '{}.tmp-{}'.format(filename, os.getpid())
+        with open(tmp_filename, 'w') as f:
+            json.dump(cache, f, indent=4, sort_keys=True)
+        os.replace(tmp_filename, filename)
+
+    def get_harbours_metadata(self, root, harbours):
+        """
+        Read profiles and dependencies of given harbours, evaluating all
+        (changed) HARBOUR files at once.
+        Returns dictionary harbour -> { 'profiles': [], 'dependencies': [] }.
+        """
+        cache = self.load_metadata_cache()
+        metadata = {}
+        digests = {}
+        to_evaluate = []
+        for h in harbours:
+            digests[h] = compute_file_hash(os.path.join(root, h, 'HARBOUR'))
+            entry = cache.get(h)
+            if (not entry is None) and (entry['digest'] == digests[h]):
+                metadata[h] = entry
+            else:
+                to_evaluate.append(h)
+        self.ctl.dprint("Harbour metadata cached for %d, evaluating %d", len(metadata), len(to_evaluate))
+
+        if len(to_evaluate) > 0:
+            cmd = 'HARBOURS_ROOT="$1"; shift;' + HARBOUR_METADATA_SCRIPT
+            try:
+                res = self.ctl.run_command([ 'sh', '-c', cmd, 'sh', root ] + to_evaluate, needs_output=True)
+                output = res['output']
+            except RunCommandException as e:
+                output = e.output
+            for line in output:
+                fields = line.split('\t')
+                if len(fields) != 3 or not fields[0] in digests:
+                    continue
+                metadata[fields[0]] = {
+                    'digest': digests[fields[0]],
+                    'profiles': fields[1].split(),
+                    'dependencies': fields[2].split(),
+                }
+            for h in to_evaluate:
+                if h in metadata:
+                    cache[h] = metadata[h]
+            self.save_metadata_cache(cache)
+
+        for h in harbours:
+            if not h in metadata:
+                metadata[h] = { 'profiles': [], 'dependencies': [] }
+        return metadata
 
     def run(self):
         root = self.ctl.get_dependency_data('dir')
         self.ctl.dprint("Looking into %s", root)
         harbours = []
-        profiles = {}
-        dependencies = {}
         for name in sorted_dir(root):
             path = os.path.join(root, name)
             canon = os.path.join(path, 'HARBOUR')
             if os.path.isdir(path) and os.path.exists(canon) and os.path.isfile(canon):
                 harbours.append(name)
-                dependencies[name] = self.get_harbour_dependencies(canon)
-                profiles[name] = self.get_harbour_profiles(canon)
 
-        # Clean-up the dependencies
+        metadata = self.get_harbours_metadata(root, harbours)
+        known = set(harbours)
+        profiles = {}
+        dependencies = {}
         for h in harbours:
-            deps = dependencies[h]
-            dependencies[h] = []
-            for d in deps:
-                if d in harbours:
-                    dependencies[h].append(d)
+            profiles[h] = metadata[h]['profiles']
+            # Clean-up the dependencies
+            dependencies[h] = [ d for d in metadata[h]['dependencies'] if d in known ]
 
         # Filter which harbours should be actually built
         if 'ALL' in self.harbour_filter:
@@ -101,25 +302,7 @@ class CoastlineGetHarboursTask(Task):
         self.ctl.dprint("harbours_to_build = %s", list(harbours_to_build.keys()))
 
         # Sort harbours in buildable order
-        build_order = []
-        remaining_dependencies = dependencies.copy()
-        while len(remaining_dependencies) > 0:
-            self.ctl.dprint("remaining = %s", remaining_dependencies)
-            leafs = []
-            for d in remaining_dependencies:
-                if len(remaining_dependencies[d]) == 0:
-                    if d in harbours_to_build:
-                        build_order.append(d)
-                    leafs.append(d)
-            # In every step we have to find (at least) one element to
-            # remove
-            if len(leafs) == 0:
-                raise TaskException("Circular dependency found!")
-            for l in leafs:
-                del remaining_dependencies[l]
-                for d in remaining_dependencies:
-                    remaining_dependencies[d] = [x for x in remaining_dependencies[d] if x != l]
-
+        build_order = [ h for h in topological_sort(dependencies) if h in harbours_to_build ]
 
         self.ctl.dprint("harbours = %s", build_order)
         self.ctl.dprint("deps = %s" , dependencies)
@@ -129,7 +312,8 @@ class CoastlineGetHarboursTask(Task):
             'harbours': build_order,
             'harbour_deps': dependencies,
             'harbour_profiles' : profiles,
-            'coastline_root': root
+            'coastline_root': root,
+            'coastline_revision': self.ctl.get_dependency_data('revision')
         }
 
 class CoastlineFetchTask(Task):
@@ -176,10 +360,11 @@ class CoastlinePrebuildTask(Task):
         root = self.ctl.make_temp_dir('repo/coastline')
 
         my_dir = self.ctl.make_temp_dir('build/%s/coast' % self.build_dir_basename)
-        hsrootdir = self.ctl.make_temp_dir('build/%s/helenos' % self.build_dir_basename)
+        # HelenOS tree with the build/ directory of this profile
+        hsrootdir = self.ctl.get_dependency_data('dir')
         self.ctl.run_command([ root + '/hsct.sh', 'init', hsrootdir, self.profile ], cwd=my_dir)
         with open('%s/config.sh' % my_dir, 'a') as cfg:
-            cfg.write("HSCT_FORMAT=\"%s\"\n" % self.archive_format)
+            cfg.write("HSCT_FORMAT=\"%s\"\n" % get_hsct_format(self.archive_format))
             cfg.write("HSCT_SOURCES_DIR=\"%s\"\n" % self.ctl.make_temp_dir('mirror/sources'))
             cfg.write("HSCT_PARALLELISM=1\n")
 
@@ -188,21 +373,59 @@ class CoastlinePrebuildTask(Task):
         }
 
 class CoastlineBuildTask(Task):
-    def __init__(self, harbour, profile, archive_format):
+    def __init__(self, harbour, profile, archive_format, revision=None):
         self.harbour = harbour
         self.profile = profile
         self.archive_format = archive_format
+        self.revision = revision
         Task.__init__(self, 'harbour-build', package=harbour, arch=profile)
 
+    def get_cache_key(self):
+        # HelenOS build and harbours we depend on are covered by keys
+        # of the dependencies.
+        if self.revision is None:
+            return None
+        return {
+            'revision': self.revision,
+            'harbour': self.harbour,
+            'profile': self.profile,
+            'format': self.archive_format,
+        }
+
+    def get_cache_outputs(self, data):
+        return [ data['harbour-{}'.format(self.harbour)] ]
+
+    def needs_cached_dependants(self):
+        # Only the archive is restored from the cache, harbours depending
+        # on this one need the (not cached) installed build in the coast
+        return True
+
+    def get_resources(self):
+        # We always build with HSCT_PARALLELISM=1
+        return {
+            'cpu': 1
+        }
+
+    def uses_jobserver(self, jobserver):
+        return jobserver.supports('make')
+
     def run(self):
         my_dir = self.ctl.get_dependency_data('dir')
 
         root = self.ctl.make_temp_dir('repo/coastline')
 
-        res = self.ctl.run_command([ root + '/hsct.sh', 'archive', self.harbour ], cwd=my_dir)
+        res = self.ctl.run_command([ root + '/hsct.sh', 'archive', self.harbour ], cwd=my_dir,
+            use_jobserver=True, use_compiler_cache='masquerade')
         if res['failed']:
             return False
 
+        hsct_format = get_hsct_format(self.archive_format)
+        if hsct_format != self.archive_format:
+            hsct_archive = '%s/archives/%s.%s' % ( my_dir, self.harbour, hsct_format )
+            recompress_archive(self.ctl, hsct_archive,
+                '%s/archives/%s.%s' % ( my_dir, self.harbour, self.archive_format ))
+            os.unlink(hsct_archive)
+
         # Add downloadable archive
         profile_flat = self.profile.replace("/", "-")
         title = "%s for %s" % ( self.harbour, self.profile )
@@ -215,10 +438,75 @@ class CoastlineBuildTask(Task):
         }
 
 
+class CoastlineArchiveBenchmarkTask(Task):
+    """
+    Measure size and (de)compression time of a harbour archive in all
+    supported formats.
+
+    The compression times are measured from the plain tarball. Formats
+    hsct.sh cannot create (tar.zst) are recompressed from its tar.gz
+    archive, their compression time is thus the overhead added to the
+    harbour build (together with the tar.gz decompression time).
+    """
+    def __init__(self, harbour, profile):
+        self.harbour = harbour
+        self.profile = profile
+        Task.__init__(self, 'archive-benchmark', package=harbour, arch=profile)
+
+    def get_resources(self):
+        # Some compressors are multithreaded, the timings would be
+        # skewed with other tasks running
+        return {
+            'cpu': multiprocessing.cpu_count()
+        }
+
+    def run(self):
+        archive = self.ctl.get_dependency_data('harbour-{}'.format(self.harbour))
+        archive_format = get_archive_format(archive)
+        my_dir = self.ctl.make_temp_dir('benchmark/%s/%s' % ( self.profile.replace('/', '-'), self.harbour ))
+
+        tarball = os.path.join(my_dir, 'archive.tar')
+        run_pipeline(self.ctl, [ ARCHIVE_COMPRESSORS[archive_format][1] ], archive, tarball)
+        tar_size = os.path.getsize(tarball)
+        self.report['attrs']['tar-size'] = tar_size
+
+        results = {}
+        for fmt in sorted(ARCHIVE_COMPRESSORS):
+            compress, decompress = ARCHIVE_COMPRESSORS[fmt]
+            if which(compress[0]) is None:
+                self.ctl.append_line_to_log_file('Skipping {}, {} not available.'.format(fmt, compress[0]))
+                continue
+            compressed = os.path.join(my_dir, 'archive.' + fmt)
+            compress_time = run_pipeline(self.ctl, [ compress ], tarball, compressed)
+            decompress_time = run_pipeline(self.ctl, [ decompress ], compressed, os.devnull)
+            size = os.path.getsize(compressed)
+            os.unlink(compressed)
+
+            short = fmt[len('tar.'):]
+            results[fmt] = {
+                'size': size,
+                'ratio': size / max(tar_size, 1),
+                'compress': compress_time,
+                'decompress': decompress_time,
+            }
+            self.report['attrs'][short + '-size'] = size
+            self.report['attrs'][short + '-ratio'] = '%.3f' % results[fmt]['ratio']
+            self.report['attrs'][short + '-compress'] = int(compress_time * 1000)
+            self.report['attrs'][short + '-decompress'] = int(decompress_time * 1000)
+            self.ctl.append_line_to_log_file('{}: {} bytes (ratio {:.3f}), compression {:.2f}s, decompression {:.2f}s.'.format(
+                fmt, size, results[fmt]['ratio'], compress_time, decompress_time))
+        os.unlink(tarball)
+
+        return {
+            'benchmark': results
+        }
+
+
 class CoastlineScheduleBuildsTask(Task):
-    def __init__(self, scheduler, archive_format):
+    def __init__(self, scheduler, archive_format, benchmark=False):
         self.scheduler = scheduler
         self.archive_format =archive_format
+        self.benchmark = benchmark
         Task.__init__(self, None)
 
     def run(self):
@@ -226,6 +514,7 @@ class CoastlineScheduleBuildsTask(Task):
         harbours = self.ctl.get_dependency_data('harbours')
         harbour_deps = self.ctl.get_dependency_data('harbour_deps')
         harbour_profiles = self.ctl.get_dependency_data('harbour_profiles')
+        revision = self.ctl.get_dependency_data('coastline_revision')
 
         ret = {}
 
@@ -255,9 +544,15 @@ class CoastlineScheduleBuildsTask(Task):
                     deps.append( "coastline-build-%s-for-%s" % (d, p_flat) )
                 self.scheduler.submit("Building %s for %s" % (h, p),
                     task_name,
-                    CoastlineBuildTask(h, p, self.archive_format),
+                    CoastlineBuildTask(h, p, self.archive_format, revision),
                     deps)
 
+                if self.benchmark:
+                    self.scheduler.submit("Benchmarking archive formats of %s for %s" % (h, p),
+                        "coastline-benchmark-%s-for-%s" % (h, p_flat),
+                        CoastlineArchiveBenchmarkTask(h, p),
+                        [ task_name ])
+
                 ret[p][h] = task_name
 
         return {
@@ -29,35 +29,187 @@
 #
 
 import os
+import hashlib
+import json
+import multiprocessing
+import shutil
 
 from hbuild.scheduler import Task
+from hbuild.toolchain import get_tool_version, get_cross_toolchain_fingerprint
+from hbuild.workspace import update_tree
+from hbuild.extraction import populate_overlay
 
 def sorted_dir(root):
     list = os.listdir(root)
     list.sort()
     return list
 
+def make_source_view(src_dir, view_dir):
+    """
+    Populate view_dir with symbolic links to top-level entries of src_dir
+    (except the build directory) so that it looks like a HelenOS source
+    tree with its own build/ subdirectory.
+    """
+    for name in os.listdir(view_dir):
+        path = os.path.join(view_dir, name)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    for name in sorted_dir(src_dir):
+        if name == 'build':
+            continue
+        os.symlink(os.path.join(src_dir, name), os.path.join(view_dir, name))
+
+# Identification of the configuration a kept build directory was
+# configured with
+INCREMENTAL_FINGERPRINT_FILENAME = '.hbuild-fingerprint'
+
+def get_incremental_fingerprint(ctl, profile, src_dir):
+    """
+    Digest of everything that requires a clean build when changed:
+    profile configuration (as found in the new sources), configure
+    script and the tools.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps({
+        'profile': profile,
+        'meson': get_tool_version('meson'),
+        'ninja': get_tool_version('ninja'),
+        'toolchain': get_cross_toolchain_fingerprint(),
+        # Compilers are called via the ccache masquerade directory
+        'compiler-cache': not ctl.compiler_cache is None,
+    }, sort_keys=True).encode('utf-8'))
+    config_files = [ 'configure.sh' ]
+    profile_dir = 'defaults'
+    for part in profile.split('/'):
+        profile_dir = os.path.join(profile_dir, part)
+        config_files.append(os.path.join(profile_dir, 'Makefile.config'))
+    for filename in config_files:
+        h.update(filename.encode('utf-8'))
+        try:
+            with open(os.path.join(src_dir, filename), 'rb') as f:
+                h.update(f.read())
+        except OSError:
+            pass
+    return h.hexdigest()
+
+def update_kept_tree(ctl, src_dir, my_dir, fingerprint):
+    """
+    Update tree kept from the previous run to the new sources, returns
+    False when the tree has to be rebuilt from scratch.
+    """
+    try:
+        with open(os.path.join(my_dir, 'build', INCREMENTAL_FINGERPRINT_FILENAME), 'r') as f:
+            previous = f.read().strip()
+    except OSError:
+        return False
+    if previous != fingerprint:
+        ctl.append_line_to_log_file('Configuration or tools changed, building from scratch.')
+        return False
+    updated = update_tree(src_dir, my_dir, [ 'build' ])
+    ctl.append_line_to_log_file('Incremental build: {} files updated.'.format(updated))
+    return True
+
+def write_incremental_fingerprint(build_dir, fingerprint):
+    with open(os.path.join(build_dir, INCREMENTAL_FINGERPRINT_FILENAME), 'w') as f:
+        f.write(fingerprint + '\n')
+
 class HelenOSBuildTask(Task):
-    def __init__(self, profile, build_dir_basename, src_dir, image_name):
+    """
+    Build HelenOS for a single profile.
+
+    By default, the sources are copied into build/<profile>/helenos and
+    configured in its build/ subdirectory. With out_of_tree, the profile
+    build directory (at the same place) is configured against the shared
+    checkout and the rest of build/<profile>/helenos are only symbolic
+    links to the checkout (tools such as hsct expect the build directory
+    inside the HelenOS tree).
+
+    With incremental, the tree (including the build directory) is kept
+    from the previous run: only changed sources are updated and ninja
+    rebuilds only what depends on them. The tree is recreated from scratch
+    when the profile configuration or the tools changed.
+
+    The returned data contain 'dir' (the HelenOS tree), 'source-dir' and
+    'build-dir'.
+    """
+
+    def __init__(self, profile, build_dir_basename, src_dir, image_name, revision=None, out_of_tree=False, incremental=False):
         self.profile = profile
         self.build_dir_basename = build_dir_basename
         self.src_dir = src_dir
         self.image = image_name
+        self.revision = revision
+        self.out_of_tree = out_of_tree
+        self.incremental = incremental
         Task.__init__(self, 'helenos-build', arch=profile)
 
+    def get_cache_key(self):
+        if self.revision is None:
+            return None
+        return {
+            'revision': self.revision,
+            'profile': self.profile,
+            'image': self.image,
+            'out-of-tree': self.out_of_tree,
+            'meson': get_tool_version('meson'),
+            'ninja': get_tool_version('ninja'),
+            'toolchain': get_cross_toolchain_fingerprint(),
+        }
+
+    def get_cache_outputs(self, data):
+        # The whole tree is needed for harbours and extra builds
+        return [ data['dir'] ]
+
+    def get_resources(self):
+        # Ninja runs as many jobs as there are CPUs
+        return {
+            'cpu': multiprocessing.cpu_count()
+        }
+
+    def uses_jobserver(self, jobserver):
+        return jobserver.supports('ninja')
+
+    def get_incremental_fingerprint(self):
+        return get_incremental_fingerprint(self.ctl, self.profile, self.src_dir)
+
+    def update_incrementally(self, my_dir, fingerprint):
+        if not update_kept_tree(self.ctl, self.src_dir, my_dir, fingerprint):
+            return False
+        self.report['attrs']['incremental'] = 'yes'
+        return True
+
     def run(self):
         my_dir = self.ctl.make_temp_dir('build/%s/helenos' % self.build_dir_basename)
-        self.ctl.recursive_copy(self.src_dir, my_dir)
-
         build_dir = my_dir + '/build'
 
-        self.ctl.run_command([ 'mkdir', build_dir ], cwd=my_dir);
+        fingerprint = None
+        reuse_build_dir = False
+        if self.incremental:
+            fingerprint = self.get_incremental_fingerprint()
+            reuse_build_dir = self.update_incrementally(my_dir, fingerprint)
+
+        if reuse_build_dir:
+            source_dir = my_dir
+        elif self.out_of_tree:
+            source_dir = self.src_dir
+            make_source_view(source_dir, my_dir)
+        else:
+            source_dir = my_dir
+            self.ctl.make_workspace(self.src_dir, my_dir)
+
+        if not reuse_build_dir:
+            self.ctl.run_command([ 'mkdir', build_dir ], cwd=my_dir);
+
+            res = self.ctl.run_command([ 'sh', source_dir + '/configure.sh', self.profile ], cwd=build_dir, use_compiler_cache='masquerade');
+            if res['failed']:
+                return False
 
-        res = self.ctl.run_command([ 'sh', my_dir + '/configure.sh', self.profile ], cwd=build_dir);
-        if res['failed']:
-            return False
+            if not fingerprint is None:
+                write_incremental_fingerprint(build_dir, fingerprint)
 
-        res = self.ctl.run_command([ 'ninja' ], cwd=build_dir)
+        res = self.ctl.run_command([ 'ninja' ], cwd=build_dir, use_jobserver=True, use_compiler_cache='masquerade')
         if res['failed']:
             return False
 
@@ -69,6 +221,8 @@ class HelenOSBuildTask(Task):
             'image': None,
             'built-image': self.image,
             'dir': my_dir,
+            'source-dir': source_dir,
+            'build-dir': build_dir,
         }
 
         if not self.image is None:
@@ -81,34 +235,75 @@ class HelenOSBuildTask(Task):
         return ret
 
 class HelenOSBuildWithHarboursTask(Task):
-    def __init__(self, profile, harbours):
+    """
+    Build HelenOS image for a profile with harbours in the overlay.
+
+    Every variant has its own tree (with its own overlay) and build
+    directory at build/<profile>/extra-<harbours> so that variants of the
+    same profile can be built concurrently and the profile tree stays
+    untouched. The build directory is configured at its own (stable)
+    path as meson records absolute paths in the generated files. The
+    objects are reused through the compiler cache and, with incremental,
+    the tree is kept between runs (like the profile ones) so that ninja
+    rebuilds only what changed.
+    """
+    def __init__(self, profile, harbours, incremental=False):
         self.profile = profile
         self.harbours = harbours
+        self.incremental = incremental
         Task.__init__(self, 'helenos-extra-build', arch=profile, harbours=','.join(harbours))
 
-    def run(self):
-        my_dir = self.ctl.get_dependency_data('dir')
-        res = self.ctl.run_command([ 'rm', '-rf', os.path.join('uspace', 'overlay')], cwd=my_dir)
-        os.makedirs(os.path.join(my_dir, 'uspace', 'overlay'), exist_ok=True)
-        if res['failed']:
-            return False
+    def get_cache_key(self):
+        # The revisions are part of the keys of the dependencies, the image
+        # is restored as an artefact.
+        return {
+            'profile': self.profile,
+            'harbours': self.harbours,
+        }
 
+    def get_resources(self):
+        return {
+            'cpu': multiprocessing.cpu_count()
+        }
+
+    def uses_jobserver(self, jobserver):
+        return jobserver.supports('ninja')
+
+    def run(self):
+        checkout_dir = self.ctl.get_dependency_data('helenos-checkout', 'dir')
+        my_dir = self.ctl.make_temp_dir('build/{}/extra-{}'.format(
+            self.profile.replace('/', '-'), '-'.join(self.harbours)))
         build_dir = my_dir + '/build'
 
-        # Unpack the tarball
-        for h in self.harbours:
-            tarball = self.ctl.get_dependency_data('harbour-{}'.format(h))
-            if tarball.endswith('.tar.xz'):
-                command = [ 'tar', 'xJf', tarball ]
-            elif tarball.endswith('.tar.gz'):
-                command = [ 'tar', 'xzf', tarball ]
-            else:
-                return False
-            res = self.ctl.run_command(command, cwd=os.path.join(my_dir, 'uspace', 'overlay'))
+        fingerprint = None
+        reuse_build_dir = False
+        if self.incremental:
+            fingerprint = get_incremental_fingerprint(self.ctl, self.profile, checkout_dir)
+            reuse_build_dir = update_kept_tree(self.ctl, checkout_dir, my_dir, fingerprint)
+            if reuse_build_dir:
+                self.report['attrs']['incremental'] = 'yes'
+
+        if not reuse_build_dir:
+            self.ctl.make_workspace(checkout_dir, my_dir)
+            os.makedirs(build_dir)
+            res = self.ctl.run_command([ 'sh', my_dir + '/configure.sh', self.profile ], cwd=build_dir,
+                use_compiler_cache='masquerade')
             if res['failed']:
                 return False
+            if not fingerprint is None:
+                write_incremental_fingerprint(build_dir, fingerprint)
 
-        res = self.ctl.run_command([ 'ninja' ], cwd=build_dir)
+        # The overlay might be hard-linked with the checkout
+        res = self.ctl.run_command([ 'rm', '-rf', os.path.join('uspace', 'overlay')], cwd=my_dir)
+        if res['failed']:
+            return False
+
+        # Unpack the tarballs (each one is extracted only once per build,
+        # the variants share the extracted files through hard links)
+        tarballs = [ self.ctl.get_dependency_data('harbour-{}'.format(h)) for h in self.harbours ]
+        populate_overlay(self.ctl, tarballs, os.path.join(my_dir, 'uspace', 'overlay'))
+
+        res = self.ctl.run_command([ 'ninja' ], cwd=build_dir, use_jobserver=True, use_compiler_cache='masquerade')
         if res['failed']:
             return False
 
@@ -116,12 +311,13 @@ class HelenOSBuildWithHarboursTask(Task):
         if res['failed']:
             return False
 
+        image_name = self.ctl.get_dependency_data('built-image')
+
         ret = {
             'image': None,
             'dir': my_dir,
         }
 
-        image_name = self.ctl.get_dependency_data('built-image')
         if not image_name is None:
             profile_flat = self.profile.replace("/", "-")
             xxx, image_extension = os.path.splitext(image_name)
@@ -132,8 +328,9 @@ class HelenOSBuildWithHarboursTask(Task):
         return ret
 
 class HelenOSExtraBuildsManager:
-    def __init__(self, scheduler):
+    def __init__(self, scheduler, incremental=False):
         self.scheduler = scheduler
+        self.incremental = incremental
         self.already_scheduled = []
         self.helenos_tasks = {}
         self.coastline_tasks = {}
@@ -156,7 +353,7 @@ class HelenOSExtraBuildsManager:
         if not profile in self.coastline_tasks.keys():
             return None
 
-        deps = [ self.helenos_tasks[profile] ]
+        deps = [ 'helenos-checkout', self.helenos_tasks[profile] ]
         for h in harbours:
             if not h in self.coastline_tasks[profile].keys():
                 return None
@@ -167,9 +364,8 @@ class HelenOSExtraBuildsManager:
         self.scheduler.submit(
             "Special build of {} with {}".format(profile, ','.join(harbours)),
             key,
-            HelenOSBuildWithHarboursTask(profile, harbours),
-            deps,
-            [ 'extras-{}'.format(profile) ]
+            HelenOSBuildWithHarboursTask(profile, harbours, self.incremental),
+            deps
         )
 
         return key
@@ -232,24 +428,28 @@ class HelenOSGetProfilesTask(Task):
 
         return {
             'profiles': profiles_filtered,
-            'dir': self.ctl.get_dependency_data('dir')
+            'dir': self.ctl.get_dependency_data('dir'),
+            'revision': self.ctl.get_dependency_data('revision')
         }
 
 class HelenOSScheduleBuildsTask(Task):
-    def __init__(self, scheduler):
+    def __init__(self, scheduler, out_of_tree=False, incremental=False):
         self.scheduler = scheduler
+        self.out_of_tree = out_of_tree
+        self.incremental = incremental
         Task.__init__(self, None)
 
     def run(self):
         profiles = self.ctl.get_dependency_data('profiles')
         root_dir = self.ctl.get_dependency_data('dir')
+        revision = self.ctl.get_dependency_data('revision')
         tasks = {}
         for p in profiles:
             p_flat = p.replace("/", "-")
             task_name = "helenos-build-%s" % p_flat
             self.scheduler.submit("Building HelenOS for %s" % p,
                 task_name,
-                HelenOSBuildTask(p, p_flat, root_dir, profiles[p]))
+                HelenOSBuildTask(p, p_flat, root_dir, profiles[p], revision, self.out_of_tree, self.incremental))
             tasks[ p ] = task_name
         return {
             'helenos_tasks': tasks
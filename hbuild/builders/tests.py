@@ -80,12 +80,14 @@ class GetTestListTask(Task):
 
 
 class ScheduleTestsTask(Task):
-    def __init__(self, scheduler, extra_builds, base_path, extra_tester_options):
+    def __init__(self, scheduler, extra_builds, base_path, extra_tester_options, test_resources={}, serial_console=False):
         self.scheduler = scheduler
         self.testable_profiles = [ 'ia32', 'amd64', 'arm32/integratorcp', 'ppc32', 'mips32/msim' ]
         self.extra_builds = extra_builds
         self.base_path = base_path
         self.extra_tester_options = extra_tester_options
+        self.test_resources = test_resources
+        self.serial_console = serial_console
         Task.__init__(self, None)
 
     def run(self):
@@ -123,9 +125,11 @@ class ScheduleTestsTask(Task):
                 self.scheduler.submit("Testing {} on {}".format(scenario, profile),
                     'test-{}-{}'.format(profile.replace('/', '-'), scenario_flat),
                     TestRunTask(profile, scenario, scenario_filename,
-                        os.path.abspath(os.path.join(self.base_path, 'test-in-vm.py')), self.extra_tester_options),
+                        os.path.abspath(os.path.join(self.base_path, 'test-in-vm.py')), self.extra_tester_options,
+                        self.serial_console),
                     [ helenos_task ],
-                    [ 'qemu-kvm' ]
+                    [ 'qemu-kvm' ],
+                    self.test_resources
                 )
 
         return True
@@ -144,12 +148,14 @@ class ScheduleTestsTask(Task):
         return []
 
 class TestRunTask(Task):
-    def __init__(self, profile, scenario_name, scenario_full_filename, test_script_filename, extra_test_script_options):
+    def __init__(self, profile, scenario_name, scenario_full_filename, test_script_filename, extra_test_script_options, serial_console=False):
         self.profile = profile
         self.scenario_name = scenario_name
         self.scenario = scenario_full_filename
         self.tester = os.path.abspath(test_script_filename)
         self.tester_options = extra_test_script_options
+        # Read the console from the serial port (instead of screenshots)
+        self.serial_console = serial_console
         Task.__init__(self, 'test',
             arch=profile,
             scenario=scenario_name,
@@ -198,8 +204,11 @@ class TestRunTask(Task):
         for i in self.tester_options:
             command.append(i)
         if self.profile in ['ia32', 'amd64', 'arm32/integratorcp']:
-            command.append('--pass=-serial')
-            command.append('--pass=file:{}'.format(serial))
+            if self.serial_console:
+                command.append('--serial-console={}'.format(serial))
+            else:
+                command.append('--pass=-serial')
+                command.append('--pass=file:{}'.format(serial))
         if self.profile == 'mips32/msim':
             command.append('--vm-config={}'.format(os.path.join(my_dir, 'tools/conf/msim.conf')))
         command.append('--scenario')
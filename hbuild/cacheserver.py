@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Tiny HTTP server for the shared tier of the task cache.
+
+Blobs are stored as plain files named after their digest, clients use
+GET (and HEAD) to retrieve them and PUT to upload them. There is no
+authentication, the server is meant for trusted networks (or for testing).
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BLOB_NAME_RE = re.compile('^/([0-9a-f]{64})$')
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def _get_blob_filename(self):
+        match = BLOB_NAME_RE.match(self.path)
+        if match is None:
+            self.send_error(400, 'Invalid blob name')
+            return None
+        return os.path.join(self.server.directory, match.group(1))
+
+    def _send_blob(self, with_body):
+        filename = self._get_blob_filename()
+        if filename is None:
+            return
+        try:
+            f = open(filename, 'rb')
+        except OSError:
+            self.send_error(404, 'No such blob')
+            return
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(size))
+            self.end_headers()
+            if with_body:
+                shutil.copyfileobj(f, self.wfile, 1024 * 1024)
+
+    def do_HEAD(self):
+        self._send_blob(False)
+
+    def do_GET(self):
+        self._send_blob(True)
+
+    def do_PUT(self):
+        filename = self._get_blob_filename()
+        if filename is None:
+            return
+        try:
+            remaining = int(self.headers.get('Content-Length'))
+        except (TypeError, ValueError):
+            self.send_error(411, 'Length required')
+            return
+
+        ( fd, tmp_filename ) = tempfile.mkstemp(dir=self.server.directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while remaining > 0:
+                    chunk = self.rfile.read(min(remaining, 1024 * 1024))
+                    if len(chunk) == 0:
+                        break
+                    f.write(chunk)
+                    remaining = remaining - len(chunk)
+            if remaining > 0:
+                self.close_connection = True
+                return
+            os.replace(tmp_filename, filename)
+            tmp_filename = None
+        finally:
+            if tmp_filename is not None:
+                os.remove(tmp_filename)
+
+        self.send_response(201)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+class CacheServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, directory, address=('', 8000), verbose=False):
+        self.directory = os.path.abspath(directory)
+        self.verbose = verbose
+        os.makedirs(self.directory, exist_ok=True)
+        ThreadingHTTPServer.__init__(self, address, CacheRequestHandler)
+
+    def get_url(self):
+        ( host, port ) = self.server_address[0:2]
+        if host in [ '', '0.0.0.0' ]:
+            host = 'localhost'
+        return 'http://{}:{}/'.format(host, port)
+
+    def start_in_background(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
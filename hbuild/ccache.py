@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Compiler cache (ccache) shared by all builds and runs.
+
+The cross compilers are always called by their names (meson does not
+prefix compilers from a cross file with ccache, hsct.sh calls them
+directly): a directory with symbolic links named after the compilers and
+pointing to ccache (the masquerade directory) is prepended to $PATH.
+Meson records the resolved path of the compiler when configuring, thus
+the masquerade directory has to be in place for the whole build.
+
+The masquerade directory is private to the run (it lives in the build
+directory), only the cache itself is shared.
+
+Every task gets its own statistics log (CCACHE_STATSLOG) that is
+summarized into hit and miss counts.
+"""
+
+import os
+import shutil
+import threading
+
+# Names of compilers that are cached when called via the masquerade
+# directory.
+COMPILER_SUFFIXES = [ '-gcc', '-g++', '-cc', '-c++', '-clang', '-clang++' ]
+
+class CompilerCache:
+    def __init__(self, directory, base_directory, max_size='20G', ccache=None):
+        """
+        The base_directory is the build directory of this run, compiled
+        paths are relative to it and the masquerade directory is created
+        there.
+        """
+        self.directory = os.path.abspath(directory)
+        self.base_directory = os.path.abspath(base_directory)
+        self.max_size = max_size
+        if ccache is None:
+            ccache = shutil.which('ccache')
+        if ccache is None:
+            raise Exception('ccache not found.')
+        self.ccache = ccache
+        self.masquerade_dir = os.path.join(self.base_directory, 'ccache-masquerade')
+        self.lock = threading.Lock()
+        self.masquerade_ready = False
+        os.makedirs(self.directory, exist_ok=True)
+
+    def prepare_masquerade_(self):
+        with self.lock:
+            if self.masquerade_ready:
+                return
+            shutil.rmtree(self.masquerade_dir, True)
+            os.makedirs(self.masquerade_dir)
+            prefix = os.environ.get('CROSS_PREFIX', '/usr/local/cross')
+            bindir = os.path.join(prefix, 'bin')
+            try:
+                names = os.listdir(bindir)
+            except OSError:
+                names = []
+            for name in names:
+                if (not '-helenos' in name) or (not any([ name.endswith(s) for s in COMPILER_SUFFIXES ])):
+                    continue
+                os.symlink(self.ccache, os.path.join(self.masquerade_dir, name))
+            self.masquerade_ready = True
+
+    def get_environment(self, env=None, stats_log=None, masquerade=False):
+        """
+        Return (copy of) environment for commands using the cache.
+        """
+        if env is None:
+            env = os.environ
+        env = env.copy()
+        env['CCACHE_DIR'] = self.directory
+        env['CCACHE_MAXSIZE'] = self.max_size
+        # The sources are copied to (or configured at) different
+        # directories for each profile: use relative paths inside the
+        # build directory.
+        env['CCACHE_BASEDIR'] = self.base_directory
+        env['CCACHE_NOHASHDIR'] = '1'
+        if not stats_log is None:
+            env['CCACHE_STATSLOG'] = stats_log
+        if masquerade:
+            self.prepare_masquerade_()
+            env['PATH'] = self.masquerade_dir + os.pathsep + env.get('PATH', '')
+        return env
+
+def parse_stats_log(filename):
+    """
+    Return numbers of cache hits and misses recorded in the statistics log.
+    """
+    hits = 0
+    misses = 0
+    try:
+        with open(filename, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('#'):
+                    continue
+                if line.endswith('cache_hit'):
+                    hits = hits + 1
+                elif line == 'cache_miss':
+                    misses = misses + 1
+    except OSError:
+        pass
+    return ( hits, misses )
@@ -29,27 +29,34 @@
 #
 
 from hbuild.scheduler import Task, RunCommandException, TaskException
+from hbuild.cvs import git_clone_via_mirror
 import os
 import re
 
 class SycekBuildTask(Task):
-    def __init__(self):
+    def __init__(self, mirror_dir=None):
+        self.mirror_dir = mirror_dir
         Task.__init__(self, 'tool-build', tool='sycek')
 
     def run(self):
         my_dir = self.ctl.make_temp_dir('build/sycek')
+        url = 'https://github.com/jxsvoboda/sycek'
 
         # Clone sycek
-        res = self.ctl.run_command([
-                'git',
-                'clone',
-                '--quiet',
-                '--depth', '1',
-                'https://github.com/jxsvoboda/sycek',
-                my_dir
-            ])
-        if res['failed']:
-            return False
+        if not self.mirror_dir is None:
+            self.ctl.remove_silently_recursive(my_dir)
+            git_clone_via_mirror(self.ctl, url, my_dir, self.mirror_dir)
+        else:
+            res = self.ctl.run_command([
+                    'git',
+                    'clone',
+                    '--quiet',
+                    '--depth', '1',
+                    url,
+                    my_dir
+                ])
+            if res['failed']:
+                return False
 
         # Build sycek
         res = self.ctl.run_command([
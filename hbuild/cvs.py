@@ -28,11 +28,59 @@
 # THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #
 
-from hbuild.scheduler import Task
+import fcntl
+import hashlib
+import os
+import re
+
+from hbuild.scheduler import Task, RunCommandException
+
+def get_git_mirror_path(mirror_dir, url):
+    """
+    Path of the bare mirror of the given repository.
+    """
+    name = re.sub('[^A-Za-z0-9._-]', '_', url.rstrip('/').split('/')[-1])
+    if name.endswith('.git'):
+        name = name[:-4]
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[0:10]
+    return os.path.join(mirror_dir, '{}-{}.git'.format(name, digest))
+
+def git_clone_via_mirror(ctl, url, target_directory, mirror_dir):
+    """
+    Clone the repository through a persistent bare mirror.
+
+    The mirror is created on first use and fetched into on the subsequent
+    ones, the working tree is then cloned from the mirror with objects
+    hard-linked. When the fetch fails (e.g. no network), the existing
+    mirror is used as is.
+    """
+    os.makedirs(mirror_dir, exist_ok=True)
+    mirror = get_git_mirror_path(mirror_dir, url)
+
+    # Serialize access to the mirror (possibly even among several builds)
+    with open(mirror + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(mirror):
+            try:
+                ctl.run_command([ 'git', '--git-dir', mirror, 'remote', 'set-url', 'origin', url ])
+                ctl.run_command([ 'git', '--git-dir', mirror, 'fetch', '--quiet', '--prune', 'origin' ])
+            except RunCommandException as e:
+                ctl.append_line_to_log_file('Fetch into mirror failed, using it as is: {}'.format(e))
+        else:
+            tmp_mirror = mirror + '.tmp'
+            ctl.remove_silently_recursive(tmp_mirror)
+            ctl.run_command([ 'git', 'clone', '--quiet', '--mirror', url, tmp_mirror ])
+            os.rename(tmp_mirror, mirror)
+
+        ctl.run_command([ 'git', 'clone', '--quiet', '--local', mirror, target_directory ])
+
+    ctl.run_command([ 'git', 'remote', 'set-url', 'origin', url ], cwd=target_directory)
 
 class CvsCheckoutTask(Task):
     def __init__(self, **attrs):
         Task.__init__(self, 'checkout', **attrs)
+        # Set by do_checkout() when the revision is known
+        self.revision = None
 
     def do_checkout(self, target_directory):
         raise Exception('CvsCheckoutTask.do_checkout() cannot be called directly.')
@@ -43,7 +91,8 @@ class CvsCheckoutTask(Task):
         self.do_checkout(dname)
 
         return {
-            'dir': dname
+            'dir': dname,
+            'revision': self.revision
         }
 
 class BzrCheckoutTask(CvsCheckoutTask):
@@ -58,18 +107,24 @@ class BzrCheckoutTask(CvsCheckoutTask):
             raise Exception('Bazaar checkout of %s failed.' % self.url)
 
 class GitCheckoutTask(CvsCheckoutTask):
-    def __init__(self, name, url):
+    def __init__(self, name, url, mirror_dir=None):
         self.name = name
         self.url = url
+        self.mirror_dir = mirror_dir
         CvsCheckoutTask.__init__(self, repository=url, alias=name)
 
     def do_checkout(self, target_directory):
-        res = self.ctl.run_command(['git', 'clone', '--quiet', '--depth', '5', self.url, target_directory ])
+        if not self.mirror_dir is None:
+            git_clone_via_mirror(self.ctl, self.url, target_directory, self.mirror_dir)
+            res = { 'failed': False }
+        else:
+            res = self.ctl.run_command(['git', 'clone', '--quiet', '--depth', '5', self.url, target_directory ])
         if res['failed']:
             raise Exception('Git clone of %s failed.' % self.url)
         hash = self.ctl.run_command(['git', 'rev-parse', 'HEAD'], cwd=target_directory, needs_output=True)
         if not hash['failed']:
-            self.report['attrs']['revision'] = hash['stdout'].strip()
+            self.revision = hash['stdout'].strip()
+            self.report['attrs']['revision'] = self.revision
 
 class RsyncCheckoutTask(CvsCheckoutTask):
     def __init__(self, name, base):
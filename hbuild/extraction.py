@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Cache of extracted tarballs (of harbours).
+
+Tarballs are extracted once per build into a directory named after their
+digest and the extracted trees are hard-linked into the places where
+they are needed (e.g. uspace/overlay of each build with harbours).
+
+Extraction is streamed through tarfile, the decompression runs in a
+separate (multithreaded where possible) process.
+"""
+
+import os
+import shutil
+import subprocess
+import tarfile
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from shutil import which
+
+from hbuild.artefactstore import compute_file_digest
+from hbuild.scheduler import TaskException, RunCommandException
+
+# Guards _locks
+_locks_guard = threading.Lock()
+# Digest -> lock serializing extraction of the same tarball
+_locks = {}
+
+def get_decompress_command(tarball):
+    """
+    Return command printing the decompressed tarball to stdout (or None
+    when tarfile shall decompress it itself).
+    """
+    if tarball.endswith('.tar.xz'):
+        return [ 'xz', '-T0', '-dc', tarball ]
+    if tarball.endswith('.tar.zst'):
+        return [ 'zstd', '-T0', '-dcq', tarball ]
+    if tarball.endswith('.tar.gz'):
+        if not which('pigz') is None:
+            return [ 'pigz', '-dc', tarball ]
+        return None
+    raise TaskException("Unknown tarball format of `{}'.".format(tarball))
+
+def extract_tarball(tarball, dest_dir):
+    os.makedirs(dest_dir, exist_ok=True)
+    extra_args = {}
+    if hasattr(tarfile, 'tar_filter'):
+        extra_args['filter'] = 'tar'
+    command = get_decompress_command(tarball)
+    if command is None:
+        with tarfile.open(tarball, 'r|*') as tar:
+            tar.extractall(dest_dir, **extra_args)
+        return
+
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+        try:
+            with tarfile.open(fileobj=proc.stdout, mode='r|') as tar:
+                tar.extractall(dest_dir, **extra_args)
+        finally:
+            # Drain the rest (e.g. zero padding) so that the process ends
+            proc.stdout.read()
+            errors = proc.stderr.read()
+            proc.wait()
+    if proc.returncode != 0:
+        raise TaskException("`{}' failed: {}".format(' '.join(command), errors.decode('utf-8', 'replace').strip()))
+
+def get_extracted(ctl, tarball):
+    """
+    Return directory with the extracted tarball (extracting it when
+    not yet in the cache).
+    """
+    digest = compute_file_digest(tarball)
+    cache_dir = ctl.make_temp_dir('extracted')
+    entry = os.path.join(cache_dir, digest)
+
+    with _locks_guard:
+        if not digest in _locks:
+            _locks[digest] = threading.Lock()
+        lock = _locks[digest]
+
+    with lock:
+        if os.path.isdir(entry):
+            ctl.append_line_to_log_file('Using extracted {} ({}).'.format(tarball, digest))
+            return entry
+        ctl.append_line_to_log_file('Extracting {} ({}).'.format(tarball, digest))
+        tmp = entry + '.tmp'
+        shutil.rmtree(tmp, True)
+        try:
+            extract_tarball(tarball, tmp)
+            os.rename(tmp, entry)
+        finally:
+            shutil.rmtree(tmp, True)
+    return entry
+
+def populate_overlay(ctl, tarballs, overlay_dir):
+    """
+    Fill overlay_dir with the contents of the tarballs (later tarballs
+    overwrite files of the previous ones). The tarballs are extracted in
+    parallel, the trees are then hard-linked into the overlay.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, len(tarballs))) as executor:
+        extracted = list(executor.map(lambda t: get_extracted(ctl, t), tarballs))
+
+    os.makedirs(overlay_dir, exist_ok=True)
+    for tree in extracted:
+        try:
+            ctl.run_command([ 'cp', '-a', '--link', '--remove-destination', tree + '/.', overlay_dir ])
+        except RunCommandException:
+            # Probably a different file system
+            ctl.run_command([ 'cp', '-a', '--reflink=auto', '--remove-destination', tree + '/.', overlay_dir ])
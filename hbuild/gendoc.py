@@ -29,16 +29,26 @@
 #
 
 from hbuild.scheduler import Task
+from hbuild.toolchain import get_tool_version
 import os
 
 class BrowsableSourcesViaGnuGlobalTask(Task):
     def __init__(self):
         Task.__init__(self, 'browsable-sources-global')
 
+    def get_cache_key(self):
+        revision = self.ctl.get_dependency_data('revision')
+        if revision is None:
+            return None
+        return {
+            'revision': revision,
+            'global': get_tool_version('gtags'),
+        }
+
     def run(self):
         root_dir = self.ctl.get_dependency_data('dir')
         my_dir = self.ctl.make_temp_dir('build/browsable')
-        self.ctl.recursive_copy(root_dir, my_dir)
+        self.ctl.make_workspace(root_dir, my_dir)
 
         # For debugging, it is much better to generate the
         # documentation in a sub-directory to speed things-up
@@ -90,15 +100,27 @@ class DoxygenTask(Task):
     def __init__(self):
         Task.__init__(self, 'doxygen')
 
+    def get_cache_key(self):
+        revision = self.ctl.get_dependency_data('revision')
+        if revision is None:
+            return None
+        return {
+            'revision': revision,
+            'doxygen': get_tool_version('doxygen'),
+        }
+
+    def uses_jobserver(self, jobserver):
+        return jobserver.supports('make')
+
     def run(self):
         root_dir = self.ctl.get_dependency_data('dir')
         my_dir = self.ctl.make_temp_dir('build/doxygen')
-        self.ctl.recursive_copy(root_dir, my_dir)
+        self.ctl.make_workspace(root_dir, my_dir)
 
         res = self.ctl.run_command([
             'make',
             '-C', 'doxygen'
-        ], cwd=my_dir)
+        ], cwd=my_dir, use_jobserver=True)
 
         if res['failed']:
             return False
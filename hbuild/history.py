@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import json
+import os
+
+from threading import Lock
+
+# Rough estimates (in milliseconds) for tasks we have never seen before.
+# Keyed by the report tag of the task (i.e. the task type), None stands
+# for the internal (scheduling) tasks without any report.
+DEFAULT_DURATION_ESTIMATES = {
+    None: 1000,
+    'checkout': 60 * 1000,
+    'tool-build': 30 * 1000,
+    'sycek-style-check': 5 * 60 * 1000,
+    'browsable-sources-global': 10 * 60 * 1000,
+    'doxygen': 10 * 60 * 1000,
+    'helenos-build': 10 * 60 * 1000,
+    'helenos-extra-build': 3 * 60 * 1000,
+    'harbour-fetch': 30 * 1000,
+    'harbour-build': 5 * 60 * 1000,
+    'test': 2 * 60 * 1000,
+    'html-report': 10 * 1000,
+}
+
+UNKNOWN_TASK_TYPE_ESTIMATE = 60 * 1000
+
+class TaskDurationHistory:
+    """
+    Durations of tasks recorded in previous runs.
+
+    The history is stored as a JSON file with durations (in milliseconds)
+    both for individual task ids and for task types (report tags). Newly
+    recorded values are blended with the older ones to smooth out
+    occasional outliers.
+
+    Only real runs are recorded: tasks restored from the task cache finish
+    almost instantly and would pull the estimates towards zero.
+    """
+
+    def __init__(self, filename=None, smoothing=0.5):
+        self.filename = filename
+        self.smoothing = smoothing
+        self.tasks = {}
+        self.types = {}
+        self.lock = Lock()
+        if filename is not None:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.filename, 'r') as f:
+                content = json.load(f)
+            self.tasks = content.get('tasks', {})
+            self.types = content.get('types', {})
+        except (OSError, ValueError):
+            self.tasks = {}
+            self.types = {}
+
+    def save(self):
+        if self.filename is None:
+            return
+        with self.lock:
+            content = {
+                'tasks': self.tasks,
+                'types': self.types,
+            }
+        os.makedirs(os.path.dirname(os.path.abspath(self.filename)), exist_ok=True)
+        tmp_filename = self.filename + '.tmp'
+        with open(tmp_filename, 'w') as f:
+            json.dump(content, f, indent=1, sort_keys=True)
+        os.replace(tmp_filename, self.filename)
+
+    def _blend(self, old, new):
+        if old is None:
+            return new
+        return self.smoothing * old + (1 - self.smoothing) * new
+
+    def _type_key(self, task_type):
+        return '' if task_type is None else task_type
+
+    def estimate(self, task_id, task_type):
+        """
+        Expected duration (in ms) of given task.
+        """
+        with self.lock:
+            if task_id in self.tasks:
+                return self.tasks[task_id]
+            type_key = self._type_key(task_type)
+            if type_key in self.types:
+                return self.types[type_key]
+        return DEFAULT_DURATION_ESTIMATES.get(task_type, UNKNOWN_TASK_TYPE_ESTIMATE)
+
+    def record(self, task_id, task_type, duration):
+        with self.lock:
+            self.tasks[task_id] = self._blend(self.tasks.get(task_id), duration)
+            type_key = self._type_key(task_type)
+            self.types[type_key] = self._blend(self.types.get(type_key), duration)
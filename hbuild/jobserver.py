@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import os
+import stat
+
+from hbuild.toolchain import get_tool_version_tuple
+
+class JobServer:
+    """
+    GNU make compatible jobserver shared by all commands launched by the
+    scheduler.
+
+    The jobserver is a pipe (or a named FIFO) pre-filled with one byte for
+    each available job. A client reads a byte before starting an extra job
+    and writes it back when the job terminates. Every client also has one
+    implicit job for which it does not read any token: we take that token
+    on its behalf before launching it (see acquire()) so that the total
+    number of jobs across all clients is bounded by the number of tokens.
+
+    Make understands both styles (FIFO since 4.4), Ninja (since 1.13)
+    understands only the FIFO one.
+    """
+
+    STYLES = [ 'fifo', 'pipe' ]
+
+    # Oldest versions of the tools understanding given style
+    TOOL_SUPPORT = {
+        'make': { 'fifo': (4, 4), 'pipe': (3, 78) },
+        'ninja': { 'fifo': (1, 13) },
+    }
+
+    def __init__(self, directory, tokens, style='fifo'):
+        if not style in JobServer.STYLES:
+            raise ValueError("Unknown jobserver style {}.".format(style))
+        self.tokens = max(tokens, 1)
+        self.style = style
+        self.fifo_path = None
+
+        if style == 'fifo':
+            os.makedirs(directory, exist_ok=True)
+            self.fifo_path = os.path.abspath(os.path.join(directory, 'jobserver.fifo'))
+            try:
+                if not stat.S_ISFIFO(os.stat(self.fifo_path).st_mode):
+                    os.remove(self.fifo_path)
+                    os.mkfifo(self.fifo_path, 0o600)
+            except FileNotFoundError:
+                os.mkfifo(self.fifo_path, 0o600)
+            # Opening for both reading and writing does not block and
+            # keeps the FIFO alive regardless of the clients.
+            self.read_fd = os.open(self.fifo_path, os.O_RDWR)
+            self.write_fd = self.read_fd
+        else:
+            ( self.read_fd, self.write_fd ) = os.pipe()
+            os.set_inheritable(self.read_fd, True)
+            os.set_inheritable(self.write_fd, True)
+
+        os.write(self.write_fd, b'+' * self.tokens)
+
+    @staticmethod
+    def is_supported_by(tool, style):
+        """
+        Whether the installed tool understands jobserver of given style.
+        """
+        minimum = JobServer.TOOL_SUPPORT.get(tool, {}).get(style)
+        if minimum is None:
+            return False
+        version = get_tool_version_tuple(tool)
+        return (version is not None) and (version >= minimum)
+
+    @staticmethod
+    def detect_style():
+        """
+        Return best jobserver style supported by installed tools (or None).
+        Tools without the support (e.g. older Ninja) are still usable,
+        tasks running them simply do not use the jobserver.
+        """
+        if JobServer.is_supported_by('make', 'fifo'):
+            return 'fifo'
+        return None
+
+    def supports(self, tool):
+        """
+        Whether the tool limits its parallel jobs through this jobserver.
+        """
+        return JobServer.is_supported_by(tool, self.style)
+
+    def get_makeflags(self):
+        if self.style == 'fifo':
+            auth = 'fifo:{}'.format(self.fifo_path)
+        else:
+            auth = '{},{}'.format(self.read_fd, self.write_fd)
+        return ' -j{} --jobserver-auth={}'.format(self.tokens, auth)
+
+    def get_environment(self, env=None):
+        """
+        Return (copy of) environment to be used for jobserver clients.
+        """
+        if env is None:
+            env = os.environ
+        env = env.copy()
+        env['MAKEFLAGS'] = self.get_makeflags()
+        env.pop('MFLAGS', None)
+        return env
+
+    def get_pass_fds(self):
+        """
+        File descriptors that has to be inherited by the clients.
+        """
+        if self.style == 'pipe':
+            return ( self.read_fd, self.write_fd )
+        return ()
+
+    def acquire(self):
+        """
+        Take one token (blocks until a token is available).
+        """
+        while True:
+            token = os.read(self.read_fd, 1)
+            if len(token) == 1:
+                return token
+
+    def release(self, token):
+        os.write(self.write_fd, token)
+
+    def close(self):
+        os.close(self.read_fd)
+        if self.write_fd != self.read_fd:
+            os.close(self.write_fd)
+        if self.fifo_path is not None:
+            try:
+                os.remove(self.fifo_path)
+            except OSError:
+                pass
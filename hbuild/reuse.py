@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Detection of runs that would only repeat the previous build.
+
+A build is determined by the revisions of the HelenOS and coastline
+repositories and by the configuration fingerprint (selected options,
+sources of the CI itself and the cross-compilers). When both match the
+previous build (as recorded in its report.xml), the run can be skipped
+or the previous results can be reused.
+"""
+
+import hashlib
+import os
+import shutil
+import subprocess
+import xml.etree.ElementTree as ET
+
+from hbuild.scheduler import Task
+from hbuild.cvs import get_git_mirror_path
+from hbuild.toolchain import get_cross_toolchain_fingerprint
+
+# Exit code of build.py when the build was skipped
+EXIT_UNCHANGED = 3
+
+# Options affecting the results of the build
+FINGERPRINT_OPTIONS = [
+    'helenos_repository', 'coastline_repository', 'platforms', 'harbours',
+    'tests', 'vm_memory_size', 'archive_format', 'code_browser',
+    'style_check', 'doxygen', 'out_of_tree', 'tests_serial_console',
+]
+
+# Files of the CI itself affecting the results (besides the top-level
+# scripts, see get_fingerprint_files())
+FINGERPRINT_DIRS = [ 'hbuild', 'htest', 'scenarios' ]
+FINGERPRINT_TOP_LEVEL_SUFFIXES = [ '.py', '.sh' ]
+
+def resolve_git_head(url, mirror_dir=None):
+    """
+    Return revision of HEAD of a remote repository without cloning it.
+    When the repository is not reachable, the mirror (if any) is used.
+    Returns None when the revision cannot be determined.
+    """
+    if url.startswith('wip://'):
+        return None
+    commands = [ [ 'git', 'ls-remote', url, 'HEAD' ] ]
+    if not mirror_dir is None:
+        mirror = get_git_mirror_path(mirror_dir, url)
+        if os.path.exists(mirror):
+            commands.append([ 'git', '--git-dir', mirror, 'rev-parse', 'HEAD' ])
+    for cmd in commands:
+        try:
+            res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True, timeout=120)
+        except (OSError, subprocess.SubprocessError):
+            continue
+        fields = res.stdout.decode('utf-8', 'replace').split()
+        if len(fields) > 0:
+            return fields[0]
+    return None
+
+def get_fingerprint_files(self_path):
+    """
+    Return (sorted) files of the CI itself that affect the results: the
+    top-level scripts (build.py, ci.sh, ...) tracked by Git (all of them
+    when the CI is not a Git checkout) and everything in FINGERPRINT_DIRS.
+    """
+    try:
+        res = subprocess.run([ 'git', 'ls-files', '-z' ], cwd=self_path,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+        top_level = [ x for x in res.stdout.decode('utf-8').split('\0') if (x != '') and (not '/' in x) ]
+    except (OSError, subprocess.SubprocessError):
+        top_level = os.listdir(self_path)
+    files = [
+        os.path.join(self_path, name) for name in top_level
+        if any([ name.endswith(s) for s in FINGERPRINT_TOP_LEVEL_SUFFIXES ]) and os.path.isfile(os.path.join(self_path, name))
+    ]
+    for d in FINGERPRINT_DIRS:
+        for ( dirpath, dirnames, filenames ) in os.walk(os.path.join(self_path, d)):
+            dirnames[:] = [ x for x in dirnames if x != '__pycache__' ]
+            for name in filenames:
+                files.append(os.path.join(dirpath, name))
+    return sorted(files)
+
+def compute_config_fingerprint(config, self_path):
+    h = hashlib.sha256()
+    for opt in FINGERPRINT_OPTIONS:
+        h.update('{}={}\n'.format(opt, getattr(config, opt, None)).encode('utf-8'))
+    for path in get_fingerprint_files(self_path):
+        h.update(os.path.relpath(path, self_path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    h.update('{}\n'.format(get_cross_toolchain_fingerprint()).encode('utf-8'))
+    return h.hexdigest()
+
+def read_build_identity(report_filename):
+    """
+    Return revisions (mapping alias -> revision), configuration
+    fingerprint and number of the build described by the report (or None
+    when the report is not usable).
+    """
+    try:
+        root = ET.parse(report_filename).getroot()
+    except (OSError, ET.ParseError):
+        return None
+    info = root.find('buildinfo')
+    if info is None:
+        return None
+    revisions = {}
+    for checkout in root.findall('checkout'):
+        revisions[checkout.get('alias')] = checkout.get('revision')
+    return {
+        'number': root.get('number'),
+        'revisions': revisions,
+        'fingerprint': info.get('config-fingerprint'),
+    }
+
+def is_same_build(previous, revisions, fingerprint):
+    if (previous is None) or (fingerprint is None) or (previous['fingerprint'] != fingerprint):
+        return False
+    for alias in revisions:
+        if (revisions[alias] is None) or (previous['revisions'].get(alias) != revisions[alias]):
+            return False
+    return True
+
+class ReusePreviousBuildTask(Task):
+    """
+    Reuse results of the previous build: its artefacts are hard-linked
+    into the current artefact directory and its task records are copied
+    into the current report.
+    """
+
+    # Files recreated for every build
+    NOT_REUSED = [ 'report.xml', 'index.html', 'timeline.json' ]
+
+    def __init__(self, scheduler, previous_report):
+        self.scheduler = scheduler
+        self.previous_report = os.path.abspath(previous_report)
+        Task.__init__(self, None)
+
+    def link_tree(self, src_dir, dest_dir):
+        for ( dirpath, dirnames, filenames ) in os.walk(src_dir):
+            rel = os.path.relpath(dirpath, src_dir)
+            target_dir = os.path.normpath(os.path.join(dest_dir, rel))
+            os.makedirs(target_dir, exist_ok=True)
+            for name in filenames:
+                if (rel == '.') and (name in ReusePreviousBuildTask.NOT_REUSED):
+                    continue
+                target = os.path.join(target_dir, name)
+                if os.path.lexists(target):
+                    continue
+                src = os.path.join(dirpath, name)
+                try:
+                    os.link(src, target, follow_symlinks=False)
+                except OSError:
+                    shutil.copy2(src, target, follow_symlinks=False)
+
+    def run(self):
+        previous_dir = os.path.dirname(self.previous_report)
+        self.link_tree(previous_dir, self.ctl.get_artefact_absolute_path('.'))
+
+        root = ET.parse(self.previous_report).getroot()
+        for element in root:
+            if element.tag == 'buildinfo':
+                continue
+            self.scheduler.append_to_report(ET.tostring(element, encoding='unicode'))
+        self.scheduler.add_build_info('reused-from', root.get('number'))
+
+        return {}
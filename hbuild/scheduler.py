@@ -34,9 +34,21 @@ import time
 import datetime
 import shutil
 import sys
+import heapq
+import selectors
 
+from collections import deque
+from xml.sax.saxutils import quoteattr
 from threading import Lock, Condition
 
+from hbuild.history import TaskDurationHistory
+from hbuild.jobserver import JobServer
+from hbuild.taskcache import TaskCache, HttpCacheTier, compute_cache_digest
+from hbuild.timeline import BuildTimeline
+from hbuild.workspace import create_workspace
+from hbuild.artefactstore import ArtefactStore
+from hbuild.ccache import CompilerCache, parse_stats_log
+
 class Task:
     def __init__(self, report_tag, **report_args):
         self.report = {
@@ -48,21 +60,34 @@ class Task:
             self.report['attrs'][k] = report_args[k]
         self.ctl = None
 
-    def execute(self):
+    def execute(self, cache=None, cache_digest=None):
         start_time = time.time()
         try:
-            res = self.run()
+            res = None
+            cached = False
+            if (not cache is None) and (not cache_digest is None) and cache.has(cache_digest):
+                try:
+                    res = self.restore_from_cache(cache, cache_digest)
+                    cached = True
+                except Exception as e:
+                    self.ctl.append_line_to_log_file('Failed to restore from task cache: %s' % e)
+            if not cached:
+                res = self.run()
             if res == False:
                 raise Exception('run() returned False')
             self.report['result'] = 'ok'
 
+            if res is None:
+                res = {}
+
+            if (not cached) and (not cache is None) and (not cache_digest is None):
+                self.store_to_cache(cache, cache_digest, res)
+
             self.report['files'] = self.ctl.get_files()
 
             end_time = time.time()
             self.report['attrs']['duration'] = (end_time - start_time) * 1000
-
-            if res is None:
-                res = {}
+            self.add_usage_to_report()
 
             self.ctl.done()
 
@@ -73,6 +98,7 @@ class Task:
         except Exception as e:
             end_time = time.time()
             self.report['attrs']['duration'] = (end_time - start_time) * 1000
+            self.add_usage_to_report()
 
             self.report['result'] = 'fail'
             self.report['files'] = self.ctl.get_files()
@@ -82,9 +108,104 @@ class Task:
     def run(self):
         pass
 
+    def add_usage_to_report(self):
+        """
+        Add resources consumed by commands of this task to the report.
+        """
+        usage = self.ctl.get_usage()
+        if usage['commands'] == 0:
+            return
+        for key in TaskController.USAGE_REPORT_ATTRS:
+            if key in usage:
+                self.report['attrs'][key] = usage[key]
+
+    def get_cache_key(self):
+        """
+        Key describing all inputs of the task (revisions, profile, tool
+        versions etc.) as a JSON-serializable value. Results of tasks with
+        the same key (and same keys of their dependencies) are taken from
+        the task cache instead of running the task again.
+        Return None when the task cannot be cached (default).
+        Dependency data are available (through self.ctl) when called.
+        """
+        return None
+
+    def get_cache_outputs(self, data):
+        """
+        Files and directories (absolute paths inside the build directory)
+        created by the task that are used by other tasks and thus have to
+        be restored from cache.
+        data are the data returned by run().
+        """
+        return []
+
+    def needs_cached_dependants(self):
+        """
+        Whether results restored from the task cache are usable only when
+        the dependant tasks with the same flag are restored too.
+        Set for tasks that leave state outside get_cache_outputs() that
+        their dependants build on: such task is run (instead of being
+        restored) when any of its dependants would be run.
+        The dependants have to be submitted before the task starts.
+        """
+        return False
+
+    def restore_from_cache(self, cache, cache_digest):
+        self.ctl.append_line_to_log_file('Restoring from task cache (%s).' % cache_digest)
+        meta = cache.restore(cache_digest, self.ctl)
+        for k in meta['attrs']:
+            self.report['attrs'][k] = meta['attrs'][k]
+        self.report['attrs']['cache'] = 'hit'
+        cache.record_hit()
+        return meta['data']
+
+    def store_to_cache(self, cache, cache_digest, data):
+        attrs = {}
+        for k in self.report['attrs']:
+            if not k in [ 'duration', 'result', 'cache' ] + TaskController.USAGE_REPORT_ATTRS:
+                attrs[k] = self.report['attrs'][k]
+        self.report['attrs']['cache'] = 'miss'
+        cache.record_miss()
+        try:
+            cache.store(cache_digest, self.ctl, data, attrs, self.get_cache_outputs(data))
+        except Exception as e:
+            self.ctl.append_line_to_log_file('Failed to store into task cache: %s' % e)
+
     def get_report(self):
         return self.report
 
+    def get_type(self):
+        return self.report['name']
+
+    def get_resources(self):
+        """
+        Amounts of resources (e.g. CPUs) consumed by the task when running.
+        Returns a dictionary with resource pool names as keys, tasks that
+        do not declare CPU consumption are expected to use a single CPU.
+        """
+        return {}
+
+    def uses_jobserver(self, jobserver):
+        """
+        Whether the task runs its commands through given (shared)
+        jobserver, i.e. whether the tools it runs support it (see
+        JobServer.supports()). Such tasks take a single CPU from the
+        scheduler as the parallelism of their commands is limited by the
+        jobserver.
+        """
+        return False
+
+
+def decode_wait_status(status):
+    """
+    Convert status returned by os.wait4() to a return code the way
+    subprocess does (negative signal number for killed processes).
+    """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    if os.WIFEXITED(status):
+        return os.WEXITSTATUS(status)
+    raise ValueError('Unknown wait status {}.'.format(status))
 
 class TaskException(Exception):
     def __init__(self, msg):
@@ -97,21 +218,57 @@ class RunCommandException(TaskException):
         Exception.__init__(self, msg)
 
 class TaskController:
-    def __init__(self, name, data, build_directory, artefact_directory, printer, kept_log_lines, print_debug = False):
+    # Size of reads from command output and of the log file buffer.
+    READ_CHUNK_SIZE = 64 * 1024
+    LOG_BUFFER_SIZE = 1024 * 1024
+
+    # Keys of the usage statistics (see get_usage()) exported to the report.
+    USAGE_REPORT_ATTRS = [ 'commands', 'command-wall', 'cpu-user', 'cpu-system', 'max-rss', 'io-read', 'io-write',
+        'workspace-method', 'workspace-duration', 'workspace-saved', 'ccache-hits', 'ccache-misses' ]
+
+    def __init__(self, name, data, build_directory, artefact_directory, printer, kept_log_lines, print_debug = False, jobserver = None, workspace_methods = None, artefact_store = None, compiler_cache = None):
         self.name = name
         self.data = data
         self.files = []
         self.log = None
-        self.log_tail = []
+        # Tail of the log: raw chunks with number of newlines in each of
+        # them, only as many chunks are kept as needed for the last
+        # kept_log_lines lines. Decoded only when needed (get_log_tail()).
+        self.log_tail_chunks = deque()
+        self.log_tail_newlines = 0
+        # Commands of the task (and helper threads, e.g. the workers of
+        # populate_overlay()) might append to the log concurrently
+        self.log_lock = Lock()
+        # Resources consumed by commands run through run_command()
+        # (times in ms, max-rss in KiB, I/O in 512-byte blocks).
+        self.usage = {
+            'commands': 0,
+            'command-wall': 0,
+            'cpu-user': 0,
+            'cpu-system': 0,
+            'max-rss': 0,
+            'io-read': 0,
+            'io-write': 0,
+            'workspace-duration': 0,
+            'workspace-saved': 0,
+        }
         self.build_directory = build_directory
         self.artefact_directory = artefact_directory
         self.printer = printer
         self.kept_log_lines = kept_log_lines
         self.print_debug_messages = print_debug
+        self.jobserver = jobserver
+        self.workspace_methods = workspace_methods
+        self.artefact_store = artefact_store
+        self.compiler_cache = compiler_cache
+        if not self.compiler_cache is None:
+            # Statistics from previous runs
+            self.remove_silently(self.get_ccache_stats_log_())
 
     def derive(self, name, data):
         return TaskController(name, data, self.build_directory, self.artefact_directory,
-            self.printer, self.kept_log_lines, self.print_debug_messages)
+            self.printer, self.kept_log_lines, self.print_debug_messages, self.jobserver,
+            self.workspace_methods, self.artefact_store, self.compiler_cache)
 
     def dprint(self, str, *args):
         if self.print_debug_messages:
@@ -129,25 +286,65 @@ class TaskController:
                 return self.data[dep][key]
         raise TaskException("WARN: unknown key %s" % key)
 
-    def run_command(self, cmd, cwd=None, needs_output=False):
+    def run_command(self, cmd, cwd=None, needs_output=False, use_jobserver=False, separate_stderr=False, use_compiler_cache=None):
+        """
+        Run given command, its output is appended to the log.
+
+        The output is decoded (and returned as a list of lines) only with
+        needs_output. With separate_stderr, standard error output is
+        captured separately (both still go to the log).
+
+        With use_jobserver, the command is made a client of the shared
+        jobserver (when available) so that its parallel jobs (e.g. of make
+        or ninja) are limited together with all other clients.
+
+        use_compiler_cache enables the shared compiler cache (when
+        available): 'masquerade' for commands calling the cross compilers
+        by name (configuring or building with meson, hsct.sh).
+        """
         self.dprint("Running `%s'..." % ' '.join(cmd))
-        output = []
-        last_line = ""
         rc = 0
 
-        # FIXME: can we keep stdout and stderr separated?
-        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, cwd=cwd) as proc:
-            for line in proc.stdout:
-                line = line.decode('utf-8').strip('\n')
-                self.append_line_to_log_file(line)
-                if needs_output:
-                    output.append(line)
-                last_line = line
-            proc.wait()
-            rc = proc.returncode
-        if rc != 0:
-            #self.dprint('stderr=%s' % stderr.strip('\n'))
+        env = None
+        pass_fds = ()
+        token = None
+        if (not use_compiler_cache is None) and (not self.compiler_cache is None):
+            env = self.compiler_cache.get_environment(env, self.get_ccache_stats_log_(),
+                use_compiler_cache == 'masquerade')
+        if use_jobserver and (not self.jobserver is None):
+            env = self.jobserver.get_environment(env)
+            pass_fds = self.jobserver.get_pass_fds()
+            token = self.jobserver.acquire()
 
+        try:
+            start_time = time.time()
+            if separate_stderr:
+                stderr = subprocess.PIPE
+            else:
+                stderr = subprocess.STDOUT
+            with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr, cwd=cwd, env=env, pass_fds=pass_fds) as proc:
+                ( captured_stdout, captured_stderr, output_tail ) = self.capture_output_(proc, needs_output)
+                # Reap the process ourselves to get its resource usage
+                # (it includes all descendants the process waited for).
+                ( _, status, rusage ) = os.wait4(proc.pid, 0)
+                proc.returncode = decode_wait_status(status)
+                rc = proc.returncode
+                self.record_usage_(time.time() - start_time, rusage)
+        finally:
+            if not token is None:
+                self.jobserver.release(token)
+
+        output = self.decode_lines_(captured_stdout)
+        if separate_stderr:
+            errors = self.decode_lines_(captured_stderr)
+        else:
+            errors = output
+
+        if rc != 0:
+            last_line = ''
+            tail = self.decode_lines_(output_tail)
+            if len(tail) > 0:
+                last_line = tail[-1]
             raise RunCommandException(
                 "`%s' failed: %s" % (' '.join(cmd), last_line),
                 rc, output)
@@ -155,16 +352,95 @@ class TaskController:
         return {
             'output': output,
             'stdout': '\n'.join(output),
-            'stderr': '\n'.join(output),
+            'stderr': '\n'.join(errors),
             'rc': rc,
             'failed': not rc == 0
         }
 
+    def capture_output_(self, proc, keep):
+        """
+        Copy output of the process into the log (as is, in large chunks).
+        Output not terminated by a newline is terminated when the stream
+        closes so that it is not glued to the following log line.
+
+        Returns captured (raw) standard and error output of the process
+        (captured only when keep is set) and the end of its (combined)
+        output.
+        """
+        captured = ( bytearray(), bytearray() )
+        tail = bytearray()
+        with selectors.DefaultSelector() as sel:
+            for ( stream, buffer ) in zip([ proc.stdout, proc.stderr ], captured):
+                if not stream is None:
+                    sel.register(stream.fileno(), selectors.EVENT_READ, [ buffer, True ])
+            while len(sel.get_map()) > 0:
+                for ( key, _ ) in sel.select():
+                    ( buffer, terminated ) = key.data
+                    chunk = os.read(key.fd, TaskController.READ_CHUNK_SIZE)
+                    if len(chunk) == 0:
+                        sel.unregister(key.fd)
+                        if not terminated:
+                            self.append_to_log_(b'\n')
+                            tail.extend(b'\n')
+                        continue
+                    key.data[1] = chunk.endswith(b'\n')
+                    self.append_to_log_(chunk)
+                    tail.extend(chunk)
+                    del tail[:-TaskController.READ_CHUNK_SIZE]
+                    if keep:
+                        buffer.extend(chunk)
+        return ( captured[0], captured[1], tail )
+
+    def decode_lines_(self, data):
+        if len(data) == 0:
+            return []
+        lines = data.decode('utf-8', 'replace').split('\n')
+        if lines[-1] == '':
+            lines.pop()
+        return lines
+
+    def record_usage_(self, wall_time, rusage):
+        self.usage['commands'] = self.usage['commands'] + 1
+        self.usage['command-wall'] = self.usage['command-wall'] + wall_time * 1000
+        self.usage['cpu-user'] = self.usage['cpu-user'] + rusage.ru_utime * 1000
+        self.usage['cpu-system'] = self.usage['cpu-system'] + rusage.ru_stime * 1000
+        self.usage['max-rss'] = max(self.usage['max-rss'], rusage.ru_maxrss)
+        self.usage['io-read'] = self.usage['io-read'] + rusage.ru_inblock
+        self.usage['io-write'] = self.usage['io-write'] + rusage.ru_oublock
+        self.dprint("Command took %.1fs (user %.1fs, system %.1fs, max RSS %dKiB).",
+            wall_time, rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss)
+
+    def get_ccache_stats_log_(self):
+        return os.path.join(self.make_temp_dir('ccache-stats'), '{}.log'.format(self.name))
+
+    def get_usage(self):
+        """
+        Resources consumed by all commands run so far.
+        """
+        usage = dict(self.usage)
+        if not self.compiler_cache is None:
+            stats_log = self.get_ccache_stats_log_()
+            if os.path.exists(stats_log):
+                ( usage['ccache-hits'], usage['ccache-misses'] ) = parse_stats_log(stats_log)
+        return usage
+
     def make_temp_dir(self, name):
         dname = '%s/%s' % ( self.build_directory, name )
         os.makedirs(dname, exist_ok=True)
         return os.path.abspath(dname)
 
+    def make_workspace(self, src_dir, dest_dir):
+        """
+        Make private copy of src_dir in dest_dir (see hbuild.workspace),
+        the copy might share the files with the source: do not modify
+        existing files in place.
+        """
+        info = create_workspace(self, src_dir, dest_dir, self.workspace_methods)
+        self.usage['workspace-method'] = info['method']
+        self.usage['workspace-duration'] = self.usage['workspace-duration'] + info['duration']
+        self.usage['workspace-saved'] = self.usage['workspace-saved'] + info['saved']
+        return info
+
     def recursive_copy(self, src_dir, dest_dir):
         os.makedirs(dest_dir, exist_ok=True)
         self.run_command([ 'rsync', '-a', src_dir + '/', dest_dir ])
@@ -184,13 +460,40 @@ class TaskController:
     def set_log_file(self, log_filename):
         # TODO: open the log lazily
         # TODO: propagate the information to XML report
-        self.log = self.open_downloadable_file('logs/' + log_filename, 'w')
+        self.log = open(self.get_artefact_absolute_path('logs/' + log_filename, True),
+            'wb', TaskController.LOG_BUFFER_SIZE)
 
     def append_line_to_log_file(self, line):
-        if not self.log is None:
-            self.log.write(line + '\n')
-        self.log_tail.append(line)
-        self.log_tail = self.log_tail[-self.kept_log_lines:]
+        self.append_to_log_((line + '\n').encode('utf-8'))
+
+    def append_to_log_(self, data):
+        with self.log_lock:
+            if not self.log is None:
+                self.log.write(data)
+            if self.kept_log_lines <= 0:
+                return
+
+            newlines = data.count(b'\n')
+            self.log_tail_chunks.append(( data, newlines ))
+            self.log_tail_newlines = self.log_tail_newlines + newlines
+            # Drop the oldest chunks when the remaining ones contain enough
+            # lines (the last line might be unterminated).
+            while len(self.log_tail_chunks) > 1:
+                oldest_newlines = self.log_tail_chunks[0][1]
+                if self.log_tail_newlines - oldest_newlines < self.kept_log_lines:
+                    break
+                self.log_tail_chunks.popleft()
+                self.log_tail_newlines = self.log_tail_newlines - oldest_newlines
+
+    def get_log_tail(self):
+        """
+        Return last kept_log_lines lines of the log (decoded).
+        """
+        if self.kept_log_lines <= 0:
+            return []
+        with self.log_lock:
+            data = b''.join([ chunk for ( chunk, _ ) in self.log_tail_chunks ])
+        return self.decode_lines_(data)[-self.kept_log_lines:]
 
     def get_artefact_absolute_path(self, relative_name, create_dirs=False):
         base = os.path.dirname(relative_name)
@@ -206,7 +509,11 @@ class TaskController:
         self.dprint("Downloadable `%s' at %s", title, download_name)
 
         target = self.get_artefact_absolute_path(download_name, True)
-        shutil.copy(current_filename, target)
+        if self.artefact_store is None:
+            shutil.copy(current_filename, target)
+        else:
+            # Shared with other builds, the file is read-only
+            self.artefact_store.publish(current_filename, target)
 
         self.files.append({
             'filename' : download_name,
@@ -232,8 +539,9 @@ class TaskController:
         return open(self.get_artefact_absolute_path(download_name, True), mode)
 
     def done(self):
-        if not self.log is None:
-            self.log.close()
+        with self.log_lock:
+            if not self.log is None:
+                self.log.close()
 
     def get_files(self):
         return self.files
@@ -259,49 +567,88 @@ class TaskController:
 
 
 class TaskWrapper:
-    def __init__(self, id, task, description, deps, mutexes):
+    # Task states (as seen by the scheduler)
+    WAITING = 0     # Some dependencies are not finished yet
+    READY = 1       # In the ready heap
+    BLOCKED = 2     # In a wait list of an exhausted resource pool
+    DISPATCHED = 3  # Handed over to the executor
+
+    # Large graphs are possible (harbours x profiles x scenarios), keep the
+    # wrappers compact.
+    __slots__ = (
+        'id', 'dependencies', 'successors', 'description', 'task',
+        'status', 'reason', 'completed', 'data', 'mutexes', 'demands',
+        'estimate', 'rank', 'sequence',
+        'state', 'pending_dependencies', 'failed_dependency', 'blocked_on',
+        'cache_digest',
+    )
+
+    def __init__(self, id, task, description, deps, mutexes, demands, estimate, sequence):
         self.id = id
         self.dependencies = deps
+        # Tasks depending on this one (reverse edges)
+        self.successors = []
         self.description = description
         self.task = task
         self.status = 'n/a'
+        self.reason = None
         self.completed = False
         self.data = {}
-        self.lock = Lock()
         self.mutexes = mutexes
+        # Amounts of resources taken from the pools while running
+        self.demands = demands
+        # Expected duration of this task alone (ms)
+        self.estimate = estimate
+        # Upward rank: expected length of the longest path from the start
+        # of this task to the end of the last (known) task depending on it.
+        self.rank = estimate
+        # Submission order (used to break ties)
+        self.sequence = sequence
+        self.state = TaskWrapper.WAITING
+        # Number of dependencies that have not finished yet
+        self.pending_dependencies = 0
+        # Id of the first dependency that did not finish okay
+        self.failed_dependency = None
+        # Resource pool the task is waiting for (when BLOCKED)
+        self.blocked_on = None
+        # Digest of task inputs (see compute_cache_digest())
+        self.cache_digest = None
+
+    # The following accessors do not need any locking: status and data are
+    # written before the scheduler (under its guard) marks the task as
+    # completed and they are read only after that.
 
     def has_completed_okay(self):
-        with self.lock:
-            return self.completed and (self.status == 'ok')
+        return self.completed and (self.status == 'ok')
 
     def has_finished(self):
-        with self.lock:
-            return self.completed
+        return self.completed
 
     def get_status(self):
-        with self.lock:
-            return self.status
+        return self.status
 
     def get_data(self):
-        with self.lock:
-            return self.data
+        return self.data
 
     def set_status(self, status, reason):
-        with self.lock:
-            self.status = status
-            self.reason = reason
+        self.status = status
+        self.reason = reason
 
     def set_done(self, data):
-        with self.lock:
-            self.data = data
-            self.completed = True
+        self.data = data
 
     def set_skipped(self, reason):
         self.set_status('skip', reason)
 
+    def get_priority(self):
+        # Highest rank first, tasks needing scarce resources (other than
+        # CPU) first among equally ranked ones (so that they are not
+        # serialized at the end), then in submission order.
+        return ( -self.rank, len(self.demands) <= 1, self.sequence )
+
 
 class BuildScheduler:
-    def __init__(self, max_workers, build, artefact, build_id, printer, inline_log_lines = 10, debug = False):
+    def __init__(self, max_workers, build, artefact, build_id, printer, inline_log_lines = 10, debug = False, task_durations = None, resources = {}, jobserver = None, task_cache = None, task_cache_url = None, task_cache_connections = 4, task_cache_size = None, workspace_methods = None, artefact_store = None, compiler_cache = None, compiler_cache_size = '20G'):
         self.config = {
             'build-directory': build,
             'artefact-directory': artefact,
@@ -312,8 +659,27 @@ class BuildScheduler:
         self.start_timestamp = time.time()
         self.start_date = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0).astimezone().isoformat(' ')
 
+        # Jobserver shared by all commands that can run parallel jobs
+        # (i.e. make and ninja); the whole machine is distributed among
+        # them.
+        self.jobserver = None
+        if not jobserver is None:
+            self.jobserver = JobServer(build, max_workers, jobserver)
+
+        # Artefacts are published through the content-addressed store
+        # (when configured)
+        self.artefact_store = None
+        if not artefact_store is None:
+            self.artefact_store = ArtefactStore(artefact_store)
+
+        # Compiler cache shared by all builds (when configured)
+        self.compiler_cache = None
+        if not compiler_cache is None:
+            self.compiler_cache = CompilerCache(compiler_cache, build, compiler_cache_size)
+
         # Parent task controller
-        self.ctl = TaskController('scheduler', {}, build, artefact, self.printer, inline_log_lines, debug)
+        self.ctl = TaskController('scheduler', {}, build, artefact, self.printer, inline_log_lines, debug, self.jobserver,
+            workspace_methods, self.artefact_store, self.compiler_cache)
 
         # Start the log file
         self.report_file = self.ctl.open_downloadable_file('report.xml', 'w')
@@ -332,26 +698,53 @@ class BuildScheduler:
         # a task id and TaskWrapper class.
         self.tasks = {}
 
-        # Queue of tasks not yet run (uses task ids only). We insert mutex
-        # tasks at queue beginning (instead of appending) as a heuristic to
-        # prevent accumulation of mutex tasks at the end of run where it could
-        # hurt concurrent execution.
-        self.queue = []
+        # Heap of tasks that have all dependencies finished (see
+        # TaskWrapper.get_priority() for the entries). The heap is ordered by
+        # the upward rank of the tasks, i.e. tasks lying on the critical path
+        # (the longest path to the end of the whole run) are run first. That
+        # prevents accumulation of long chains (and mutually excluded tasks)
+        # at the end of the run where they could hurt concurrent execution.
+        # Entries are invalidated lazily: when the rank of a task changes,
+        # a new entry is pushed and the stale one is skipped when popped.
+        self.ready = []
 
-        # Number of currently running (executing) tasks. Used solely to
-        # control number of concurrently running tasks.
+        # Tasks with a failed dependency: they are only reported as skipped
+        # and do not need any resources.
+        self.skipped = deque()
+
+        # Number of submitted tasks that were not dispatched yet.
+        self.pending_tasks_count = 0
+
+        # Number of tasks that can run (in the ready heap or waiting for
+        # a resource pool) but were not dispatched yet.
+        self.queued_tasks_count = 0
+
+        # Counter for tie-breaking tasks with the same rank (FIFO).
+        self.submitted_count = 0
+
+        # Number of currently running (executing) tasks (including the
+        # skipped ones that are only being reported).
         self.running_tasks_count = 0
 
         # Flag for the queue processing whether to terminate the loop to allow
         # clean termination of the executor.
         self.terminate = False
 
-        # Here we record which mutexes are held by executing tasks. Mutexes are
-        # identified by their (string) name that is used as index. When the
-        # value is True, the mutex is held (i.e. do not run any other task
-        # claming the same mutex), mutex is not held when the value is False
-        # or when the key is not present at all.
-        self.task_mutexes = {}
+        # Resource pools: capacity of each pool and how much of it is
+        # currently used by executing tasks. Pools are identified by their
+        # (string) name. The 'cpu' pool is always present and limits the
+        # number of concurrently running tasks (each task takes one CPU
+        # unless it declares otherwise). Task mutexes are pools with
+        # capacity of one that are created on demand (unless configured
+        # explicitly, e.g. to allow several VMs to run at once).
+        self.resource_capacity = { 'cpu': max_workers }
+        for name in resources:
+            self.resource_capacity[name] = resources[name]
+        self.resource_usage = {}
+
+        # Ready tasks waiting for an exhausted resource pool. Mapping from
+        # a pool name to a heap with the same entries as in self.ready.
+        self.resource_waiters = {}
 
         # Condition variable guarding the above attributes.
         # We initialize CV only without attaching a lock as it creates one
@@ -364,6 +757,23 @@ class BuildScheduler:
         # Lock guarding output synchronization
         self.output_lock = Lock()
 
+        # Timeline of the whole run (Chrome trace format)
+        self.timeline = BuildTimeline(self.start_timestamp)
+
+        # Extra attributes of the buildinfo element in the report
+        self.build_info = {}
+
+        # Durations of tasks from previous runs (used to compute the ranks)
+        self.history = TaskDurationHistory(task_durations)
+
+        # Cache of task results (from previous runs)
+        self.cache = None
+        if not task_cache is None:
+            remote = None
+            if not task_cache_url is None:
+                remote = HttpCacheTier(task_cache_url, task_cache_connections)
+            self.cache = TaskCache(task_cache, remote, task_cache_size)
+
         # Executor for running of individual tasks
         from concurrent.futures import ThreadPoolExecutor
         self.max_workers = max_workers
@@ -382,7 +792,7 @@ class BuildScheduler:
             import traceback
             traceback.print_exc()
 
-    def submit(self, description, task_id, task, deps = [], mutexes = []):
+    def submit(self, description, task_id, task, deps = [], mutexes = [], resources = {}):
         with self.guard:
             #print("Submitting {} ({}, {}, {})".format(description, task_id, deps, mutexes))
             # Check that dependencies are known
@@ -390,31 +800,184 @@ class BuildScheduler:
                 if not d in self.tasks:
                     raise Exception('Dependency %s is not known.' % d)
             # Add the wrapper
-            wrapper = TaskWrapper(task_id, task, description, deps, mutexes)
+            estimate = self.history.estimate(task_id, task.get_type())
+            demands = self.get_demands_(task, mutexes, resources)
+            wrapper = TaskWrapper(task_id, task, description, deps, mutexes,
+                demands, estimate, self.submitted_count)
+            self.submitted_count = self.submitted_count + 1
             self.tasks[task_id] = wrapper
+            self.pending_tasks_count = self.pending_tasks_count + 1
+            self.timeline.task_submitted(task_id)
 
-            # Append to the queue
-            # We use a simple heuristic: if the task has no mutexes, we
-            # append to the end of the queue. Otherwise we prioritize the
-            # task a little bit to prevent ending with serialized execution
-            # of the mutually excluded tasks. (We add before first non-mutexed
-            # task.)
-            if len(mutexes) > 0:
-                new_queue = []
-                inserted = False
-                for q in self.queue:
-                    if (len(self.tasks[q].mutexes) == 0) and (not inserted):
-                        new_queue.append(task_id)
-                        inserted = True
-                    new_queue.append(q)
-                if not inserted:
-                    new_queue.append(task_id)
-                self.queue = new_queue
-            else:
-                self.queue.append(task_id)
+            # Link with the dependencies
+            for d in deps:
+                task_dep = self.tasks[d]
+                if task_dep.completed:
+                    if (task_dep.status != 'ok') and (wrapper.failed_dependency is None):
+                        wrapper.failed_dependency = d
+                else:
+                    task_dep.successors.append(wrapper)
+                    wrapper.pending_dependencies = wrapper.pending_dependencies + 1
+
+            # The new task extends the paths going through its dependencies
+            self.update_ranks_(wrapper)
+
+            if (wrapper.pending_dependencies == 0) or (wrapper.failed_dependency is not None):
+                self.make_ready_(wrapper)
 
             self.guard.notify_all()
 
+    def update_ranks_(self, wrapper):
+        """
+        Propagate rank of a newly added task to all tasks it depends on.
+        """
+        # We assume self.guard was already acquired
+        # Only tasks not yet dispatched are interesting, the rank of tasks
+        # already started has no effect.
+        pending = [ wrapper ]
+        while len(pending) > 0:
+            current = pending.pop()
+            for task_dep_id in current.dependencies:
+                task_dep = self.tasks[task_dep_id]
+                if task_dep.state == TaskWrapper.DISPATCHED:
+                    continue
+                new_rank = task_dep.estimate + current.rank
+                if new_rank > task_dep.rank:
+                    task_dep.rank = new_rank
+                    if task_dep.state == TaskWrapper.READY:
+                        heapq.heappush(self.ready, ( task_dep.get_priority(), task_dep ))
+                    elif task_dep.state == TaskWrapper.BLOCKED:
+                        heapq.heappush(self.resource_waiters[task_dep.blocked_on],
+                            ( task_dep.get_priority(), task_dep ))
+                    pending.append(task_dep)
+
+    def make_ready_(self, wrapper):
+        """
+        Move task with all dependencies resolved to the ready heap.
+        """
+        # We assume self.guard was already acquired
+        self.timeline.task_ready(wrapper.id)
+        if wrapper.failed_dependency is not None:
+            wrapper.state = TaskWrapper.DISPATCHED
+            self.skipped.append(wrapper)
+        else:
+            wrapper.state = TaskWrapper.READY
+            heapq.heappush(self.ready, ( wrapper.get_priority(), wrapper ))
+            self.queued_tasks_count = self.queued_tasks_count + 1
+            self.update_counters_()
+
+    def update_counters_(self):
+        # We assume self.guard was already acquired
+        self.timeline.counters(running=self.running_tasks_count, queued=self.queued_tasks_count)
+
+    def pop_heap_(self, heap, expected_state):
+        """
+        Pop top-priority task from the heap (skipping stale entries).
+        """
+        while len(heap) > 0:
+            ( priority, wrapper ) = heapq.heappop(heap)
+            if (wrapper.state == expected_state) and (priority == wrapper.get_priority()):
+                return wrapper
+        return None
+
+    def get_demands_(self, task, mutexes, resources):
+        """
+        Compute how much of each resource pool the task needs.
+        """
+        # We assume self.guard was already acquired
+        requested = { 'cpu': 1 }
+        for source in [ task.get_resources(), resources ]:
+            for name in source:
+                requested[name] = source[name]
+        if (not self.jobserver is None) and task.uses_jobserver(self.jobserver):
+            requested['cpu'] = 1
+        for m in mutexes:
+            if not m in self.resource_capacity:
+                self.resource_capacity[m] = 1
+            requested[m] = max(requested.get(m, 0), 1)
+
+        # Resources without a configured pool are not limited and a task
+        # can never need more than the whole pool.
+        demands = {}
+        for name in requested:
+            if name in self.resource_capacity:
+                demands[name] = min(requested[name], self.resource_capacity[name])
+        return demands
+
+    def get_resource_available_(self, name):
+        return self.resource_capacity[name] - self.resource_usage.get(name, 0)
+
+    def get_exhausted_resource_(self, wrapper):
+        """
+        Return name of a pool that cannot satisfy the task (or None).
+        """
+        for name in wrapper.demands:
+            if wrapper.demands[name] > self.get_resource_available_(name):
+                return name
+        return None
+
+    def acquire_resources_(self, wrapper):
+        for name in wrapper.demands:
+            self.resource_usage[name] = self.resource_usage.get(name, 0) + wrapper.demands[name]
+
+    def release_resources_(self, wrapper):
+        for name in wrapper.demands:
+            self.resource_usage[name] = self.resource_usage[name] - wrapper.demands[name]
+        for name in wrapper.demands:
+            self.wake_resource_waiters_(name)
+
+    def wake_resource_waiters_(self, name):
+        """
+        Move the best tasks waiting for a resource pool back to ready heap
+        (as many as would fit into the pool now).
+        """
+        # We assume self.guard was already acquired
+        waiters = self.resource_waiters.get(name)
+        if waiters is None:
+            return
+        available = self.get_resource_available_(name)
+        while len(waiters) > 0:
+            ( priority, wrapper ) = waiters[0]
+            if (wrapper.state != TaskWrapper.BLOCKED) or (priority != wrapper.get_priority()):
+                heapq.heappop(waiters)
+                continue
+            if wrapper.demands[name] > available:
+                break
+            heapq.heappop(waiters)
+            available = available - wrapper.demands[name]
+            wrapper.state = TaskWrapper.READY
+            wrapper.blocked_on = None
+            heapq.heappush(self.ready, ( wrapper.get_priority(), wrapper ))
+        if len(waiters) == 0:
+            del self.resource_waiters[name]
+
+    def pop_ready_task_(self):
+        """
+        Return the ready task with highest priority that can be run now.
+        Tasks that do not fit into some resource pool are moved to the wait
+        list of that pool.
+        Returns None when no task can be run.
+        """
+        # We assume self.guard was already acquired
+        while True:
+            wrapper = self.pop_heap_(self.ready, TaskWrapper.READY)
+            if wrapper is None:
+                return None
+            exhausted = self.get_exhausted_resource_(wrapper)
+            if exhausted is None:
+                return wrapper
+
+            wrapper.state = TaskWrapper.BLOCKED
+            wrapper.blocked_on = exhausted
+            if not exhausted in self.resource_waiters:
+                self.resource_waiters[exhausted] = []
+            heapq.heappush(self.resource_waiters[exhausted], ( wrapper.get_priority(), wrapper ))
+            # The task might have been woken-up from a wait list of another
+            # pool: give the next ones there a chance.
+            for name in wrapper.demands:
+                if name != exhausted:
+                    self.wake_resource_waiters_(name)
+
     def task_run_wrapper(self, wrapper, task_id, can_be_run):
         try:
             self.task_run_inner(wrapper, task_id, can_be_run)
@@ -432,6 +995,69 @@ class BuildScheduler:
 
         return s_all_entities_encoded.decode('utf8')
 
+    def compute_cache_digest_(self, wrapper, predicted=None):
+        """
+        Return digest of task inputs and whether the task can be cached.
+
+        Tasks without their own cache key get a digest derived from their
+        dependencies so that the inputs propagate through them.
+        When predicted (a dictionary of already predicted digests) is
+        given, digests of dependencies that have not finished yet are
+        predicted too (see dependants_need_run_()).
+        """
+        if self.cache is None:
+            return ( None, False )
+
+        dep_digests = []
+        for task_dep_id in wrapper.dependencies:
+            task_dep = self.tasks[task_dep_id]
+            if (not predicted is None) and (not task_dep.completed):
+                digest = self.predict_cache_digest_(task_dep, predicted)
+            else:
+                digest = task_dep.cache_digest
+            if not digest is None:
+                dep_digests.append(digest)
+
+        key = wrapper.task.get_cache_key()
+        if key is None:
+            if len(dep_digests) == 0:
+                return ( None, False )
+            return ( compute_cache_digest(None, None, dep_digests), False )
+
+        return ( compute_cache_digest(type(wrapper.task).__name__, key, dep_digests), True )
+
+    def predict_cache_digest_(self, wrapper, predicted):
+        if not wrapper.id in predicted:
+            if (wrapper.state == TaskWrapper.DISPATCHED) and (not wrapper.completed):
+                # The running task computed its digest already
+                predicted[wrapper.id] = wrapper.cache_digest
+            else:
+                ( predicted[wrapper.id], _ ) = self.compute_cache_digest_(wrapper, predicted)
+        return predicted[wrapper.id]
+
+    def dependants_need_run_(self, wrapper, predicted=None):
+        """
+        Whether any (transitive) dependant of the task that needs cached
+        dependants (see Task.needs_cached_dependants()) would not be
+        restored from the task cache.
+        """
+        if predicted is None:
+            predicted = { wrapper.id: wrapper.cache_digest }
+        for successor in list(wrapper.successors):
+            if not successor.task.needs_cached_dependants():
+                continue
+            try:
+                ( digest, cacheable ) = self.compute_cache_digest_(successor, predicted)
+            except Exception as e:
+                self.ctl.dprint("Cannot predict cache digest of %s: %s", successor.id, e)
+                return True
+            predicted[successor.id] = digest
+            if (not cacheable) or (not self.cache.has(digest)):
+                return True
+            if self.dependants_need_run_(successor, predicted):
+                return True
+        return False
+
     def task_run_inner(self, wrapper, task_id, can_be_run):
         data = {}
 
@@ -447,7 +1073,12 @@ class BuildScheduler:
             self.announce_task_started_(wrapper)
 
             try:
-                res = wrapper.task.execute()
+                ( wrapper.cache_digest, cacheable ) = self.compute_cache_digest_(wrapper)
+                if cacheable and wrapper.task.needs_cached_dependants() \
+                        and self.cache.has(wrapper.cache_digest) and self.dependants_need_run_(wrapper):
+                    wrapper.task.ctl.append_line_to_log_file('Not using task cache, some dependants have to be run.')
+                    cacheable = False
+                res = wrapper.task.execute(self.cache, wrapper.cache_digest if cacheable else None)
                 if (res == True) or (res is None):
                     res = {
                         'status': 'ok',
@@ -468,10 +1099,7 @@ class BuildScheduler:
                 #traceback.print_exc()
                 reason = '%s' % e
         else:
-            for task_dep_id in wrapper.dependencies:
-                task_dep = self.tasks[task_dep_id]
-                if task_dep.has_finished() and (not task_dep.has_completed_okay()):
-                    reason = 'dependency %s failed (or also skipped).' % task_dep_id
+            reason = 'dependency %s failed (or also skipped).' % wrapper.failed_dependency
             res = {
                 'status': 'skip',
                 'data': {}
@@ -494,9 +1122,12 @@ class BuildScheduler:
                     file = '<file title="%s" filename="%s" />\n' % ( f['title'], f['filename'])
                     report_xml = report_xml + file
 
-            if (not wrapper.task.ctl is None) and (len(wrapper.task.ctl.log_tail) > 0):
+            log_tail = []
+            if not wrapper.task.ctl is None:
+                log_tail = wrapper.task.ctl.get_log_tail()
+            if len(log_tail) > 0:
                 report_xml = report_xml + ' <log>\n'
-                for line in wrapper.task.ctl.log_tail:
+                for line in log_tail:
                     report_xml = report_xml + '  <logline>' + self.xml_escape_line(line) + '</logline>\n'
                 report_xml = report_xml + ' </log>\n'
 
@@ -505,17 +1136,39 @@ class BuildScheduler:
 
             self.report_file.write(report_xml)
 
+        # Restoring from the task cache says nothing about the duration of
+        # a real run (see TaskDurationHistory)
+        if can_be_run and ('duration' in report['attrs']) and (report['attrs'].get('cache') != 'hit'):
+            self.history.record(task_id, wrapper.task.get_type(), report['attrs']['duration'])
+
+        timeline_attrs = {}
+        for key in [ 'cache' ] + TaskController.USAGE_REPORT_ATTRS:
+            if key in report['attrs']:
+                timeline_attrs[key] = report['attrs'][key]
+        self.timeline.task_finished(task_id, wrapper.description, status, timeline_attrs)
+
         wrapper.set_status(status, reason)
         self.announce_task_finished_(wrapper)
         wrapper.set_done(res['data'])
 
         with self.guard:
+            wrapper.completed = True
             self.running_tasks_count = self.running_tasks_count - 1
 
             if can_be_run:
-                for m in wrapper.mutexes:
-                    self.task_mutexes [ m ] = False
-
+                self.release_resources_(wrapper)
+
+            # Only the successors are affected by the termination
+            for successor in wrapper.successors:
+                if successor.state != TaskWrapper.WAITING:
+                    continue
+                successor.pending_dependencies = successor.pending_dependencies - 1
+                if (status != 'ok') and (successor.failed_dependency is None):
+                    successor.failed_dependency = wrapper.id
+                if (successor.pending_dependencies == 0) or (successor.failed_dependency is not None):
+                    self.make_ready_(successor)
+
+            self.update_counters_()
             #print("Task finished, waking up (running now {})".format(self.running_tasks_count))
             self.guard.notify_all()
 
@@ -523,75 +1176,58 @@ class BuildScheduler:
     def process_queue(self):
         while True:
             with self.guard:
-                #print("Process queue running, tasks {}".format(len(self.queue)))
                 # Break inside the loop
                 while True:
-                    slot_available = self.running_tasks_count < self.max_workers
-                    task_available = len(self.queue) > 0
-                    #print("Queue: {} (running {})".format(len(self.queue), self.running_tasks_count))
-                    if slot_available and task_available:
+                    # Tasks with failed dependencies are dispatched
+                    # immediately (they are only reported).
+                    if len(self.skipped) > 0:
+                        ready_task = self.skipped.popleft()
+                        can_be_run = False
                         break
-                    if self.terminate and (not task_available):
-                        return
 
-                    #print("Queue waiting for free slots (running {}) or tasks (have {})".format(self.running_tasks_count, len(self.queue)))
-                    self.guard.wait()
-                    #print("Guard woken-up after waiting for free slots.")
+                    ready_task = self.pop_ready_task_()
+                    if ready_task is not None:
+                        can_be_run = True
+                        break
 
-                # We have some tasks in the queue and we can run at
-                # least one of them
-                ( ready_task_id, can_be_run )  = self.get_first_ready_task_id_()
-                #print("Ready task is {}".format(ready_task_id))
+                    if self.terminate and (self.pending_tasks_count == 0):
+                        return
 
-                if ready_task_id is None:
-                    #print("Queue waiting for new tasks to appear (have {})".format(len(self.queue)))
+                    #print("Queue waiting for free resources (running {}) or tasks (have {})".format(self.running_tasks_count, self.pending_tasks_count))
                     self.guard.wait()
-                    #print("Guard woken-up after no ready task.")
-                else:
-                    # Remove the task from the queue
-                    self.queue.remove(ready_task_id)
-
-                    ready_task = self.tasks[ready_task_id]
 
-                    # Need to update number of running tasks here and now
-                    # because the executor might start the execution later
-                    # and we would evaluate incorrectly the condition above
-                    # that we can start another task.
-                    self.running_tasks_count = self.running_tasks_count + 1
-
-                    #print("Ready is {}".format(ready_task))
-                    if can_be_run:
-                        for m in ready_task.mutexes:
-                            self.task_mutexes [ m ] = True
-                    #print("Actually starting task {}".format(ready_task_id))
-                    self.executor.submit(BuildScheduler.task_run_wrapper,
-                        self, ready_task, ready_task_id, can_be_run)
+                ready_task.state = TaskWrapper.DISPATCHED
+                self.pending_tasks_count = self.pending_tasks_count - 1
+
+                # Need to update number of running tasks here and now
+                # because the executor might start the execution later
+                # and we would evaluate incorrectly the condition above
+                # that we can start another task.
+                self.running_tasks_count = self.running_tasks_count + 1
+
+                if can_be_run:
+                    self.queued_tasks_count = self.queued_tasks_count - 1
+                    self.acquire_resources_(ready_task)
+                self.timeline.task_started(ready_task.id)
+                self.timeline.set_task_args(ready_task.id,
+                    mutexes=ready_task.mutexes,
+                    resources=ready_task.demands if can_be_run else {})
+                self.update_counters_()
+                self.executor.submit(BuildScheduler.task_run_wrapper,
+                    self, ready_task, ready_task.id, can_be_run)
+
+    def add_build_info(self, key, value):
+        """
+        Add attribute to the build information in the report.
+        """
+        self.build_info[key] = value
 
-    def get_first_ready_task_id_(self):
+    def append_to_report(self, xml):
         """
-        Return tuple of first task that can be run (or failed immediately)
-        with note whether the result is predetermined.
-        Returns None when no task can be run.
+        Append (well-formed) XML fragment to the report.
         """
-        # We assume self.guard was already acquired
-        # We use here the for ... else construct of Python (recall that else
-        # is taken when break is not used)
-        for task_id in self.queue:
-            task = self.tasks[task_id]
-            for task_dep_id in task.dependencies:
-                task_dep = self.tasks[ task_dep_id ]
-                if not task_dep.has_finished():
-                    break
-                # Failed dependency means we can return now
-                if task_dep.get_status() != 'ok':
-                    return ( task_id, False )
-            else:
-                for task_mutex in task.mutexes:
-                    if (task_mutex in self.task_mutexes) and self.task_mutexes[ task_mutex ]:
-                        break
-                else:
-                    return ( task_id, True )
-        return ( None, None )
+        if not self.report_file is None:
+            self.report_file.write(xml + "\n")
 
     def announce_task_started_(self, task):
         self.printer.print_starting(task.description + " ...")
@@ -616,9 +1252,7 @@ class BuildScheduler:
 
     def barrier(self):
         with self.guard:
-            #print("Barrier ({}, {})...".format(self.running_tasks_count, len(self.queue)))
-            while (self.running_tasks_count > 0) or (len(self.queue) > 0):
-                #print("Barrier waiting ({}, {})...".format(self.running_tasks_count, len(self.queue)))
+            while (self.running_tasks_count > 0) or (self.pending_tasks_count > 0):
                 self.guard.wait()
 
     def done(self):
@@ -627,14 +1261,31 @@ class BuildScheduler:
             self.guard.notify_all()
         self.barrier()
         self.close_report()
+        # Saved only now to cover also the tasks run after close_report()
+        # (i.e. generating the HTML report from it)
+        with self.ctl.open_downloadable_file('timeline.json', 'w') as f:
+            self.timeline.save(f)
+        self.history.save()
         self.executor.shutdown(True)
+        if not self.jobserver is None:
+            self.jobserver.close()
 
     def close_report(self):
         if not self.report_file is None:
             end_time = time.time()
-            self.report_file.write("<buildinfo started=\"{}\" duration=\"{}\" parallelism=\"{}\" />\n".format(
+            cache_info = ''
+            if not self.cache is None:
+                cache_info = ' cache-hits="{}" cache-misses="{}"'.format(self.cache.hits, self.cache.misses)
+                if not self.cache.remote is None:
+                    cache_info = cache_info + ' cache-downloads="{}" cache-uploads="{}"'.format(self.cache.remote.downloads, self.cache.remote.uploads)
+            for key in self.build_info:
+                cache_info = cache_info + ' {}={}'.format(key, quoteattr('{}'.format(self.build_info[key])))
+            if not self.artefact_store is None:
+                cache_info = cache_info + ' artefacts-published="{}" artefacts-deduplicated="{}"'.format(
+                    self.artefact_store.published, self.artefact_store.deduplicated)
+            self.report_file.write("<buildinfo started=\"{}\" duration=\"{}\" parallelism=\"{}\" timeline=\"timeline.json\"{} />\n".format(
                 self.start_date, ( end_time - self.start_timestamp ) * 1000,
-                self.max_workers
+                self.max_workers, cache_info
             ))
             self.report_file.write("</build>\n")
             self.report_file.close()
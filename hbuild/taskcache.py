@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import hashlib
+import http.client
+import json
+import os
+import queue
+import shutil
+import tarfile
+import tempfile
+import threading
+import urllib.parse
+
+from hbuild.workspace import get_tree_size
+
+def compute_cache_digest(kind, key, dependency_digests):
+    """
+    Compute digest identifying task result.
+
+    kind is the task class (name), key the (JSON-serializable) key declared
+    by the task and dependency_digests digests of tasks the task depends on.
+    """
+    content = json.dumps({
+        'kind': kind,
+        'key': key,
+        'deps': sorted(dependency_digests),
+    }, sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+SIZE_SUFFIXES = {
+    'K': 1000, 'M': 1000 ** 2, 'G': 1000 ** 3, 'T': 1000 ** 4,
+    'Ki': 1024, 'Mi': 1024 ** 2, 'Gi': 1024 ** 3, 'Ti': 1024 ** 4,
+}
+
+def parse_size(size):
+    """
+    Parse size given as a number with an optional suffix (the same
+    syntax as CCACHE_MAXSIZE: 20G is 20*10^9 bytes, 20Gi is 20*2^30),
+    returns number of bytes.
+    """
+    size = str(size).strip()
+    for suffix in sorted(SIZE_SUFFIXES, key=len, reverse=True):
+        if size.endswith(suffix):
+            return int(float(size[:-len(suffix)]) * SIZE_SUFFIXES[suffix])
+    return int(size)
+
+def is_safe_relative_path(path):
+    """
+    Whether the path stays inside the directory it is relative to (cache
+    entries might come from the shared tier, they must not write
+    anywhere else).
+    """
+    if (not isinstance(path, str)) or (path == '') or os.path.isabs(path):
+        return False
+    return not '..' in path.split('/')
+
+def relocate_data(value, old_root, new_root):
+    """
+    Replace old_root prefix of paths in task data (nested dictionaries and
+    lists) with new_root.
+    """
+    if isinstance(value, dict):
+        return { k: relocate_data(v, old_root, new_root) for ( k, v ) in value.items() }
+    if isinstance(value, list):
+        return [ relocate_data(v, old_root, new_root) for v in value ]
+    if isinstance(value, str) and ((value == old_root) or value.startswith(old_root + '/')):
+        return new_root + value[len(old_root):]
+    return value
+
+class TaskCache:
+    """
+    Local content-addressed cache of task results.
+
+    Each entry is a directory named after the digest of the task inputs
+    (see compute_cache_digest()). It contains meta.json with the data
+    returned by the task and its report attributes, artefacts/ with copies
+    of downloadable files and outputs/ with copies of files and directories
+    the task created in the build directory. Outputs are recorded relative
+    to the build directory and restored to the same place in the build
+    directory of the current run (paths in the task data are relocated
+    accordingly).
+
+    With max_size, least recently used entries are removed when the cache
+    grows over the limit (modification time of meta.json is the time of
+    the last use).
+    """
+
+    META_FILENAME = 'meta.json'
+
+    def __init__(self, directory, remote=None, max_size=None):
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Shared tier (HttpCacheTier) consulted on local misses
+        self.remote = remote
+        self.max_size = None if max_size is None else parse_size(max_size)
+        self.pruned = 0
+
+    def get_entry_dir(self, digest):
+        return os.path.join(self.directory, digest[0:2], digest)
+
+    def has_local(self, digest):
+        return os.path.exists(os.path.join(self.get_entry_dir(digest), TaskCache.META_FILENAME))
+
+    def has(self, digest):
+        """
+        Tell whether the entry is available, entries missing locally are
+        downloaded from the shared tier (if configured).
+        """
+        if self.has_local(digest):
+            return True
+        if self.remote is None:
+            return False
+        if not self.remote.download(digest, self.get_entry_dir(digest)):
+            return False
+        self.prune()
+        return True
+
+    def record_hit(self):
+        with self.lock:
+            self.hits = self.hits + 1
+
+    def record_miss(self):
+        with self.lock:
+            self.misses = self.misses + 1
+
+    def _copy(self, ctl, src, dest):
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if os.path.isdir(src):
+            os.makedirs(dest, exist_ok=True)
+            ctl.run_command([ 'cp', '-a', '--reflink=auto', src + '/.', dest ])
+        else:
+            ctl.run_command([ 'cp', '-a', '--reflink=auto', src, dest ])
+
+    def store(self, digest, ctl, data, attrs, outputs):
+        """
+        Store result of a task.
+
+        outputs is a list of absolute paths (files or directories) that
+        the task produced and that later tasks might use, they must be
+        inside the build directory.
+        """
+        entry_dir = self.get_entry_dir(digest)
+        if self.has_local(digest):
+            return
+        tmp_dir = '{}.tmp-{}-{}'.format(entry_dir, os.getpid(), threading.get_ident())
+        shutil.rmtree(tmp_dir, True)
+        os.makedirs(tmp_dir)
+
+        try:
+            files = []
+            for f in ctl.get_files():
+                src = ctl.get_artefact_absolute_path(f['filename'])
+                self._copy(ctl, src, os.path.join(tmp_dir, 'artefacts', f['filename']))
+                files.append(f)
+
+            build_root = os.path.abspath(ctl.build_directory)
+            stored_outputs = []
+            for index, path in enumerate(outputs):
+                path = os.path.abspath(path)
+                if not os.path.exists(path):
+                    continue
+                rel_path = os.path.relpath(path, build_root)
+                if not is_safe_relative_path(rel_path):
+                    raise Exception('Output {} is outside of the build directory.'.format(path))
+                self._copy(ctl, path, os.path.join(tmp_dir, 'outputs', '{}'.format(index)))
+                stored_outputs.append({
+                    'index': index,
+                    'path': rel_path,
+                })
+
+            meta = {
+                'data': data,
+                'attrs': attrs,
+                'files': files,
+                'outputs': stored_outputs,
+                'build-root': build_root,
+                'size': get_tree_size(tmp_dir),
+            }
+            with open(os.path.join(tmp_dir, TaskCache.META_FILENAME), 'w') as f:
+                json.dump(meta, f, indent=1, sort_keys=True)
+
+            try:
+                os.rename(tmp_dir, entry_dir)
+            except OSError:
+                # Somebody else was faster
+                return
+        finally:
+            shutil.rmtree(tmp_dir, True)
+
+        if not self.remote is None:
+            self.remote.upload(digest, entry_dir)
+        self.prune()
+
+    def restore(self, digest, ctl):
+        """
+        Restore outputs and artefacts of a cached task, returns meta
+        information about the entry (see store()).
+        """
+        entry_dir = self.get_entry_dir(digest)
+        meta_filename = os.path.join(entry_dir, TaskCache.META_FILENAME)
+        with open(meta_filename, 'r') as f:
+            meta = json.load(f)
+
+        # The entry might come from elsewhere (the shared tier)
+        for out in meta['outputs']:
+            if not is_safe_relative_path(out['path']):
+                raise Exception('Invalid output path {} in cache entry.'.format(out['path']))
+        for f in meta['files']:
+            if not is_safe_relative_path(f['filename']):
+                raise Exception('Invalid artefact name {} in cache entry.'.format(f['filename']))
+
+        # Mark the entry as recently used
+        os.utime(meta_filename)
+
+        build_root = os.path.abspath(ctl.build_directory)
+        meta['data'] = relocate_data(meta['data'], meta['build-root'], build_root)
+        for out in meta['outputs']:
+            src = os.path.join(entry_dir, 'outputs', '{}'.format(out['index']))
+            self._copy(ctl, src, os.path.join(build_root, out['path']))
+
+        for f in meta['files']:
+            src = os.path.join(entry_dir, 'artefacts', f['filename'])
+            if os.path.isdir(src):
+                self._copy(ctl, src, ctl.get_artefact_absolute_path(f['filename'], True))
+                ctl.files.append(f)
+            else:
+                ctl.add_downloadable_file(f['title'], f['filename'], src)
+
+        return meta
+
+    def prune(self):
+        """
+        Remove least recently used entries until the cache fits into its
+        maximum size.
+        """
+        if self.max_size is None:
+            return
+        with self.lock:
+            entries = []
+            total = 0
+            for prefix in os.listdir(self.directory):
+                prefix_dir = os.path.join(self.directory, prefix)
+                if not os.path.isdir(prefix_dir):
+                    continue
+                for name in os.listdir(prefix_dir):
+                    meta_filename = os.path.join(prefix_dir, name, TaskCache.META_FILENAME)
+                    try:
+                        with open(meta_filename, 'r') as f:
+                            size = json.load(f).get('size', 0)
+                        last_used = os.stat(meta_filename).st_mtime
+                    except (OSError, ValueError):
+                        # Unfinished (or foreign) entry
+                        continue
+                    entries.append(( last_used, size, os.path.join(prefix_dir, name) ))
+                    total = total + size
+
+            for ( last_used, size, entry_dir ) in sorted(entries):
+                if total <= self.max_size:
+                    break
+                # Renamed first so that the entry disappears at once
+                tmp_dir = '{}.prune-{}'.format(entry_dir, os.getpid())
+                try:
+                    os.rename(entry_dir, tmp_dir)
+                except OSError:
+                    continue
+                shutil.rmtree(tmp_dir, True)
+                total = total - size
+                self.pruned = self.pruned + 1
+
+class HttpCacheTier:
+    """
+    Shared tier of the task cache served over plain HTTP.
+
+    Each cache entry is transferred as an (uncompressed) tarball named
+    after its digest: GET /<digest> retrieves it, PUT /<digest> uploads it
+    (see hbuild/cacheserver.py for a matching server). At most
+    max_connections requests are in flight at once, connections are kept
+    alive and reused by the tasks running in parallel.
+
+    Any network error is treated as a cache miss (or a failed upload),
+    the build must never fail just because the shared cache is down.
+    """
+
+    def __init__(self, url, max_connections=4, timeout=60):
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme == 'https':
+            self.connection_class = http.client.HTTPSConnection
+        elif parsed.scheme == 'http':
+            self.connection_class = http.client.HTTPConnection
+        else:
+            raise ValueError("unsupported task cache URL `{}'".format(url))
+        self.netloc = parsed.netloc
+        self.prefix = parsed.path.rstrip('/') + '/'
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.lock = threading.Lock()
+        self.downloads = 0
+        self.uploads = 0
+        self.errors = 0
+
+    def _request(self, method, digest, body=None, headers={}, response_file=None):
+        """
+        Issue single request, returns the HTTP status.
+
+        Stale keep-alive connections are detected by the first failure
+        and the request is retried once over a fresh connection.
+        """
+        with self.slots:
+            for attempt in [ 1, 2 ]:
+                try:
+                    conn = self.idle.get_nowait()
+                    fresh = False
+                except queue.Empty:
+                    conn = self.connection_class(self.netloc, timeout=self.timeout)
+                    fresh = True
+                try:
+                    if hasattr(body, 'seek'):
+                        body.seek(0)
+                    conn.request(method, self.prefix + digest, body, headers)
+                    resp = conn.getresponse()
+                    if (resp.status == 200) and (not response_file is None):
+                        shutil.copyfileobj(resp, response_file, 1024 * 1024)
+                    else:
+                        resp.read()
+                    if resp.will_close:
+                        conn.close()
+                    else:
+                        self.idle.put(conn)
+                    return resp.status
+                except (OSError, http.client.HTTPException):
+                    conn.close()
+                    if fresh or (attempt == 2):
+                        raise
+
+    def _record(self, what):
+        with self.lock:
+            setattr(self, what, getattr(self, what) + 1)
+
+    def download(self, digest, entry_dir):
+        """
+        Download entry into entry_dir, returns whether it was found.
+        """
+        parent_dir = os.path.dirname(entry_dir)
+        os.makedirs(parent_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=parent_dir, prefix='.download-')
+        try:
+            tarball = os.path.join(tmp_dir, 'entry.tar')
+            with open(tarball, 'wb') as f:
+                status = self._request('GET', digest, response_file=f)
+            if status != 200:
+                return False
+            extracted = os.path.join(tmp_dir, 'entry')
+            with tarfile.open(tarball, 'r') as tar:
+                if hasattr(tarfile, 'tar_filter'):
+                    tar.extractall(extracted, filter='tar')
+                else:
+                    tar.extractall(extracted)
+            if not os.path.exists(os.path.join(extracted, TaskCache.META_FILENAME)):
+                return False
+            try:
+                os.rename(extracted, entry_dir)
+            except OSError:
+                # Somebody else was faster
+                pass
+            self._record('downloads')
+            return True
+        except (OSError, http.client.HTTPException, tarfile.TarError):
+            self._record('errors')
+            return False
+        finally:
+            shutil.rmtree(tmp_dir, True)
+
+    def upload(self, digest, entry_dir):
+        """
+        Upload entry (directory) to the shared tier.
+        """
+        try:
+            with tempfile.TemporaryFile(dir=os.path.dirname(entry_dir)) as f:
+                with tarfile.open(fileobj=f, mode='w') as tar:
+                    tar.add(entry_dir, '.')
+                size = f.tell()
+                status = self._request('PUT', digest, f, {
+                    'Content-Length': str(size),
+                    'Content-Type': 'application/x-tar',
+                })
+            if status in [ 200, 201, 204 ]:
+                self._record('uploads')
+            else:
+                self._record('errors')
+        except (OSError, http.client.HTTPException, tarfile.TarError):
+            self._record('errors')
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import json
+import threading
+import time
+
+class BuildTimeline:
+    """
+    Timeline of scheduler events exported in Chrome trace format.
+
+    The resulting JSON can be loaded into chrome://tracing or Perfetto.
+    Each task is a complete event on the track of the worker slot it ran
+    in, its arguments record when it was submitted and became ready, the
+    mutexes and resources it held and its result. Counter tracks show the
+    number of running tasks and the length of the ready queue.
+    """
+
+    PID = 1
+
+    def __init__(self, start_timestamp=None):
+        self.start = time.time() if start_timestamp is None else start_timestamp
+        self.lock = threading.Lock()
+        self.tasks = {}
+        self.events = []
+        self.free_slots = []
+        self.slot_count = 0
+
+    def now_(self):
+        return int((time.time() - self.start) * 1000000)
+
+    def get_record_(self, task_id):
+        if not task_id in self.tasks:
+            self.tasks[task_id] = {
+                'submitted': None,
+                'ready': None,
+                'started': None,
+                'slot': None,
+                'args': {},
+            }
+        return self.tasks[task_id]
+
+    def task_submitted(self, task_id):
+        with self.lock:
+            self.get_record_(task_id)['submitted'] = self.now_()
+
+    def task_ready(self, task_id):
+        with self.lock:
+            self.get_record_(task_id)['ready'] = self.now_()
+
+    def task_started(self, task_id):
+        """
+        Record task dispatch, returns id of the worker slot it occupies.
+        """
+        with self.lock:
+            if len(self.free_slots) > 0:
+                self.free_slots.sort()
+                slot = self.free_slots.pop(0)
+            else:
+                slot = self.slot_count
+                self.slot_count = self.slot_count + 1
+            record = self.get_record_(task_id)
+            record['started'] = self.now_()
+            record['slot'] = slot
+            return slot
+
+    def task_finished(self, task_id, description, result, attrs={}):
+        with self.lock:
+            now = self.now_()
+            record = self.get_record_(task_id)
+            args = dict(record['args'])
+            args.update(attrs)
+            args['result'] = result
+            for what in [ 'submitted', 'ready' ]:
+                if not record[what] is None:
+                    args[what + '_ms'] = record[what] / 1000
+            if (not record['ready'] is None) and (not record['started'] is None):
+                args['queued_ms'] = (record['started'] - record['ready']) / 1000
+            self.events.append({
+                'name': description,
+                'cat': 'task',
+                'ph': 'X',
+                'pid': BuildTimeline.PID,
+                'tid': record['slot'],
+                'ts': record['started'],
+                'dur': now - record['started'],
+                'args': dict(args, id=task_id),
+            })
+            self.free_slots.append(record['slot'])
+            del self.tasks[task_id]
+
+    def set_task_args(self, task_id, **kwargs):
+        with self.lock:
+            self.get_record_(task_id)['args'].update(kwargs)
+
+    def counters(self, **kwargs):
+        with self.lock:
+            self.events.append({
+                'name': 'tasks',
+                'ph': 'C',
+                'pid': BuildTimeline.PID,
+                'ts': self.now_(),
+                'args': kwargs,
+            })
+
+    def save(self, out):
+        """
+        Write the trace into given (opened) file.
+        """
+        with self.lock:
+            metadata = [ {
+                'name': 'process_name',
+                'ph': 'M',
+                'pid': BuildTimeline.PID,
+                'args': { 'name': 'build' },
+            } ]
+            for slot in range(self.slot_count):
+                metadata.append({
+                    'name': 'thread_name',
+                    'ph': 'M',
+                    'pid': BuildTimeline.PID,
+                    'tid': slot,
+                    'args': { 'name': 'slot {}'.format(slot) },
+                })
+            json.dump({
+                'traceEvents': metadata + self.events,
+                'displayTimeUnit': 'ms',
+                'otherData': {
+                    'started': self.start,
+                },
+            }, out)
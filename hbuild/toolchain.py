@@ -30,6 +30,12 @@
 
 from shutil import which
 import importlib.util
+import hashlib
+import os
+import re
+import subprocess
+
+_tool_versions = {}
 
 def check_tool(name, printer):
     printer.print_starting("Checking {} is installed.".format(name))
@@ -48,3 +54,56 @@ def check_package(name, printer):
         printer.print_fail(msg)
         raise NotImplementedError(msg)
     printer.print_ok("{} for Python found at {}".format(name, spec.origin))
+
+def get_tool_version(name):
+    """
+    Return first line of `name --version' (or None when the tool is not
+    available). The result is cached.
+    """
+    if name in _tool_versions:
+        return _tool_versions[name]
+    version = None
+    try:
+        res = subprocess.run([ name, '--version' ], stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, check=True)
+        lines = res.stdout.decode('utf-8', 'replace').splitlines()
+        if len(lines) > 0:
+            version = lines[0].strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    _tool_versions[name] = version
+    return version
+
+def get_tool_version_tuple(name):
+    """
+    Return version of the tool as a tuple of integers (e.g. (4, 4, 1)) or
+    None when unknown.
+    """
+    version = get_tool_version(name)
+    if version is None:
+        return None
+    match = re.search(r'([0-9]+(?:\.[0-9]+)+)', version)
+    if match is None:
+        return None
+    return tuple([ int(x) for x in match.group(1).split('.') ])
+
+def get_cross_toolchain_fingerprint():
+    """
+    Return digest identifying the installed HelenOS cross-compilers (names,
+    sizes and modification times of the files in $CROSS_PREFIX/bin) or None
+    when the toolchain is not found.
+    """
+    prefix = os.environ.get('CROSS_PREFIX', '/usr/local/cross')
+    bindir = os.path.join(prefix, 'bin')
+    try:
+        names = sorted(os.listdir(bindir))
+    except OSError:
+        return None
+    h = hashlib.sha256()
+    for name in names:
+        try:
+            st = os.stat(os.path.join(bindir, name))
+        except OSError:
+            continue
+        h.update('{}:{}:{}\n'.format(name, st.st_size, int(st.st_mtime)).encode('utf-8'))
+    return h.hexdigest()
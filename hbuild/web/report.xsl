@@ -168,6 +168,36 @@
                     <td>Build parallelism level</td>
                     <td><xsl:value-of select="buildinfo/@parallelism" /></td>
                 </tr>
+                <xsl:if test="buildinfo/@timeline">
+                    <tr class="result-ok">
+                        <td>Timeline</td>
+                        <td><a href="{buildinfo/@timeline}">Chrome trace</a> (open in <code>chrome://tracing</code> or Perfetto)</td>
+                    </tr>
+                </xsl:if>
+                <xsl:if test="buildinfo/@cache-hits">
+                    <tr class="result-ok">
+                        <td>Task cache hits / misses</td>
+                        <td><xsl:value-of select="buildinfo/@cache-hits" /> / <xsl:value-of select="buildinfo/@cache-misses" /></td>
+                    </tr>
+                </xsl:if>
+                <xsl:if test="buildinfo/@reused-from">
+                    <tr class="result-ok">
+                        <td>Results reused from</td>
+                        <td><a href="../build-{buildinfo/@reused-from}/">build <xsl:value-of select="buildinfo/@reused-from" /></a> (nothing changed since)</td>
+                    </tr>
+                </xsl:if>
+                <xsl:if test="buildinfo/@artefacts-published">
+                    <tr class="result-ok">
+                        <td>Artefacts published / already stored</td>
+                        <td><xsl:value-of select="buildinfo/@artefacts-published" /> / <xsl:value-of select="buildinfo/@artefacts-deduplicated" /></td>
+                    </tr>
+                </xsl:if>
+                <xsl:if test="buildinfo/@cache-downloads">
+                    <tr class="result-ok">
+                        <td>Shared task cache downloads / uploads</td>
+                        <td><xsl:value-of select="buildinfo/@cache-downloads" /> / <xsl:value-of select="buildinfo/@cache-uploads" /></td>
+                    </tr>
+                </xsl:if>
                 <xsl:for-each select="checkout[@alias!='']">
                     <xsl:sort select="alias" />
                     <tr class="result-ok">
@@ -405,6 +435,38 @@
             </tbody>
         </table>
         </xsl:if>
+
+        <xsl:if test="archive-benchmark">
+        <h3 id="archive-benchmark">Archive formats <xsl:copy-of select="$LINK_TO_TOP" /></h3>
+        <table>
+            <thead>
+                <tr>
+                    <th>Harbour</th>
+                    <th>Architecture</th>
+                    <th>tar</th>
+                    <th>tar.gz</th>
+                    <th>tar.xz</th>
+                    <th>tar.zst</th>
+                    <th>Log</th>
+                </tr>
+            </thead>
+            <tbody>
+                <xsl:for-each select="archive-benchmark">
+                    <xsl:sort select="@package" />
+                    <xsl:sort select="@arch" />
+                    <tr class="result-{@result}">
+                        <td><xsl:value-of select="@package" /></td>
+                        <td><xsl:value-of select="@arch" /></td>
+                        <td><xsl:value-of select="@tar-size" /> B</td>
+                        <td><xsl:apply-templates select="@gz-size" mode="archive-benchmark" /></td>
+                        <td><xsl:apply-templates select="@xz-size" mode="archive-benchmark" /></td>
+                        <td><xsl:apply-templates select="@zst-size" mode="archive-benchmark" /></td>
+                        <td><xsl:apply-templates select="." mode="log-link" /></td>
+                    </tr>
+                </xsl:for-each>
+            </tbody>
+        </table>
+        </xsl:if>
            
         
         <xsl:if test="count(*[@arch]) &gt; 0">
@@ -687,6 +749,10 @@
         <xsl:variable name="SECONDS" select="@duration div 1000" />
         <xsl:variable name="MINUTES" select="floor($SECONDS div 60)" />
         <xsl:variable name="HOURS" select="floor($MINUTES div 60)" />
+        <span>
+        <xsl:if test="@cpu-user">
+            <xsl:attribute name="title">CPU <xsl:value-of select="format-number(@cpu-user div 1000, '0.0')" />s user, <xsl:value-of select="format-number(@cpu-system div 1000, '0.0')" />s system; max RSS <xsl:value-of select="format-number(@max-rss div 1024, '0')" />MiB; <xsl:value-of select="@io-read" /> blocks read, <xsl:value-of select="@io-write" /> written<xsl:if test="@ccache-hits">; ccache <xsl:value-of select="@ccache-hits" /> hits, <xsl:value-of select="@ccache-misses" /> misses</xsl:if></xsl:attribute>
+        </xsl:if>
         <xsl:choose>
             <xsl:when test="$MINUTES &gt; 90">
                 <xsl:value-of select="$HOURS" /><xsl:text disable-output-escaping="yes"><![CDATA[&#8201;]]>h </xsl:text>
@@ -700,10 +766,21 @@
                 <xsl:value-of select="format-number($SECONDS, '#')" /><xsl:text disable-output-escaping="yes"><![CDATA[&#8201;]]>s</xsl:text>
             </xsl:otherwise>
         </xsl:choose>
+        </span>
         <!-- (<xsl:value-of select="format-number(@duration div 1000, '#.00')" />s) -->
+        <xsl:if test="@cache='hit'"> (cached)</xsl:if>
     </xsl:if>
 </xsl:template>
 
+<xsl:template match="@*" mode="archive-benchmark">
+    <xsl:variable name="FORMAT" select="substring-before(name(), '-size')" />
+    <xsl:variable name="ELEMENT" select=".." />
+    <xsl:value-of select="." /> B
+    (<xsl:value-of select="$ELEMENT/@*[name() = concat($FORMAT, '-ratio')]" />,
+    <xsl:value-of select="format-number($ELEMENT/@*[name() = concat($FORMAT, '-compress')] div 1000, '0.0')" />s /
+    <xsl:value-of select="format-number($ELEMENT/@*[name() = concat($FORMAT, '-decompress')] div 1000, '0.0')" />s)
+</xsl:template>
+
 <xsl:template match="*" mode="log-dump">
 <xsl:if test="count(log/logline) > 0">
 <tr class="logdump log-{generate-id(.)}">
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Private copies (workspaces) of source trees.
+
+Tasks that build in the source tree (or write into it) need their own
+copy of the checkout. Instead of copying every file, the cheapest
+available method is used:
+
+ - reflink: copy-on-write clones of files (FICLONE), only on file systems
+   supporting it (Btrfs, XFS, ...)
+ - hardlink: a farm of hard links, files are shared with the source tree
+   and the task must not modify them in place (changed files are always
+   replaced, see update_tree())
+ - worktree: git worktree checked-out from the source repository (only
+   when the source tree is a clean Git checkout)
+ - rsync: plain copy (always works)
+"""
+
+import fcntl
+import filecmp
+import os
+import shutil
+import tempfile
+import time
+
+# ioctl number of FICLONE (see linux/fs.h)
+FICLONE = 0x40049409
+
+ALL_METHODS = [ 'reflink', 'hardlink', 'worktree', 'rsync' ]
+
+def get_tree_size(root, skip=[]):
+    """
+    Return total size (in bytes) of regular files in the tree.
+    """
+    total = 0
+    for ( dirpath, dirnames, filenames ) in os.walk(root):
+        if dirpath == root:
+            dirnames[:] = [ d for d in dirnames if not d in skip ]
+        for name in filenames:
+            try:
+                st = os.lstat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            total = total + st.st_size
+    return total
+
+def find_regular_file(root):
+    for ( dirpath, dirnames, filenames ) in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if os.path.isfile(path) and not os.path.islink(path):
+                return path
+    return None
+
+def supports_reflink(src_dir, dest_dir):
+    """
+    Check that files from src_dir can be cloned into dest_dir.
+    """
+    sample = find_regular_file(src_dir)
+    if sample is None:
+        return False
+    try:
+        with open(sample, 'rb') as src:
+            with tempfile.TemporaryFile(dir=dest_dir) as dest:
+                fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        return False
+
+def is_clean_git_checkout(ctl, src_dir):
+    if not os.path.exists(os.path.join(src_dir, '.git')):
+        return False
+    try:
+        res = ctl.run_command([ 'git', 'status', '--porcelain' ], cwd=src_dir, needs_output=True)
+    except Exception:
+        return False
+    return len(res['output']) == 0
+
+def create_by_reflink(ctl, src_dir, dest_dir):
+    if not supports_reflink(src_dir, dest_dir):
+        return False
+    ctl.run_command([ 'cp', '-a', '--reflink=always', src_dir + '/.', dest_dir ])
+    return True
+
+def create_by_hardlink(ctl, src_dir, dest_dir):
+    if os.stat(src_dir).st_dev != os.stat(dest_dir).st_dev:
+        return False
+    ctl.run_command([ 'cp', '-a', '--link', src_dir + '/.', dest_dir ])
+    return True
+
+def create_by_worktree(ctl, src_dir, dest_dir):
+    if not is_clean_git_checkout(ctl, src_dir):
+        return False
+    # Forget worktrees of previous runs that were removed since
+    ctl.run_command([ 'git', 'worktree', 'prune' ], cwd=src_dir)
+    ctl.run_command([ 'git', 'worktree', 'add', '--force', '--detach', dest_dir, 'HEAD' ], cwd=src_dir)
+    return True
+
+def create_by_rsync(ctl, src_dir, dest_dir):
+    ctl.run_command([ 'rsync', '-a', src_dir + '/', dest_dir ])
+    return True
+
+CREATORS = {
+    'reflink': create_by_reflink,
+    'hardlink': create_by_hardlink,
+    'worktree': create_by_worktree,
+    'rsync': create_by_rsync,
+}
+
+def clear_directory(path):
+    for name in os.listdir(path):
+        full = os.path.join(path, name)
+        if os.path.isdir(full) and not os.path.islink(full):
+            shutil.rmtree(full)
+        else:
+            os.remove(full)
+
+def create_workspace(ctl, src_dir, dest_dir, methods=None):
+    """
+    Populate (empty) dest_dir with the contents of src_dir using the first
+    method that works. Returns information about the created workspace:
+    the method used, how long it took (in ms), size of the tree and how
+    many bytes were not copied (shared with the source tree).
+    """
+    if methods is None:
+        methods = ALL_METHODS
+    src_dir = os.path.abspath(src_dir)
+    dest_dir = os.path.abspath(dest_dir)
+    os.makedirs(dest_dir, exist_ok=True)
+    clear_directory(dest_dir)
+
+    for method in methods:
+        start_time = time.time()
+        try:
+            created = CREATORS[method](ctl, src_dir, dest_dir)
+        except Exception as e:
+            ctl.append_line_to_log_file('Workspace via {} failed: {}'.format(method, e))
+            clear_directory(dest_dir)
+            created = False
+        if not created:
+            continue
+        duration = time.time() - start_time
+
+        size = get_tree_size(src_dir)
+        if method in [ 'reflink', 'hardlink' ]:
+            saved = size
+        elif method == 'worktree':
+            # Only the repository metadata are not copied
+            saved = size - get_tree_size(src_dir, [ '.git' ])
+        else:
+            saved = 0
+
+        ctl.append_line_to_log_file('Workspace {} created via {} in {:.1f}s ({:.1f}MiB not copied).'.format(
+            dest_dir, method, duration, saved / (1024 * 1024)))
+        return {
+            'method': method,
+            'duration': duration * 1000,
+            'size': size,
+            'saved': saved,
+        }
+
+    raise Exception('Failed to create workspace {} from {}.'.format(dest_dir, src_dir))
+
+def is_same_file(src, dest):
+    try:
+        st_dest = os.lstat(dest)
+    except OSError:
+        return False
+    if os.path.islink(src):
+        return os.path.islink(dest) and (os.readlink(src) == os.readlink(dest))
+    if os.path.islink(dest) or (not os.path.isfile(dest)):
+        return False
+    if os.lstat(src).st_size != st_dest.st_size:
+        return False
+    return filecmp.cmp(src, dest, False)
+
+def update_tree(src_dir, dest_dir, keep=[], exclude=[ '.git' ]):
+    """
+    Make dest_dir identical to src_dir, rewriting only files with
+    different contents (they get current modification time, unchanged
+    ones keep theirs so that build tools see only the real changes).
+    Changed files are replaced, not rewritten in place, thus the tree
+    can be a hard link farm. Top-level entries named in keep are left
+    untouched, entries named in exclude (repository metadata by default)
+    are skipped at any level.
+
+    Returns number of updated (including added and removed) files.
+    """
+    updated = 0
+    for ( dirpath, dirnames, filenames ) in os.walk(src_dir):
+        rel = os.path.relpath(dirpath, src_dir)
+        target_dir = os.path.normpath(os.path.join(dest_dir, rel))
+        dirnames[:] = [ d for d in dirnames if not d in exclude ]
+        filenames = [ f for f in filenames if not f in exclude ]
+        if rel == '.':
+            dirnames[:] = [ d for d in dirnames if not d in keep ]
+            filenames = [ f for f in filenames if not f in keep ]
+
+        # Directory (or a symbolic link to one) in the source, something
+        # else in the destination
+        if os.path.islink(target_dir) or (os.path.lexists(target_dir) and not os.path.isdir(target_dir)):
+            os.remove(target_dir)
+        os.makedirs(target_dir, exist_ok=True)
+
+        # Symbolic links to directories are listed among directories
+        for name in [ d for d in dirnames if os.path.islink(os.path.join(dirpath, d)) ]:
+            filenames.append(name)
+            dirnames.remove(name)
+
+        for name in filenames:
+            src = os.path.join(dirpath, name)
+            dest = os.path.join(target_dir, name)
+            if is_same_file(src, dest):
+                continue
+            if os.path.isdir(dest) and not os.path.islink(dest):
+                shutil.rmtree(dest)
+            tmp = dest + '.update-tmp'
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), tmp)
+            else:
+                shutil.copyfile(src, tmp)
+                shutil.copymode(src, tmp)
+            os.replace(tmp, dest)
+            updated = updated + 1
+
+    # Remove what is no longer in the source
+    for ( dirpath, dirnames, filenames ) in os.walk(dest_dir):
+        rel = os.path.relpath(dirpath, dest_dir)
+        source_dir = os.path.normpath(os.path.join(src_dir, rel))
+        dirnames[:] = [ d for d in dirnames if not d in exclude ]
+        filenames = [ f for f in filenames if not f in exclude ]
+        if rel == '.':
+            dirnames[:] = [ d for d in dirnames if not d in keep ]
+            filenames = [ f for f in filenames if not f in keep ]
+        for name in list(dirnames):
+            dest = os.path.join(dirpath, name)
+            src = os.path.join(source_dir, name)
+            if os.path.islink(dest):
+                # Not descended into, handled as a file
+                filenames.append(name)
+            elif os.path.islink(src) or not os.path.isdir(src):
+                shutil.rmtree(dest)
+                dirnames.remove(name)
+                updated = updated + 1
+        for name in filenames:
+            if not os.path.lexists(os.path.join(source_dir, name)):
+                os.remove(os.path.join(dirpath, name))
+                updated = updated + 1
+
+    return updated
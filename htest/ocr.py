@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Recognition of text on the (graphical) HelenOS console.
+
+The console uses a fixed 8x16 font, the screen is split into cells and
+each cell is looked up in a table of known glyphs compiled from ocr.sed
+(the table is shared with test-in-vm.sh).
+"""
+
+import hashlib
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+CELL_WIDTH = 8
+CELL_HEIGHT = 16
+
+# Part of the QEMU screen with the console: x, y, width, height
+CONSOLE_AREA = ( 4, 26, 640, 480 )
+
+# Cells not found in the glyph table
+UNKNOWN_GLYPH = '?'
+
+# Pixels darker than half of the intensity are black (ink), luma is
+# computed with Rec. 709 weights (scaled by 10000).
+LUMA_WEIGHTS = ( 2126, 7152, 722 )
+LUMA_THRESHOLD = 1275000
+
+def load_glyphs(sed_filename):
+    """
+    Compile glyph table from ocr.sed.
+
+    Each line has the form s:PIXELS:CHARACTER: where PIXELS are the 8x16
+    cell pixels row by row (0 for black, F for white). Returns dictionary
+    mapping packed cell (16 bytes, one per row, most significant bit being
+    the leftmost pixel, set for black) to the character.
+    """
+    glyphs = {}
+    with open(sed_filename) as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line.startswith('s:'):
+                continue
+            pixels, sep, char = line[2:].partition(':')
+            if not char.endswith(':'):
+                continue
+            char = char[:-1]
+            if char.startswith('\\'):
+                char = char[1:]
+            if (len(pixels) != CELL_WIDTH * CELL_HEIGHT) or (len(pixels.strip('0F')) > 0):
+                # The catch-all rule for unknown cells
+                continue
+            key = bytearray()
+            for row in range(CELL_HEIGHT):
+                value = 0
+                for bit in pixels[row * CELL_WIDTH:(row + 1) * CELL_WIDTH]:
+                    value = (value << 1) | (1 if bit == '0' else 0)
+                key.append(value)
+            # First matching rule wins in sed
+            glyphs.setdefault(bytes(key), char)
+    return glyphs
+
+def read_ppm(filename):
+    """
+    Read binary RGB PPM (P6, as written by QEMU screendump).
+    Returns tuple (width, height, pixels) with pixels as bytes of RGB
+    triplets row by row. Raises ValueError on malformed or incomplete
+    file.
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    # Header: magic, width, height, maxval separated by whitespace
+    # (with possible comments), then a single whitespace before the data
+    fields = []
+    pos = 0
+    while len(fields) < 4:
+        while (pos < len(data)) and data[pos:pos + 1].isspace():
+            pos = pos + 1
+        if data[pos:pos + 1] == b'#':
+            while (pos < len(data)) and data[pos:pos + 1] != b'\n':
+                pos = pos + 1
+            continue
+        start = pos
+        while (pos < len(data)) and not data[pos:pos + 1].isspace():
+            pos = pos + 1
+        if start == pos:
+            raise ValueError("Truncated PPM header in {}".format(filename))
+        fields.append(data[start:pos])
+    pos = pos + 1
+
+    if fields[0] != b'P6':
+        raise ValueError("{} is not a binary PPM".format(filename))
+    width, height, maxval = [ int(x) for x in fields[1:] ]
+    if maxval != 255:
+        raise ValueError("Unsupported PPM depth (maxval {})".format(maxval))
+    size = width * height * 3
+    if len(data) < pos + size:
+        raise ValueError("Truncated PPM data in {}".format(filename))
+    return ( width, height, data[pos:pos + size] )
+
+class ConsoleOcr:
+    """
+    Converts screenshots of the console to text.
+    """
+
+    def __init__(self, sed_filename, use_numpy=True):
+        self.glyphs = load_glyphs(sed_filename)
+        self.use_numpy = use_numpy and not numpy is None
+
+    def recognize_file(self, filename):
+        """
+        Return lines of text on the console captured in PPM file.
+        """
+        width, height, pixels = read_ppm(filename)
+        return self.recognize(width, height, pixels)
+
+    def get_geometry(self, width, height):
+        """
+        Return position and size (in cells) of the console on a screen of
+        given size as tuple (x, y, cols, rows).
+        """
+        x0, y0, area_width, area_height = CONSOLE_AREA
+        area_width = max(0, min(area_width, width - x0))
+        area_height = max(0, min(area_height, height - y0))
+        return ( x0, y0, area_width // CELL_WIDTH, area_height // CELL_HEIGHT )
+
+    def recognize(self, width, height, pixels):
+        x0, y0, cols, rows = self.get_geometry(width, height)
+        return self.recognize_rows(width, height, pixels, 0, rows)
+
+    def recognize_rows(self, width, height, pixels, first_row, row_count):
+        """
+        Recognize row_count lines of text starting with first_row.
+        """
+        x0, y0, cols, rows = self.get_geometry(width, height)
+        row_count = max(0, min(row_count, rows - first_row))
+        if (cols == 0) or (row_count == 0):
+            return []
+        y0 = y0 + first_row * CELL_HEIGHT
+
+        if self.use_numpy:
+            cells = self.pack_cells_numpy(width, height, pixels, x0, y0, cols, row_count)
+        else:
+            cells = self.pack_cells(width, pixels, x0, y0, cols, row_count)
+
+        lines = []
+        for r in range(row_count):
+            line = []
+            for c in range(cols):
+                start = (r * cols + c) * CELL_HEIGHT
+                line.append(self.glyphs.get(cells[start:start + CELL_HEIGHT], UNKNOWN_GLYPH))
+            lines.append(''.join(line))
+        return lines
+
+    def pack_cells_numpy(self, width, height, pixels, x0, y0, cols, rows):
+        """
+        Pack the cells (see load_glyphs) into one bytes object, cells
+        ordered row by row.
+        """
+        image = numpy.frombuffer(pixels, dtype=numpy.uint8, count=width * height * 3).reshape(height, width, 3)
+        area = image[y0:y0 + rows * CELL_HEIGHT, x0:x0 + cols * CELL_WIDTH].astype(numpy.uint32)
+        luma = area[:, :, 0] * LUMA_WEIGHTS[0] + area[:, :, 1] * LUMA_WEIGHTS[1] + area[:, :, 2] * LUMA_WEIGHTS[2]
+        ink = luma < LUMA_THRESHOLD
+        # (rows, cell row, cols, cell column) -> one byte per cell row
+        packed = numpy.packbits(ink.reshape(rows, CELL_HEIGHT, cols, CELL_WIDTH), axis=3)
+        return packed.reshape(rows, CELL_HEIGHT, cols).transpose(0, 2, 1).tobytes()
+
+    def pack_cells(self, width, pixels, x0, y0, cols, rows):
+        """
+        Same as pack_cells_numpy but in plain Python.
+        """
+        red = [ v * LUMA_WEIGHTS[0] for v in range(256) ]
+        green = [ v * LUMA_WEIGHTS[1] for v in range(256) ]
+        blue = [ v * LUMA_WEIGHTS[2] for v in range(256) ]
+        cells = bytearray(rows * cols * CELL_HEIGHT)
+        for y in range(rows * CELL_HEIGHT):
+            r, dy = divmod(y, CELL_HEIGHT)
+            start = ((y0 + y) * width + x0) * 3
+            line = pixels[start:start + cols * CELL_WIDTH * 3]
+            for c in range(cols):
+                value = 0
+                for i in range(c * CELL_WIDTH * 3, (c + 1) * CELL_WIDTH * 3, 3):
+                    value = value << 1
+                    if red[line[i]] + green[line[i + 1]] + blue[line[i + 2]] < LUMA_THRESHOLD:
+                        value = value | 1
+                cells[(r * cols + c) * CELL_HEIGHT + dy] = value
+        return bytes(cells)
+
+class ConsoleScreenReader:
+    """
+    Recognizes text on consecutive screenshots of the same console.
+
+    Screenshots identical to the previous one are not recognized at all,
+    otherwise only rows of cells that changed are recognized again.
+    """
+
+    def __init__(self, ocr):
+        self.ocr = ocr
+        self.frame_digest = None
+        self.row_digests = []
+        self.lines = []
+        self.statistics = {
+            'frames': 0,
+            'frames-unchanged': 0,
+            'rows-recognized': 0,
+            'rows-reused': 0,
+        }
+
+    def read_file(self, filename):
+        """
+        Return lines of text on the console captured in PPM file.
+        """
+        width, height, pixels = read_ppm(filename)
+        return self.read(width, height, pixels)
+
+    def read(self, width, height, pixels):
+        self.statistics['frames'] += 1
+        frame_digest = ( width, height, hashlib.blake2b(pixels, digest_size=16).digest() )
+        if frame_digest == self.frame_digest:
+            self.statistics['frames-unchanged'] += 1
+            self.statistics['rows-reused'] += len(self.lines)
+            return list(self.lines)
+
+        if (self.frame_digest is None) or (self.frame_digest[0:2] != frame_digest[0:2]):
+            # Different geometry, nothing to reuse
+            self.row_digests = []
+            self.lines = []
+        self.frame_digest = frame_digest
+
+        row_digests = self.get_row_digests(width, height, pixels)
+        lines = []
+        row = 0
+        while row < len(row_digests):
+            if (row < len(self.row_digests)) and (self.row_digests[row] == row_digests[row]):
+                lines.append(self.lines[row])
+                self.statistics['rows-reused'] += 1
+                row = row + 1
+                continue
+            # Recognize all consecutive changed rows at once
+            count = 1
+            while (row + count < len(row_digests)) and \
+                    ((row + count >= len(self.row_digests)) or (self.row_digests[row + count] != row_digests[row + count])):
+                count = count + 1
+            lines.extend(self.ocr.recognize_rows(width, height, pixels, row, count))
+            self.statistics['rows-recognized'] += count
+            row = row + count
+
+        self.row_digests = row_digests
+        self.lines = lines
+        return list(lines)
+
+    def get_row_digests(self, width, height, pixels):
+        x0, y0, cols, rows = self.ocr.get_geometry(width, height)
+        digests = []
+        for r in range(rows):
+            h = hashlib.blake2b(digest_size=16)
+            for y in range(y0 + r * CELL_HEIGHT, y0 + (r + 1) * CELL_HEIGHT):
+                start = (y * width + x0) * 3
+                h.update(pixels[start:start + cols * CELL_WIDTH * 3])
+            digests.append(h.digest())
+        return digests
+
+# Engines by the glyph table file name (the table is compiled only once)
+_engines = {}
+
+def get_console_ocr(sed_filename):
+    if not sed_filename in _engines:
+        _engines[sed_filename] = ConsoleOcr(sed_filename)
+    return _engines[sed_filename]
@@ -31,8 +31,6 @@
 import logging
 import re
 
-from htest.utils import retries
-
 class ScenarioTask:
     """
     Base class for individual tasks that are executed in a scenario.
@@ -135,7 +133,7 @@ class ScenarioTaskCommand(ScenarioTask):
         # Wait until the command is fully displayed on the screen.
         # That is needed to properly detect the newly displayed lines.
         # FIXME: this will not work for long commands spanning multiple lines
-        for xxx in retries(timeout=60, interval=2, name="vterm-type", message="Failed to type command"):
+        def command_typed():
             self.machine.vterm = []
             self.machine.capture_vterm()
             lines = self.machine.vterm
@@ -146,7 +144,10 @@ class ScenarioTaskCommand(ScenarioTask):
                 if (cursor_symbol != '') and line.endswith(cursor_symbol):
                     line = line[0:-(len(cursor_symbol))]
                 if line.endswith(self.command.strip()):
-                    break
+                    return True
+            return False
+
+        self.machine.wait_for_vterm(command_typed, 60, "vterm-type", "Failed to type command")
 
         self.machine.vterm = []
         self.machine.type('\n')
@@ -156,7 +157,8 @@ class ScenarioTaskCommand(ScenarioTask):
         # supposed to be there. Meanwhile we check that the text that is
         # supposed to be there appears.
         asserted_text_found = not 'assert' in self.args
-        for xxx in retries(timeout=60, interval=2, name="vterm-run", message="Failed to run command"):
+        def command_finished():
+            nonlocal asserted_text_found
             self.logger.debug("self.vterm = {}".format(self.machine.vterm))
             self.machine.capture_vterm()
             lines = self.machine.vterm
@@ -173,7 +175,10 @@ class ScenarioTaskCommand(ScenarioTask):
             if self._grep_in_lines(prompt_re, lines):
                 if not asserted_text_found:
                     raise Exception('Missing expected text {} ...'.format(self.args['assert']))
-                break
+                return True
+            return False
+
+        self.machine.wait_for_vterm(command_finished, 60, "vterm-run", "Failed to run command")
         self.logger.info("Command '{}' done.".format(self.command))
 
 class ScenarioTaskCls(ScenarioTask):
@@ -59,6 +59,66 @@ def retries(n=None, interval=2, timeout=None, message="Operation timed-out (too
     logger.debug("timed-out, n={}, \"{}\"".format(n, message))
     raise Exception(message)
 
+class Backoff:
+    """
+    Waiting with growing intervals: polls start frequent and become rarer
+    (up to max_interval seconds) while nothing happens.
+    """
+
+    def __init__(self, min_interval=0.25, max_interval=2, factor=1.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.interval = min_interval
+
+    def reset(self):
+        self.interval = self.min_interval
+
+    def wait(self, limit):
+        """
+        Sleep for the current interval (at most limit seconds).
+        """
+        time.sleep(max(0, min(self.interval, limit)))
+        self.interval = min(self.interval * self.factor, self.max_interval)
+
+def wait_for(condition, timeout, message="Operation timed-out", name="", wait_for_event=None, abort=None):
+    """
+    Wait until condition() returns a true value (which is returned), for
+    at most timeout seconds. Throws exception on time-out.
+
+    wait_for_event(limit) shall block until something that might change
+    the condition happens (or limit seconds elapse), without it the
+    condition is polled with growing intervals.
+    abort() might return a (true) reason why waiting makes no sense
+    anymore (e.g. process exited), an exception is thrown then.
+    """
+
+    if name != "":
+        name = "-" + name
+    logger = logging.getLogger("wait" + name)
+
+    if wait_for_event is None:
+        wait_for_event = Backoff().wait
+
+    start = time.monotonic()
+    deadline = start + timeout
+    n = 0
+    while True:
+        n = n + 1
+        result = condition()
+        if result:
+            logger.debug("done after {:.2f}s, n={}, \"{}\"".format(time.monotonic() - start, n, message))
+            return result
+        if abort is not None:
+            reason = abort()
+            if reason:
+                raise Exception("{} ({})".format(message, reason))
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logger.debug("timed-out, n={}, \"{}\"".format(n, message))
+            raise Exception(message)
+        wait_for_event(remaining)
+
 def format_command(cmd):
     """
     Escape shell command given as list of arguments.
@@ -32,12 +32,14 @@ import os
 import subprocess
 import logging
 
+from htest.utils import wait_for, Backoff
+
 class VMManager:
     """
     Keeps track of running virtual machines.
     """
 
-    def __init__(self, controller, architecture, vm_config, boot_image, disk_image, memory_amount, headless, extra_opts):
+    def __init__(self, controller, architecture, vm_config, boot_image, disk_image, memory_amount, headless, extra_opts, serial_console=None):
         self.controller_class = controller
         self.architecture = architecture
         self.vm_config = vm_config
@@ -46,6 +48,7 @@ class VMManager:
         self.memory_amount = memory_amount
         self.headless = headless
         self.extra_options = extra_opts
+        self.serial_console = serial_console
         self.instances = {}
         self.last = None
 
@@ -56,6 +59,12 @@ class VMManager:
         self.instances[name].memory = self.memory_amount
         self.instances[name].is_headless = self.headless
         self.instances[name].extra_options = self.extra_options
+        if self.serial_console is not None:
+            dump = self.serial_console
+            if name != 'default':
+                base, ext = os.path.splitext(dump)
+                dump = '{}-{}{}'.format(base, name, ext)
+            self.instances[name].serial_console_dump = dump
         self.last = name
         return self.instances[name]
 
@@ -73,6 +82,7 @@ class VMManager:
     def terminate(self, vterm_dump_filename, last_screenshot_filename):
         for i in self.instances:
             self.instances[i].terminate()
+            self.instances[i].log_capture_statistics()
         if vterm_dump_filename is not None:
             with open(vterm_dump_filename, 'w') as f:
                 for i in self.instances:
@@ -109,6 +119,9 @@ class VMController:
         self.extra_options = []
         # Are we headless (patched by VMM manager)
         self.is_headless = False
+        # Where to store the serial console output when the console shall
+        # be read from the serial port (patched by VMM manager)
+        self.serial_console_dump = None
         pass
 
     def is_supported(self, arch):
@@ -200,12 +213,96 @@ class VMController:
                 self.full_vterm.append(lines[i])
                 self.vterm.append(lines[i])
 
+    def update_vterm_from_history(self, lines):
+        """
+        Update self.vterm and self.full_vterm from the whole history of the
+        terminal (for controllers that have it, e.g. from a serial console).
+        Like with capture_vterm(), the last seen line is always reported
+        again as it might have been incomplete.
+        """
+        lines = [l.strip() for l in lines]
+        start = min(len(self.full_vterm), len(lines))
+        if start > 0:
+            start = start - 1
+            self.full_vterm = self.full_vterm[0:start]
+            if len(self.vterm) > 0:
+                self.vterm = self.vterm[0:-1]
+        for l in lines[start:]:
+            self.full_vterm.append(l)
+            self.vterm.append(l)
+
+    def wait_for_userspace(self, timeout, max_interval):
+        """
+        Wait until the machine boots into userspace (i.e. until the welcome
+        message appears in the terminal).
+        """
+        def booted():
+            self.vterm = []
+            self.capture_vterm()
+            for l in self.vterm:
+                if l.find('to see a few survival tips') != -1:
+                    return True
+            return False
+
+        self.wait_for_vterm(booted, timeout, "vterm", "Failed to boot into userspace", max_interval)
+
+    def wait_for_vterm(self, condition, timeout, name, message, max_interval=2):
+        """
+        Wait until condition() returns a true value (see htest.utils.wait_for),
+        condition() is expected to capture the terminal and look for some
+        text. Terminal is polled at most every max_interval seconds, often
+        when its contents change.
+        """
+        return wait_for(condition, timeout, message=message, name=name,
+            wait_for_event=self.get_vterm_event_waiter(max_interval),
+            abort=self.get_abort_reason)
+
+    def get_vterm_event_waiter(self, max_interval):
+        """
+        Return function waiting until terminal contents might have changed
+        (see wait_for_event of htest.utils.wait_for). Reimplement when the
+        controller is notified about the changes, by default the terminal
+        is polled more often shortly after it changed.
+        """
+        backoff = Backoff(max_interval=max_interval)
+        last_seen = [ None ]
+
+        def wait(limit):
+            current = ( len(self.full_vterm), self.full_vterm[-1] if len(self.full_vterm) > 0 else None )
+            if current != last_seen[0]:
+                backoff.reset()
+                last_seen[0] = current
+            backoff.wait(limit)
+
+        return wait
+
+    def get_abort_reason(self):
+        """
+        Reimplement to return reason (string) why waiting for the terminal
+        makes no sense (e.g. the emulator crashed).
+        """
+        return None
+
     def capture_vterm_impl(self):
         """
         Do not call but reimplement in subclass.
         """
         return []
 
+    def get_capture_statistics(self):
+        """
+        Reimplement to return statistics of screen captures (dictionary
+        name -> count), e.g. how many captures were not recognized again
+        as the screen did not change.
+        """
+        return {}
+
+    def log_capture_statistics(self):
+        stats = self.get_capture_statistics()
+        if len(stats) > 0:
+            self.logger.info("Screen captures: {}".format(
+                ', '.join([ '{}={}'.format(k, stats[k]) for k in sorted(stats) ])))
+
     def get_vterm_cursor_symbol(self):
         """
         Reimplement if your controller represents cursor in vterm
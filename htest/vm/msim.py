@@ -37,7 +37,7 @@ import time
 
 from PIL import Image
 
-from htest.utils import retries, format_command, format_command_pipe
+from htest.utils import wait_for, Backoff, format_command, format_command_pipe
 from htest.vm.controller import VMController
 
 class MsimVMController(VMController):
@@ -54,6 +54,13 @@ class MsimVMController(VMController):
         self.boot_image = boot_image
         self.disk_image = disk_image
         self.x11_display = None
+        # Text of the last capture (screenshot is not taken again when
+        # the text did not change)
+        self.last_lines = None
+        self.capture_statistics = {
+            'captures': 0,
+            'screens-unchanged': 0,
+        }
 
     def is_supported(arch):
         return arch in 'mips32/msim'
@@ -159,18 +166,7 @@ class MsimVMController(VMController):
 
         self.logger.info("Machine started.")
 
-        uspace_booted = False
-        for xxx in retries(timeout=10*60, interval=5, name="vterm", message="Failed to boot into userspace"):
-            self.vterm = []
-            self.capture_vterm()
-            for l in self.vterm:
-                if l.find('to see a few survival tips') != -1:
-                    uspace_booted = True
-                    break
-            if uspace_booted:
-                break
-
-        assert uspace_booted
+        self.wait_for_userspace(timeout=10*60, max_interval=5)
 
         self.logger.info("Machine booted into userspace.")
 
@@ -197,11 +193,50 @@ class MsimVMController(VMController):
             os.remove(self.screendump_file)
         except IOError as e:
             pass
+        self._xdotool_key('alt+s')
+        self.capture_statistics['captures'] += 1
+
+        # XTerm prints the screen asynchronously, check for it often
+        lines = wait_for(self._read_screendump,
+            timeout=5, name="xterm-dump", message="Failed to read XTerm screendump",
+            wait_for_event=Backoff(min_interval=0.05, max_interval=1).wait)
+
+        # The screen looks the same when the text did not change
+        if (lines == self.last_lines) and os.path.exists(self.screenshot_filename):
+            self.capture_statistics['screens-unchanged'] += 1
+        else:
+            self._take_screenshot()
+        self.last_lines = lines
+
+        self.logger.debug("Captured text:")
+        for l in lines:
+            self.logger.debug("| " + l)
+        return lines
+
+    def _read_screendump(self):
+        """
+        Returns lines of the XTerm screendump or None when it is not
+        (completely) written yet.
+        """
+        try:
+            with open(self.screendump_file, 'r') as f:
+                lines = [ l.strip('\n') for l in f.readlines() ]
+                if len(lines) == 24:
+                    return lines
+        except IOError as e:
+            pass
+        return None
+
+    def get_abort_reason(self):
+        if (self.xterm is not None) and (self.xterm.poll() is not None):
+            return "MSIM terminated with exit code {}".format(self.xterm.returncode)
+        return None
+
+    def _take_screenshot(self):
         try:
             os.remove(self.screenshot_filename)
         except IOError as e:
             pass
-        self._xdotool_key('alt+s')
         screenshooter = subprocess.Popen([
             'import',
             '-display', self.x11_display,
@@ -210,18 +245,8 @@ class MsimVMController(VMController):
         ])
         screenshooter.wait()
 
-        for xxx in retries(timeout=5, interval=1, name="xterm-dump", message="Failed to read XTerm screendump"):
-            try:
-                with open(self.screendump_file, 'r') as f:
-                    lines = [ l.strip('\n') for l in f.readlines() ]
-                    if len(lines) != 24:
-                        continue
-                    self.logger.debug("Captured text:")
-                    for l in lines:
-                        self.logger.debug("| " + l)
-                    return lines
-            except IOError as e:
-                pass
+    def get_capture_statistics(self):
+        return self.capture_statistics
 
     def terminate(self):
         if not self.booted:
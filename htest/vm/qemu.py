@@ -34,9 +34,10 @@ import logging
 import os
 import sys
 
-from PIL import Image
-
-from htest.utils import retries, format_command, format_command_pipe
+from htest.ocr import get_console_ocr, ConsoleScreenReader
+from htest.vm.serial import SerialConsole
+from htest.vm.qmp import QmpClient, get_key_values
+from htest.utils import format_command
 from htest.vm.controller import VMController
 
 class QemuVMController(VMController):
@@ -77,6 +78,9 @@ class QemuVMController(VMController):
         ],
     }
 
+    # How long (ms) each key is held (the default of HMP sendkey)
+    TYPE_HOLD_TIME = 100
+
     ocr_sed = os.path.join(
         os.path.dirname(os.path.realpath(sys.argv[0])),
         'ocr.sed'
@@ -89,46 +93,35 @@ class QemuVMController(VMController):
         self.name = name
         self.boot_image = boot_image
         self.disk_image = disk_image
+        # Skips recognition of unchanged parts of the screen
+        self.screen_reader = None
+        # Console on the serial port (when self.serial_console_dump is set)
+        self.serial_console = None
 
     def is_supported(arch):
         return arch in QemuVMController.config
 
-    def _get_image_dimensions(self, filename):
-        im = Image.open(filename)
-        width, height = im.size
-        im.close()
-        return ( width, height )
-
     def _check_is_up(self):
         if not self.booted:
             raise Exception("Machine not launched")
 
-    def _send_command(self, command):
+    def _execute(self, command, arguments=None):
         self._check_is_up()
-        self.logger.debug("Sending command '{}'".format(command))
-        command = command + '\n'
-        self.monitor.sendall(command.encode('utf-8'))
-
-    def _run_command(self, command):
-        proc = subprocess.Popen(command)
-        proc.wait()
-        if proc.returncode != 0:
-            raise Exception("Command {} failed.".format(command))
-
-    def _run_pipe(self, commands):
-        self.logger.debug("Running pipe {}".format(format_command_pipe(commands)))
-        procs = []
-        for command in commands:
-            inp = None
-            if len(procs) > 0:
-                inp = procs[-1].stdout
-            proc = subprocess.Popen(command, stdout=subprocess.PIPE, stdin=inp)
-            procs.append(proc)
-        procs[-1].communicate()
-
+        return self.qmp.execute(command, arguments)
+
+    def _create_chardev(self, cmd, name):
+        """
+        Add chardev connected to a new socket pair, returns our end of it.
+        """
+        ours, theirs = socket.socketpair()
+        self.qemu_fds.append(theirs)
+        cmd.append('-chardev')
+        cmd.append('socket,id={},fd={}'.format(name, theirs.fileno()))
+        return ours
 
     def boot(self, **kwargs):
-        self.monitor_file = self.get_temp('monitor')
+        # Sockets inherited by QEMU (closed here once it starts)
+        self.qemu_fds = []
         cmd = []
         for opt in QemuVMController.config[self.arch]:
             if opt == '{BOOT}':
@@ -142,165 +135,128 @@ class QemuVMController(VMController):
         if self.is_headless:
             cmd.append('-display')
             cmd.append('none')
-        cmd.append('-monitor')
-        cmd.append('unix:{},server,nowait'.format(self.monitor_file))
+        # QMP and serial console are connected already, no need to wait
+        # for QEMU to create the sockets
+        qmp_socket = self._create_chardev(cmd, 'qmp')
+        cmd.append('-mon')
+        cmd.append('chardev=qmp,mode=control')
+        serial_socket = None
+        if self.serial_console_dump is not None:
+            serial_socket = self._create_chardev(cmd, 'console')
+            cmd.append('-serial')
+            cmd.append('chardev:console')
         for opt in self.extra_options:
             cmd.append(opt)
         self.logger.debug("Starting QEMU: {}".format(format_command(cmd)))
 
-        self.proc = subprocess.Popen(cmd)
-        self.monitor = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        for xxx in retries(timeout=30, interval=2, name="ctl-socket", message="Failed to connect to QEMU control socket."):
-            try:
-                self.monitor.connect(self.monitor_file)
-                break
-            except FileNotFoundError:
-                pass
-            except ConnectionRefusedError:
-                pass
-            if self.proc.poll():
-                raise Exception("QEMU not started, aborting.")
+        self.proc = subprocess.Popen(cmd, pass_fds=[ fd.fileno() for fd in self.qemu_fds ])
+        for fd in self.qemu_fds:
+            fd.close()
+
+        self.qmp = QmpClient(qmp_socket)
+        try:
+            self.qmp.connect()
+        except Exception as ex:
+            self.proc.wait()
+            raise Exception("QEMU not started, aborting ({}).".format(ex))
+
+        if serial_socket is not None:
+            self.serial_console = SerialConsole(serial_socket, self.serial_console_dump)
 
         self.booted = True
         self.logger.info("Machine started.")
 
         # Skip past GRUB
-        self.type('\n')
-
-        uspace_booted = False
-        for xxx in retries(timeout=3*60, interval=5, name="vterm", message="Failed to boot into userspace"):
-            self.vterm = []
-            self.capture_vterm()
-            for l in self.vterm:
-                if l.find('to see a few survival tips') != -1:
-                    uspace_booted = True
-                    break
-            if uspace_booted:
-                break
+        self._type_keys('\n')
 
-        assert uspace_booted
+        self.wait_for_userspace(timeout=3*60, max_interval=5)
 
         self.logger.info("Machine booted into userspace.")
 
         return
 
+    def capture_vterm(self):
+        if self.serial_console is None:
+            VMController.capture_vterm(self)
+            return
+        self.update_vterm_from_history(self.serial_console.get_history())
+
+    def get_vterm_event_waiter(self, max_interval):
+        if self.serial_console is None:
+            return VMController.get_vterm_event_waiter(self, max_interval)
+        return self.serial_console.poll
+
+    def get_abort_reason(self):
+        if self.proc.poll() is not None:
+            return "QEMU terminated with exit code {}".format(self.proc.returncode)
+        if (self.serial_console is not None) and self.serial_console.closed:
+            return "serial console closed"
+        return None
+
+    def get_vterm_cursor_symbol(self):
+        if self.serial_console is None:
+            return VMController.get_vterm_cursor_symbol(self)
+        return ''
+
     def capture_vterm_impl(self):
         screenshot_full = self.get_temp('screen-full.ppm')
-        screenshot_term = self.get_temp('screen-term.png')
-        screenshot_text = self.get_temp('screen-term.txt')
 
         try:
             os.remove(screenshot_full)
         except IOError as e:
             pass
 
-        self._send_command('screendump ' + screenshot_full)
-
-        for xxx in retries(timeout=10, interval=1, name="scrdump", message="Failed to capture screen"):
-            try:
-                self._run_command([
-                    'convert',
-                    screenshot_full,
-                    '-crop', '640x480+4+26',
-                    '+repage',
-                    '-monochrome',
-                    '-colors', '2',
-                    screenshot_term
-                ])
-                break
-            except:
-                pass
-
-        width, height = self._get_image_dimensions(screenshot_term)
-        cols = width // 8
-        rows = height // 16
-        self._run_pipe([
-            [
-                'convert',
-                screenshot_term,
-                '-crop', '{}x{}'.format(cols * 8, rows * 16),
-                '+repage',
-                '-crop', '8x16',
-                '+repage',
-                '+adjoin',
-                'txt:-',
-            ],
-            [
-                'sed',
-                '-e', 's|[0-9]*,[0-9]*: ([^)]*)[ ]*#\\([0-9A-Fa-f]\\{6\\}\\).*|\\1|',
-                '-e', 's:^#.*:@:',
-                '-e', 's#000000#0#g',
-                '-e', 's#FFFFFF#F#',
-            ],
-            [ 'tee', self.get_temp('1.txt') ],
-            [
-                'sed',
-                '-e', ':a',
-                '-e', 'N;s#\\n##;s#^@##;/@$/{s#@$##p;d}',
-                '-e', 't a',
-            ],
-            [ 'tee', self.get_temp('2.txt') ],
-            [
-                'sed',
-                '-f', QemuVMController.ocr_sed,
-            ],
-            [
-                'sed',
-                '/../s#.*#?#',
-            ],
-            [ 'tee', self.get_temp('3.txt') ],
-            [
-                'paste',
-                '-sd', '',
-            ],
-            [
-                'fold',
-                '-w', '{}'.format(cols),
-            ],
-            [ 'tee', self.get_temp('4.txt') ],
-            [
-                'head',
-                '-n', '{}'.format(rows),
-            ],
-            [
-                'tee',
-                screenshot_text,
-            ]
-        ])
+        # The screenshot is written when the command completes
+        self._execute('screendump', { 'filename': os.path.abspath(screenshot_full) })
+
+        if self.screen_reader is None:
+            self.screen_reader = ConsoleScreenReader(get_console_ocr(QemuVMController.ocr_sed))
+        lines = self.screen_reader.read_file(screenshot_full)
 
         self.screenshot_filename = screenshot_full
 
-        with open(screenshot_text, 'r') as f:
-            lines = [ l.strip('\n') for l in f.readlines() ]
-            self.logger.debug("Captured text:")
-            for l in lines:
-                self.logger.debug("| " + l)
-            return lines
+        self.logger.debug("Captured text:")
+        for l in lines:
+            self.logger.debug("| " + l)
+        return lines
+
+    def get_capture_statistics(self):
+        if self.serial_console is not None:
+            return {
+                'serial-bytes': self.serial_console.received,
+            }
+        if self.screen_reader is None:
+            return {}
+        return self.screen_reader.statistics
 
     def terminate(self):
         if not self.booted:
             return
-        self._send_command('quit')
+        try:
+            self._execute('quit')
+        except Exception as ex:
+            # QEMU might close the connection before replying
+            self.logger.debug("Quit: {}".format(ex))
+        self.qmp.close()
+        if self.serial_console is not None:
+            self.serial_console.close()
         VMController.terminate(self)
 
     def type(self, what):
-        translations = {
-            ' ': 'spc',
-            '.': 'dot',
-            '-': 'minus',
-            '/': 'slash',
-            '\\': 'backslash',
-            '\n': 'ret',
-            '_': 'shift-minus',
-            '|': 'shift-backslash',
-            '=': 'equal',
-            ':': 'shift-semicolon',
-            ';': 'semicolon',
-        }
+        if self.serial_console is None:
+            self._type_keys(what)
+        else:
+            self.logger.debug("Typing '{}' on serial console".format(what))
+            # Enter on a serial terminal sends carriage return
+            self.serial_console.write(what.replace('\n', '\r'))
+
+    def _type_keys(self, what):
+        self.logger.debug("Typing '{}'".format(what))
+        # One key at a time with a hold time: QEMU delays the release (and
+        # the following keys) so that the guest sees every press, even of
+        # a repeated letter, and its keyboard buffer does not overflow
         for letter in what:
-            if letter.isupper():
-                letter = 'shift-' + letter.lower()
-            if letter in translations:
-                letter = translations[letter]
-            self._send_command('sendkey ' + letter)
-        pass
+            self._execute('send-key', {
+                'keys': get_key_values(letter),
+                'hold-time': QemuVMController.TYPE_HOLD_TIME,
+            })
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Client of the QEMU Machine Protocol (QMP).
+"""
+
+import json
+import logging
+import socket
+
+# Translation of typed characters to QEMU key codes (other than plain
+# lowercase letters and digits); keys of a combination are separated by
+# dashes (the same names as in HMP sendkey).
+KEY_TRANSLATIONS = {
+    ' ': 'spc',
+    '.': 'dot',
+    '-': 'minus',
+    '/': 'slash',
+    '\\': 'backslash',
+    '\n': 'ret',
+    '_': 'shift-minus',
+    '|': 'shift-backslash',
+    '=': 'equal',
+    ':': 'shift-semicolon',
+    ';': 'semicolon',
+}
+
+def get_key_combination(letter):
+    """
+    Return list of QEMU key codes to press to type given character.
+    """
+    if letter.isupper():
+        return [ 'shift', letter.lower() ]
+    if letter in KEY_TRANSLATIONS:
+        return KEY_TRANSLATIONS[letter].split('-')
+    return [ letter ]
+
+def get_key_values(letter):
+    """
+    Return keys (for send-key) typing given character.
+    """
+    return [ { 'type': 'qcode', 'data': key } for key in get_key_combination(letter) ]
+
+class QmpException(Exception):
+    pass
+
+class QmpClient:
+    """
+    QMP connection over a connected stream socket.
+    """
+
+    def __init__(self, sock, timeout=60):
+        self.sock = sock
+        self.sock.settimeout(timeout)
+        self.reader = sock.makefile('rb')
+        self.next_id = 1
+        # Asynchronous events received so far (while waiting for replies)
+        self.events = []
+        self.logger = logging.getLogger('qmp')
+
+    def connect(self):
+        """
+        Read the greeting and enter the command mode.
+        """
+        greeting = self._receive()
+        if not 'QMP' in greeting:
+            raise QmpException("Unexpected QMP greeting {}".format(greeting))
+        self.execute('qmp_capabilities')
+
+    def execute(self, command, arguments=None):
+        """
+        Execute command and wait for its completion, returns its result.
+        """
+        message = {
+            'execute': command,
+            'id': self.next_id,
+        }
+        self.next_id = self.next_id + 1
+        if arguments is not None:
+            message['arguments'] = arguments
+        self.logger.debug("Executing {}".format(command))
+        self.sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+        while True:
+            reply = self._receive()
+            if 'event' in reply:
+                self.logger.debug("Event {}".format(reply['event']))
+                self.events.append(reply)
+                continue
+            if reply.get('id') != message['id']:
+                continue
+            if 'error' in reply:
+                raise QmpException("QMP command {} failed: {}".format(command, reply['error'].get('desc', reply['error'])))
+            return reply.get('return')
+
+    def _receive(self):
+        line = self.reader.readline()
+        if len(line) == 0:
+            raise QmpException("QMP connection closed")
+        return json.loads(line.decode('utf-8'))
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import logging
+import select
+
+from htest.vt100 import VT100Screen
+
+class SerialConsole:
+    """
+    Guest console on a serial port connected to a (stream) socket.
+
+    Received bytes are interpreted by a VT100 emulator (and optionally
+    stored as-is into a dump file), typed text is sent to the guest.
+    """
+
+    def __init__(self, sock, dump_filename=None, cols=80, rows=25):
+        self.sock = sock
+        self.sock.setblocking(False)
+        self.terminal = VT100Screen(cols, rows)
+        self.dump = None
+        if dump_filename is not None:
+            self.dump = open(dump_filename, 'wb')
+        self.received = 0
+        self.closed = False
+        self.logger = logging.getLogger('serial')
+
+    def poll(self, timeout=0):
+        """
+        Process data received so far, waiting up to timeout seconds when
+        nothing is available. Returns whether any data were received.
+        """
+        received = False
+        while not self.closed:
+            ready, xxx, yyy = select.select([ self.sock ], [], [], timeout)
+            if len(ready) == 0:
+                break
+            try:
+                data = self.sock.recv(64 * 1024)
+            except BlockingIOError:
+                break
+            if len(data) == 0:
+                self.logger.debug("Serial console closed.")
+                self.closed = True
+                break
+            self.terminal.feed(data)
+            if self.dump is not None:
+                self.dump.write(data)
+                self.dump.flush()
+            self.received = self.received + len(data)
+            received = True
+            # Only take what is already there
+            timeout = 0
+        return received
+
+    def write(self, text):
+        self.sock.setblocking(True)
+        try:
+            self.sock.sendall(text.encode('utf-8'))
+        finally:
+            self.sock.setblocking(False)
+
+    def get_history(self):
+        self.poll()
+        return self.terminal.get_history()
+
+    def close(self):
+        self.sock.close()
+        if self.dump is not None:
+            self.dump.close()
+            self.dump = None
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""
+Minimal VT100 (ANSI) terminal emulator.
+
+Rebuilds contents of a terminal from the stream of characters sent to it
+(e.g. by a guest on its serial console), keeping lines scrolled away from
+the screen in the scrollback.
+"""
+
+import codecs
+
+class VT100Screen:
+    """
+    Screen of a VT100-like terminal.
+
+    Only the sequences needed for line-oriented consoles are interpreted
+    (cursor movement, erasing, line editing), others (e.g. colors) are
+    parsed and ignored.
+    """
+
+    def __init__(self, cols=80, rows=25):
+        self.cols = cols
+        self.rows = rows
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        # Lines that scrolled away from the top of the screen
+        self.scrollback = []
+        self.reset()
+
+    def reset(self):
+        self.screen = [ self._blank_line() for i in range(self.rows) ]
+        self.x = 0
+        self.y = 0
+        self.saved_cursor = ( 0, 0 )
+        self.state = 'text'
+        self.params = ''
+        # Cursor is past the last column, next character goes to next line
+        self.pending_wrap = False
+
+    def feed(self, data):
+        """
+        Process bytes received by the terminal.
+        """
+        for ch in self.decoder.decode(data):
+            if self.state == 'text':
+                self._put_text(ch)
+            elif self.state == 'escape':
+                self._put_escape(ch)
+            elif self.state == 'csi':
+                if ch in '0123456789;?':
+                    self.params += ch
+                else:
+                    self.state = 'text'
+                    self._handle_csi(ch, self.params)
+            elif self.state == 'osc':
+                # Operating system command ends with BEL or ST
+                if ch == '\x07':
+                    self.state = 'text'
+                elif ch == '\x1b':
+                    self.state = 'escape'
+            elif self.state == 'charset':
+                self.state = 'text'
+
+    def get_screen(self):
+        """
+        Return lines currently on the screen (without trailing spaces).
+        """
+        return [ ''.join(l).rstrip() for l in self.screen ]
+
+    def get_history(self):
+        """
+        Return scrollback followed by the screen, without the empty lines
+        at the bottom of the screen.
+        """
+        lines = self.scrollback + self.get_screen()
+        while (len(lines) > 0) and (lines[-1] == ''):
+            lines = lines[0:-1]
+        return lines
+
+    def _blank_line(self):
+        return [ ' ' ] * self.cols
+
+    def _put_text(self, ch):
+        if ch == '\x1b':
+            self.state = 'escape'
+        elif ch == '\r':
+            self._move_to(0, self.y)
+        elif ch in '\n\x0b\x0c':
+            self.pending_wrap = False
+            self._line_feed()
+        elif ch == '\b':
+            self._move_to(self.x - 1, self.y)
+        elif ch == '\t':
+            self._move_to((self.x // 8 + 1) * 8, self.y)
+        elif (ch < ' ') or (ch == '\x7f'):
+            # Bell and other control characters
+            pass
+        else:
+            if self.pending_wrap:
+                self.pending_wrap = False
+                self.x = 0
+                self._line_feed()
+            self.screen[self.y][self.x] = ch
+            if self.x == self.cols - 1:
+                self.pending_wrap = True
+            else:
+                self.x = self.x + 1
+
+    def _put_escape(self, ch):
+        self.state = 'text'
+        if ch == '[':
+            self.state = 'csi'
+            self.params = ''
+        elif ch == ']':
+            self.state = 'osc'
+        elif ch in '()':
+            self.state = 'charset'
+        elif ch == 'c':
+            self.reset()
+        elif ch == '7':
+            self.saved_cursor = ( self.x, self.y )
+        elif ch == '8':
+            self._move_to(*self.saved_cursor)
+        elif ch == 'D':
+            self._line_feed()
+        elif ch == 'E':
+            self._move_to(0, self.y)
+            self._line_feed()
+        elif ch == 'M':
+            if self.y == 0:
+                self.screen.insert(0, self._blank_line())
+                del self.screen[-1]
+            else:
+                self._move_to(self.x, self.y - 1)
+
+    def _handle_csi(self, final, params):
+        args = []
+        for p in params.lstrip('?').split(';'):
+            args.append(int(p) if p.isdigit() else 0)
+
+        def arg(index, default):
+            if (index < len(args)) and (args[index] > 0):
+                return args[index]
+            return default
+
+        n = arg(0, 1)
+        if final == 'A':
+            self._move_to(self.x, self.y - n)
+        elif final == 'B':
+            self._move_to(self.x, self.y + n)
+        elif final == 'C':
+            self._move_to(self.x + n, self.y)
+        elif final == 'D':
+            self._move_to(self.x - n, self.y)
+        elif final in 'Hf':
+            self._move_to(arg(1, 1) - 1, arg(0, 1) - 1)
+        elif final == 'G':
+            self._move_to(n - 1, self.y)
+        elif final == 'd':
+            self._move_to(self.x, n - 1)
+        elif final == 'J':
+            self._erase_display(args[0])
+        elif final == 'K':
+            self._erase_line(self.y, args[0])
+        elif final == 'P':
+            line = self.screen[self.y]
+            del line[self.x:self.x + n]
+            line.extend([ ' ' ] * (self.cols - len(line)))
+        elif final == '@':
+            line = self.screen[self.y]
+            line[self.x:self.x] = [ ' ' ] * n
+            del line[self.cols:]
+        elif final == 'X':
+            line = self.screen[self.y]
+            for i in range(self.x, min(self.x + n, self.cols)):
+                line[i] = ' '
+        elif final == 'L':
+            for i in range(n):
+                self.screen.insert(self.y, self._blank_line())
+                del self.screen[-1]
+        elif final == 'M':
+            for i in range(n):
+                del self.screen[self.y]
+                self.screen.append(self._blank_line())
+        elif final == 's':
+            self.saved_cursor = ( self.x, self.y )
+        elif final == 'u':
+            self._move_to(*self.saved_cursor)
+        # Others (colors, modes) do not change the text
+
+    def _erase_display(self, mode):
+        if mode == 0:
+            self._erase_line(self.y, 0)
+            for y in range(self.y + 1, self.rows):
+                self.screen[y] = self._blank_line()
+        elif mode == 1:
+            for y in range(0, self.y):
+                self.screen[y] = self._blank_line()
+            self._erase_line(self.y, 1)
+        else:
+            # Keep the history complete: cleared lines go to the scrollback
+            lines = self.get_screen()
+            while (len(lines) > 0) and (lines[-1] == ''):
+                lines = lines[0:-1]
+            self.scrollback.extend(lines)
+            self.screen = [ self._blank_line() for i in range(self.rows) ]
+
+    def _erase_line(self, y, mode):
+        line = self.screen[y]
+        if mode == 0:
+            start, end = self.x, self.cols
+        elif mode == 1:
+            start, end = 0, self.x + 1
+        else:
+            start, end = 0, self.cols
+        for i in range(start, min(end, self.cols)):
+            line[i] = ' '
+
+    def _move_to(self, x, y):
+        self.pending_wrap = False
+        self.x = max(0, min(x, self.cols - 1))
+        self.y = max(0, min(y, self.rows - 1))
+
+    def _line_feed(self):
+        if self.y == self.rows - 1:
+            self.scrollback.append(''.join(self.screen[0]).rstrip())
+            del self.screen[0]
+            self.screen.append(self._blank_line())
+        else:
+            self.y = self.y + 1
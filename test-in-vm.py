@@ -33,6 +33,7 @@ import argparse
 import yaml
 import logging
 import sys
+import time
 
 from htest.vm.controller import VMManager
 from htest.vm.qemu import QemuVMController
@@ -116,6 +117,12 @@ args.add_argument('--last-screenshot',
     default=None,
     help='Where to store last screenshot.'
 )
+args.add_argument('--serial-console',
+    metavar='FILENAME.txt',
+    dest='serial_console',
+    default=None,
+    help='Read the console from the serial port instead of the screen (QEMU only), store its output in FILENAME.txt.'
+)
 args.add_argument('--debug',
     dest='debug',
     default=False,
@@ -157,7 +164,7 @@ if controller is None:
     logger.error("Unsupported architecture {}.".format(config.architecture))
     sys.exit(1)
 
-vmm = VMManager(controller, config.architecture, config.vm_config, config.boot_image, config.disk_image, config.memory, config.headless, config.pass_thru_options)
+vmm = VMManager(controller, config.architecture, config.vm_config, config.boot_image, config.disk_image, config.memory, config.headless, config.pass_thru_options, config.serial_console)
 
 scenario_tasks = []
 for t in scenario['tasks']:
@@ -189,14 +196,20 @@ for t in scenario['tasks']:
     scenario_tasks.append(task_inst)
 
 exit_code = 0
+scenario_start = time.monotonic()
 try:
     for t in scenario_tasks:
-        t.run()
+        task_start = time.monotonic()
+        try:
+            t.run()
+        finally:
+            logger.info("Task {} took {:.1f}s.".format(t.get_name(), time.monotonic() - task_start))
     print("Scenario passed.")
 except Exception as ex:
     logger.exception("Scenario aborted: {}".format(ex))
     print("Scenario aborted: {}".format(ex))
     exit_code = 1
+logger.info("Scenario took {:.1f}s.".format(time.monotonic() - scenario_start))
 
 vmm.terminate(config.vterm_dump, config.last_screenshot)
 sys.exit(exit_code)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import fcntl
+import os
+import threading
+import time
+
+from hbuild.artefactstore import ArtefactStore
+
+def test_publish_and_collect(tmp_path):
+    store = ArtefactStore(str(tmp_path / 'store'))
+    image = tmp_path / 'image.iso'
+    with open(image, 'wb') as f:
+        f.write(b'HelenOS' * 1000)
+
+    for build in [ 'build-1', 'build-2' ]:
+        os.makedirs(tmp_path / build)
+        store.publish(str(image), str(tmp_path / build / 'image.iso'))
+    assert store.deduplicated == 1
+    assert os.stat(tmp_path / 'build-1' / 'image.iso').st_ino == os.stat(tmp_path / 'build-2' / 'image.iso').st_ino
+    with open(tmp_path / 'build-2' / 'image.iso', 'rb') as f:
+        assert f.read() == b'HelenOS' * 1000
+
+    os.remove(tmp_path / 'build-1' / 'image.iso')
+    assert store.collect_garbage() == ( 0, 0 )
+    os.remove(tmp_path / 'build-2' / 'image.iso')
+    assert store.collect_garbage() == ( 1, 7000 )
+
+def test_collect_keeps_recent_temporary_files(tmp_path):
+    store = ArtefactStore(str(tmp_path / 'store'))
+    os.makedirs(tmp_path / 'store' / 'ab')
+    for name in [ '.add-old', '.add-new' ]:
+        with open(tmp_path / 'store' / 'ab' / name, 'wb') as f:
+            f.write(b'HelenOS')
+    old = time.time() - ArtefactStore.TEMP_FILE_GRACE_PERIOD - 60
+    os.utime(tmp_path / 'store' / 'ab' / '.add-old', ( old, old ))
+
+    assert store.collect_garbage() == ( 1, 7 )
+    assert os.listdir(tmp_path / 'store' / 'ab') == [ '.add-new' ]
+
+def test_collect_waits_for_publish(tmp_path):
+    store = ArtefactStore(str(tmp_path / 'store'))
+    result = []
+    with store.open_lock_file(fcntl.LOCK_SH):
+        collector = threading.Thread(target=lambda: result.append(store.collect_garbage(0)))
+        collector.start()
+        collector.join(0.5)
+        assert collector.is_alive()
+    collector.join()
+    assert result == [ ( 0, 0 ) ]
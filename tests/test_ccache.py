@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import os
+
+from hbuild.ccache import CompilerCache, parse_stats_log
+
+def test_parse_stats_log(tmp_path):
+    log = tmp_path / 'stats.log'
+    with open(log, 'w') as f:
+        f.write('# /src/a.c\ndirect_cache_hit\n# /src/b.c\ncache_miss\n# /src/c.c\npreprocessed_cache_hit\n')
+    assert parse_stats_log(str(log)) == ( 2, 1 )
+    assert parse_stats_log(str(tmp_path / 'missing.log')) == ( 0, 0 )
+
+def test_masquerade_environment(tmp_path, monkeypatch):
+    cross = tmp_path / 'cross' / 'bin'
+    os.makedirs(cross)
+    for name in [ 'amd64-helenos-gcc', 'amd64-helenos-ld', 'gcc' ]:
+        with open(cross / name, 'w') as f:
+            f.write('')
+    monkeypatch.setenv('CROSS_PREFIX', str(tmp_path / 'cross'))
+
+    cache = CompilerCache(str(tmp_path / 'ccache'), str(tmp_path / 'build'), '1G', '/usr/bin/ccache')
+    env = cache.get_environment({ 'PATH': '/usr/bin' }, str(tmp_path / 'stats.log'), True)
+    assert env['CCACHE_DIR'] == str(tmp_path / 'ccache')
+    assert env['CCACHE_MAXSIZE'] == '1G'
+    assert env['CCACHE_STATSLOG'] == str(tmp_path / 'stats.log')
+    masquerade = env['PATH'].split(os.pathsep)[0]
+    # Private to the run, not inside the shared cache
+    assert masquerade == str(tmp_path / 'build' / 'ccache-masquerade')
+    assert os.listdir(masquerade) == [ 'amd64-helenos-gcc' ]
+    assert os.readlink(os.path.join(masquerade, 'amd64-helenos-gcc')) == '/usr/bin/ccache'
+
+    env = cache.get_environment({ 'PATH': '/usr/bin' })
+    assert env['PATH'] == '/usr/bin'
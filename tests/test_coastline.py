@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import io
+import os
+import tarfile
+
+import pytest
+
+from hbuild.scheduler import TaskException, RunCommandException
+from hbuild.builders.coastline import get_archive_format, recompress_archive, run_pipeline, topological_sort
+from hbuild.builders.coastline import CoastlineArchiveBenchmarkTask, CoastlineGetHarboursTask
+from hbuild.extraction import extract_tarball
+
+def make_archive(path):
+    with tarfile.open(path, 'w:gz') as tar:
+        data = ('HelenOS ' * 1000).encode('utf-8')
+        info = tarfile.TarInfo('app/data')
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    return str(path)
+
+def test_recompress_to_zstd(tmp_path, make_controller):
+    ctl = make_controller()
+    source = make_archive(tmp_path / 'msim.tar.gz')
+    target = str(tmp_path / 'msim.tar.zst')
+    recompress_archive(ctl, source, target)
+
+    extract_tarball(target, str(tmp_path / 'extracted'))
+    with open(tmp_path / 'extracted' / 'app' / 'data') as f:
+        assert f.read() == 'HelenOS ' * 1000
+
+def test_archive_format_in_dotted_directory(tmp_path, make_controller):
+    ctl = make_controller()
+    os.makedirs(tmp_path / 'coastline-1.0' / 'archives')
+    source = make_archive(tmp_path / 'coastline-1.0' / 'archives' / 'msim.tar.gz')
+    target = str(tmp_path / 'coastline-1.0' / 'archives' / 'msim.tar.zst')
+    assert get_archive_format(source) == 'tar.gz'
+    recompress_archive(ctl, source, target)
+    assert get_archive_format(target) == 'tar.zst'
+    with pytest.raises(TaskException):
+        get_archive_format(str(tmp_path / 'coastline-1.0' / 'msim.zip'))
+
+def test_pipeline_failure(tmp_path, make_controller):
+    ctl = make_controller()
+    with open(tmp_path / 'garbage.tar.gz', 'w') as f:
+        f.write('not gzip\n')
+    with pytest.raises(RunCommandException):
+        recompress_archive(ctl, str(tmp_path / 'garbage.tar.gz'), str(tmp_path / 'garbage.tar.xz'))
+
+def test_benchmark(tmp_path, make_controller):
+    archive = make_archive(tmp_path / 'msim.tar.gz')
+    task = CoastlineArchiveBenchmarkTask('msim', 'ia32')
+    task.ctl = make_controller({ 'build': { 'harbour-msim': archive } })
+    res = task.run()
+    for fmt in [ 'tar.gz', 'tar.xz', 'tar.zst' ]:
+        assert res['benchmark'][fmt]['ratio'] < 1
+    attrs = task.get_report()['attrs']
+    assert attrs['tar-size'] > 8000
+    assert 'zst-ratio' in attrs
+
+def test_topological_sort():
+    order = topological_sort({
+        'gcc': [ 'binutils', 'libgmp', 'libmpfr' ],
+        'libmpfr': [ 'libgmp' ],
+        'libgmp': [],
+        'binutils': [],
+        'zlib': [],
+    })
+    assert order == [ 'binutils', 'libgmp', 'zlib', 'libmpfr', 'gcc' ]
+
+def test_topological_sort_cycle():
+    with pytest.raises(TaskException) as e:
+        topological_sort({
+            'zlib': [],
+            'a': [ 'zlib', 'b' ],
+            'b': [ 'c' ],
+            'c': [ 'a' ],
+            'd': [ 'c' ],
+        })
+    assert str(e.value) == 'Circular dependency found: a -> b -> c -> a'
+
+def write_harbour(root, name, profiles, tugs):
+    os.makedirs(root / name, exist_ok=True)
+    with open(root / name / 'HARBOUR', 'w') as f:
+        f.write('shipname={}\nshipprofiles="{}"\nshiptugs="{}"\necho noise\n'.format(name, profiles, tugs))
+
+def test_harbours_metadata(tmp_path, make_controller):
+    root = tmp_path / 'coastline'
+    write_harbour(root, 'zlib', '', '')
+    write_harbour(root, 'libpng', 'ia32  amd64', 'zlib missing')
+    os.makedirs(root / 'broken')
+    with open(root / 'broken' / 'HARBOUR', 'w') as f:
+        f.write('if then\n')
+
+    task = CoastlineGetHarboursTask([ 'libpng' ])
+    task.ctl = make_controller({ 'checkout': { 'dir': str(root), 'revision': 'abc' } })
+    res = task.run()
+    assert res['harbours'] == [ 'zlib', 'libpng' ]
+    assert res['harbour_profiles'] == { 'broken': [], 'zlib': [], 'libpng': [ 'ia32', 'amd64' ] }
+    assert res['harbour_deps']['libpng'] == [ 'zlib' ]
+
+    # Only the changed file is evaluated again
+    write_harbour(root, 'zlib', 'ia32', '')
+    metadata = task.get_harbours_metadata(str(root), [ 'libpng', 'zlib' ])
+    assert metadata['zlib']['profiles'] == [ 'ia32' ]
+    assert metadata['libpng']['profiles'] == [ 'ia32', 'amd64' ]
+
+def test_harbours_metadata_cache_survives_build_directory(tmp_path, make_controller):
+    root = tmp_path / 'coastline'
+    write_harbour(root, 'zlib', 'ia32', '')
+    cache = str(tmp_path / 'persistent' / 'harbour-metadata.json')
+
+    task = CoastlineGetHarboursTask([ 'zlib' ], cache)
+    task.ctl = make_controller({ 'checkout': { 'dir': str(root), 'revision': 'abc' } }, tmp_path / 'first')
+    assert task.run()['harbour_profiles'] == { 'zlib': [ 'ia32' ] }
+    assert os.path.exists(cache)
+
+    # Served from the cache in a fresh build directory (HARBOUR files
+    # are not evaluated at all)
+    task = CoastlineGetHarboursTask([ 'zlib' ], cache)
+    task.ctl = make_controller({ 'checkout': { 'dir': str(root), 'revision': 'abc' } }, tmp_path / 'second')
+    task.ctl.run_command = None
+    assert task.get_harbours_metadata(str(root), [ 'zlib' ])['zlib']['profiles'] == [ 'ia32' ]
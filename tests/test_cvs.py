@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import os
+import shutil
+import subprocess
+
+from hbuild.scheduler import BuildScheduler
+from hbuild.output import ConsolePrinter
+from hbuild.cvs import GitCheckoutTask
+
+GIT = [ 'git', '-c', 'user.name=test', '-c', 'user.email=test@localhost' ]
+
+def commit(repo, content):
+    with open(os.path.join(repo, 'README'), 'w') as f:
+        f.write(content)
+    subprocess.run(GIT + [ 'add', 'README' ], cwd=repo, check=True)
+    subprocess.run(GIT + [ 'commit', '-q', '-m', content ], cwd=repo, check=True)
+
+def checkout(tmp_path, name, url):
+    sched = BuildScheduler(1, str(tmp_path / name / 'build'), str(tmp_path / name / 'out'),
+        name, ConsolePrinter(True))
+    task = GitCheckoutTask('repo', url, str(tmp_path / 'mirrors'))
+    sched.submit("Checkout", "checkout", task)
+    sched.done()
+    with open(tmp_path / name / 'build' / 'repo' / 'repo' / 'README') as f:
+        return f.read()
+
+def test_checkout_via_mirror(tmp_path):
+    upstream = tmp_path / 'upstream'
+    os.makedirs(upstream)
+    subprocess.run(GIT + [ 'init', '-q' ], cwd=upstream, check=True)
+    commit(upstream, 'first')
+    url = 'file://' + str(upstream)
+
+    assert checkout(tmp_path, 'run1', url) == 'first'
+    assert len(os.listdir(tmp_path / 'mirrors')) == 2
+
+    commit(upstream, 'second')
+    assert checkout(tmp_path, 'run2', url) == 'second'
+
+    # Upstream not reachable: the mirror is still usable
+    shutil.move(str(upstream), str(tmp_path / 'gone'))
+    assert checkout(tmp_path, 'run3', url) == 'second'
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import io
+import os
+import tarfile
+
+from hbuild.extraction import populate_overlay, get_extracted
+
+def make_tarball(path, mode, files):
+    with tarfile.open(path, mode) as tar:
+        for name, content in files.items():
+            data = content.encode('utf-8')
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return str(path)
+
+def test_overlay_from_cache(tmp_path, make_controller):
+    ctl = make_controller()
+    first = make_tarball(tmp_path / 'first.tar.xz', 'w:xz', {
+        'app/first': 'first\n',
+        'inc/common.h': 'first\n',
+    })
+    second = make_tarball(tmp_path / 'second.tar.gz', 'w:gz', {
+        'app/second': 'second\n',
+        'inc/common.h': 'second\n',
+    })
+
+    overlay = tmp_path / 'overlay'
+    populate_overlay(ctl, [ first, second ], str(overlay))
+    with open(overlay / 'app' / 'first') as f:
+        assert f.read() == 'first\n'
+    with open(overlay / 'app' / 'second') as f:
+        assert f.read() == 'second\n'
+    # Later tarballs overwrite the previous ones
+    with open(overlay / 'inc' / 'common.h') as f:
+        assert f.read() == 'second\n'
+
+    # The extracted tree is reused and shared through hard links
+    extracted = get_extracted(ctl, first)
+    assert os.stat(overlay / 'app' / 'first').st_ino == os.stat(os.path.join(extracted, 'app', 'first')).st_ino
+    assert len(os.listdir(tmp_path / 'build' / 'extracted')) == 2
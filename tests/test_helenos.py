@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import glob
+import io
+import os
+import shutil
+import subprocess
+import tarfile
+
+import pytest
+
+from hbuild.builders.helenos import HelenOSBuildWithHarboursTask
+
+MESON_BUILD = """
+project('helenos', 'c')
+app = executable('app', 'main.c')
+image = custom_target('image', output: 'image.iso', input: app,
+    command: [ 'sh', files('mkimage.sh'), '@OUTPUT@', '@INPUT@', meson.project_source_root() / 'uspace' / 'overlay' ],
+    build_by_default: true)
+run_target('image_path', command: [ 'echo', image.full_path() ])
+"""
+
+def make_checkout(root):
+    os.makedirs(root / 'uspace' / 'overlay')
+    files = {
+        'configure.sh': 'meson setup . "$(dirname "$0")" >/dev/null\n',
+        'meson.build': MESON_BUILD,
+        'main.c': 'int main(void) { return 0; }\n',
+        'mkimage.sh': 'cp "$2" "$1" && ( cd "$3" && find . | sort ) >>"$1"\n',
+        'uspace/overlay/README': 'Overlay\n',
+    }
+    for name in files:
+        with open(root / name, 'w') as f:
+            f.write(files[name])
+    return str(root)
+
+def make_harbour_tarball(path):
+    with tarfile.open(path, 'w:gz') as tar:
+        data = b'#!/bin/sh\n'
+        info = tarfile.TarInfo('app/msim')
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    return str(path)
+
+def run_extra_build(make_controller, checkout, tarball):
+    ctl = make_controller({
+        'helenos-checkout': { 'dir': checkout },
+        'helenos-build-ia32': { 'built-image': 'image.iso' },
+        'coastline-build-msim': { 'harbour-msim': tarball },
+    })
+    commands = []
+    run_command = ctl.run_command
+    def recording_run_command(cmd, cwd=None, **kwargs):
+        commands.append(cmd)
+        return run_command(cmd, cwd, **kwargs)
+    ctl.run_command = recording_run_command
+
+    task = HelenOSBuildWithHarboursTask('ia32', [ 'msim' ], True)
+    task.ctl = ctl
+    res = task.run()
+    ctl.done()
+    return ( res, commands )
+
+@pytest.mark.skipif((shutil.which('meson') is None) or (shutil.which('ninja') is None) or (shutil.which('cc') is None),
+    reason='meson, ninja or C compiler not installed')
+def test_kept_extra_build_is_not_rebuilt(tmp_path, make_controller):
+    checkout = make_checkout(tmp_path / 'checkout')
+    tarball = make_harbour_tarball(tmp_path / 'msim.tar.gz')
+
+    ( res, commands ) = run_extra_build(make_controller, checkout, tarball)
+    build_dir = os.path.join(res['dir'], 'build')
+    assert build_dir.startswith(str(tmp_path / 'build' / 'build' / 'ia32' / 'extra-msim'))
+    assert [ 'ninja' ] in commands
+    with open(tmp_path / 'out' / 'ia32' / 'helenos-ia32-with-msim.iso', 'rb') as f:
+        assert b'./app/msim' in f.read()
+    ( obj, ) = glob.glob(os.path.join(build_dir, '*.p', 'main.c.o'))
+    obj_mtime = os.stat(obj).st_mtime_ns
+
+    # Next run reuses the kept tree at the same path: no configuration,
+    # nothing recompiled and ninja has nothing left to do
+    ( res, commands ) = run_extra_build(make_controller, checkout, tarball)
+    assert os.path.join(res['dir'], 'build') == build_dir
+    assert not any('configure.sh' in ' '.join(cmd) for cmd in commands)
+    assert [ 'ninja' ] in commands
+    assert os.stat(obj).st_mtime_ns == obj_mtime
+    ninja = subprocess.run([ 'ninja', '-n' ], cwd=build_dir, stdout=subprocess.PIPE, check=True)
+    assert b'no work to do' in ninja.stdout
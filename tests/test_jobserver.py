@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import os
+import shutil
+
+import pytest
+
+from hbuild.jobserver import JobServer
+from hbuild.builders.helenos import HelenOSBuildTask
+
+MAKEFILE = """
+TARGETS = a b c d e f
+all: $(TARGETS)
+$(TARGETS):
+\t@echo start >> log.txt
+\t@sleep 0.3
+\t@echo end >> log.txt
+.PHONY: all $(TARGETS)
+"""
+
+def get_max_concurrency(log_filename):
+    current = 0
+    maximum = 0
+    with open(log_filename) as f:
+        for line in f:
+            current = current + (1 if line.strip() == 'start' else -1)
+            maximum = max(current, maximum)
+    return maximum
+
+def test_tokens_are_returned(tmp_path):
+    js = JobServer(str(tmp_path), 3, 'pipe')
+    tokens = [ js.acquire() for i in range(3) ]
+    assert tokens == [ b'+' ] * 3
+    for t in tokens:
+        js.release(t)
+    assert os.read(js.read_fd, 10) == b'+++'
+    js.close()
+
+def test_fifo_makeflags(tmp_path):
+    js = JobServer(str(tmp_path), 4, 'fifo')
+    assert js.get_makeflags() == ' -j4 --jobserver-auth=fifo:{}'.format(tmp_path / 'jobserver.fifo')
+    assert js.get_pass_fds() == ()
+    js.close()
+    assert not os.path.exists(tmp_path / 'jobserver.fifo')
+
+@pytest.mark.skipif(shutil.which('make') is None, reason='make not installed')
+def test_make_respects_jobserver(tmp_path, make_controller):
+    js = JobServer(str(tmp_path / 'js'), 2, 'pipe')
+    ctl = make_controller(jobserver=js)
+    with open(tmp_path / 'Makefile', 'w') as f:
+        f.write(MAKEFILE)
+
+    ctl.run_command([ 'make' ], cwd=str(tmp_path), use_jobserver=True)
+    js.close()
+
+    assert get_max_concurrency(tmp_path / 'log.txt') == 2
+
+def test_old_ninja_keeps_cpu_reservation(tmp_path, monkeypatch):
+    versions = { 'make': ( 4, 4, 1 ), 'ninja': ( 1, 12, 1 ) }
+    monkeypatch.setattr('hbuild.jobserver.get_tool_version_tuple', lambda name: versions.get(name))
+    js = JobServer(str(tmp_path), 4, 'fifo')
+    assert js.supports('make')
+    assert not js.supports('ninja')
+    assert not HelenOSBuildTask('ia32', 'ia32', str(tmp_path), None).uses_jobserver(js)
+
+    versions['ninja'] = ( 1, 13, 0 )
+    assert HelenOSBuildTask('ia32', 'ia32', str(tmp_path), None).uses_jobserver(js)
+    js.close()
+
+    # Ninja understands only the FIFO style
+    js = JobServer(str(tmp_path), 4, 'pipe')
+    assert js.supports('make')
+    assert not js.supports('ninja')
+    js.close()
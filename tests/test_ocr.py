@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import os
+
+import pytest
+
+from htest.ocr import ConsoleOcr, ConsoleScreenReader, read_ppm, CONSOLE_AREA, CELL_WIDTH, CELL_HEIGHT
+
+OCR_SED = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ocr.sed')
+
+def get_glyph_pixels(char):
+    with open(OCR_SED) as f:
+        for line in f:
+            pixels, sep, rest = line[2:].rstrip('\n').partition(':')
+            if rest[:-1].lstrip('\\') == char:
+                return pixels
+    raise KeyError(char)
+
+def render_screen(filename, lines, width=650, height=520):
+    """
+    Write PPM screenshot of console showing given lines (white background,
+    black text, the window border in gray).
+    """
+    image = bytearray(b'\x80\x80\x80' * (width * height))
+    x0, y0, area_width, area_height = CONSOLE_AREA
+    for y in range(y0, y0 + area_height):
+        start = (y * width + x0) * 3
+        image[start:start + area_width * 3] = b'\xff' * (area_width * 3)
+    for row, text in enumerate(lines):
+        for col, char in enumerate(text):
+            if char == '?':
+                pixels = '0F' * (CELL_WIDTH * CELL_HEIGHT // 2)
+            else:
+                pixels = get_glyph_pixels(char)
+            for i, p in enumerate(pixels):
+                if p == '0':
+                    y = y0 + row * CELL_HEIGHT + i // CELL_WIDTH
+                    x = x0 + col * CELL_WIDTH + i % CELL_WIDTH
+                    image[(y * width + x) * 3:(y * width + x + 1) * 3] = b'\x10\x00\x20'
+    with open(filename, 'wb') as f:
+        f.write('P6\n# QEMU screendump\n{} {}\n255\n'.format(width, height).encode('ascii'))
+        f.write(image)
+
+SCREEN = [
+    '# ls -l /app/',
+    'Hello, [world]: 1+2=3 ?',
+]
+
+def check_recognized(lines):
+    assert len(lines) == 30
+    assert all([ len(l) == 80 for l in lines ])
+    assert lines[0] == SCREEN[0].ljust(80)
+    assert lines[1] == SCREEN[1].ljust(80)
+    assert lines[2] == ' ' * 80
+
+def test_plain_python(tmp_path):
+    render_screen(tmp_path / 'screen.ppm', SCREEN)
+    check_recognized(ConsoleOcr(OCR_SED, use_numpy=False).recognize_file(tmp_path / 'screen.ppm'))
+
+def test_numpy(tmp_path):
+    pytest.importorskip('numpy')
+    render_screen(tmp_path / 'screen.ppm', SCREEN)
+    check_recognized(ConsoleOcr(OCR_SED).recognize_file(tmp_path / 'screen.ppm'))
+
+def test_truncated_screenshot(tmp_path):
+    render_screen(tmp_path / 'screen.ppm', SCREEN)
+    with open(tmp_path / 'screen.ppm', 'r+b') as f:
+        f.truncate(1000)
+    with pytest.raises(ValueError):
+        read_ppm(tmp_path / 'screen.ppm')
+
+def test_screen_reader_reuses_rows(tmp_path):
+    reader = ConsoleScreenReader(ConsoleOcr(OCR_SED, use_numpy=False))
+    render_screen(tmp_path / 'screen.ppm', SCREEN)
+    check_recognized(reader.read_file(tmp_path / 'screen.ppm'))
+    assert reader.statistics['rows-recognized'] == 30
+
+    check_recognized(reader.read_file(tmp_path / 'screen.ppm'))
+    assert reader.statistics['frames-unchanged'] == 1
+    assert reader.statistics['rows-recognized'] == 30
+
+    render_screen(tmp_path / 'screen.ppm', SCREEN + [ '# _' ])
+    lines = reader.read_file(tmp_path / 'screen.ppm')
+    assert lines[2] == '# _'.ljust(80)
+    assert lines[1] == SCREEN[1].ljust(80)
+    assert reader.statistics['rows-recognized'] == 31
+    assert reader.statistics['rows-reused'] == 30 + 29
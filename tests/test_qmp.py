@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import json
+import socket
+import threading
+
+import pytest
+
+from htest.vm.qemu import QemuVMController
+from htest.vm.qmp import QmpClient, QmpException, get_key_values
+
+class FakeQemu(threading.Thread):
+    """
+    Answers QMP commands (and sends an event before each reply).
+    """
+    def __init__(self, sock):
+        threading.Thread.__init__(self)
+        self.sock = sock
+        self.commands = []
+
+    def send(self, message):
+        self.sock.sendall(json.dumps(message).encode('utf-8') + b'\r\n')
+
+    def run(self):
+        self.send({ 'QMP': { 'version': {}, 'capabilities': [] } })
+        for line in self.sock.makefile('rb'):
+            message = json.loads(line)
+            self.commands.append(message)
+            self.send({ 'event': 'TEST', 'data': {}, 'timestamp': {} })
+            if message['execute'] == 'unknown':
+                self.send({ 'error': { 'class': 'CommandNotFound', 'desc': 'unknown command' }, 'id': message['id'] })
+            else:
+                self.send({ 'return': {}, 'id': message['id'] })
+            if message['execute'] == 'quit':
+                break
+        self.sock.close()
+
+def test_key_values():
+    assert [ [ k['data'] for k in get_key_values(letter) ] for letter in 'A_\nx' ] == [
+        [ 'shift', 'a' ], [ 'shift', 'minus' ], [ 'ret' ], [ 'x' ],
+    ]
+
+def test_client():
+    ours, theirs = socket.socketpair()
+    qemu = FakeQemu(theirs)
+    qemu.start()
+
+    client = QmpClient(ours, timeout=5)
+    client.connect()
+    assert client.execute('send-key', { 'keys': get_key_values('l') }) == {}
+    with pytest.raises(QmpException):
+        client.execute('unknown')
+    client.execute('quit')
+    qemu.join()
+    client.close()
+
+    assert [ c['execute'] for c in qemu.commands ] == [ 'qmp_capabilities', 'send-key', 'unknown', 'quit' ]
+    assert qemu.commands[1]['arguments']['keys'] == [ { 'type': 'qcode', 'data': 'l' } ]
+    assert len(client.events) == 4
+
+def test_typing_repeated_letter():
+    ours, theirs = socket.socketpair()
+    qemu = FakeQemu(theirs)
+    qemu.start()
+
+    vm = QemuVMController('amd64', 'vm0', None, 'image.iso', None)
+    vm.qmp = QmpClient(ours, timeout=5)
+    vm.qmp.connect()
+    vm.booted = True
+    vm.type('Hello\n')
+    vm.qmp.execute('quit')
+    qemu.join()
+    vm.qmp.close()
+
+    typed = qemu.commands[1:-1]
+    assert [ c['execute'] for c in typed ] == [ 'send-key' ] * 6
+    assert [ [ k['data'] for k in c['arguments']['keys'] ] for c in typed ] == [
+        [ 'shift', 'h' ], [ 'e' ], [ 'l' ], [ 'l' ], [ 'o' ], [ 'ret' ],
+    ]
+    # Each press of the doubled letter is held (and released) on its own
+    assert all(c['arguments']['hold-time'] > 0 for c in typed)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import argparse
+import os
+import subprocess
+
+from hbuild.scheduler import BuildScheduler
+from hbuild.output import ConsolePrinter
+from hbuild.reuse import ReusePreviousBuildTask, read_build_identity, is_same_build, compute_config_fingerprint
+
+PREVIOUS_REPORT = """<?xml version="1.0"?>
+<build number="41">
+<checkout repository="https://example.com/helenos.git" alias="helenos" revision="abc" result="ok" log="logs/helenos-checkout.log">
+</checkout>
+<helenos-build arch="amd64" result="ok" log="logs/helenos-build-amd64.log">
+<file title="HelenOS boot image" filename="amd64/helenos-amd64.iso" />
+</helenos-build>
+<buildinfo started="2026-01-01 00:00:00+00:00" duration="1000" parallelism="4" config-fingerprint="f00" />
+</build>
+"""
+
+def make_previous_build(tmp_path):
+    prev = tmp_path / 'build-41'
+    os.makedirs(prev / 'amd64')
+    with open(prev / 'report.xml', 'w') as f:
+        f.write(PREVIOUS_REPORT)
+    with open(prev / 'amd64' / 'helenos-amd64.iso', 'w') as f:
+        f.write('image')
+    return prev
+
+def test_same_build_detection(tmp_path):
+    prev = make_previous_build(tmp_path)
+    identity = read_build_identity(str(prev / 'report.xml'))
+    assert identity['number'] == '41'
+    assert is_same_build(identity, { 'helenos': 'abc' }, 'f00')
+    assert not is_same_build(identity, { 'helenos': 'abd' }, 'f00')
+    assert not is_same_build(identity, { 'helenos': 'abc' }, 'f01')
+    assert not is_same_build(identity, { 'helenos': None }, 'f00')
+    assert read_build_identity(str(tmp_path / 'missing.xml')) is None
+
+def test_reuse_previous_build(tmp_path):
+    prev = make_previous_build(tmp_path)
+    out = tmp_path / 'build-42'
+    sched = BuildScheduler(1, str(tmp_path / 'tmp'), str(out), '42', ConsolePrinter(True))
+    sched.add_build_info('config-fingerprint', 'f00')
+    sched.submit("Reuse", "reuse-previous", ReusePreviousBuildTask(sched, str(prev / 'report.xml')))
+    sched.done()
+
+    identity = read_build_identity(str(out / 'report.xml'))
+    assert identity['number'] == '42'
+    assert identity['revisions'] == { 'helenos': 'abc' }
+    assert identity['fingerprint'] == 'f00'
+    assert os.stat(out / 'amd64' / 'helenos-amd64.iso').st_ino == os.stat(prev / 'amd64' / 'helenos-amd64.iso').st_ino
+    with open(out / 'report.xml') as f:
+        assert 'reused-from="41"' in f.read()
+
+def test_fingerprint_covers_top_level_scripts(tmp_path):
+    ci = tmp_path / 'ci'
+    os.makedirs(ci / 'hbuild')
+    for name in [ 'build.py', 'ci.sh', 'hbuild/scheduler.py', 'README.md' ]:
+        with open(ci / name, 'w') as f:
+            f.write('# {}\n'.format(name))
+    subprocess.run([ 'git', 'init', '-q' ], cwd=ci, check=True)
+    subprocess.run([ 'git', 'add', '.' ], cwd=ci, check=True)
+    config = argparse.Namespace(platforms='amd64')
+
+    fingerprints = [ compute_config_fingerprint(config, str(ci)) ]
+    for name in [ 'ci.sh', 'build.py' ]:
+        with open(ci / name, 'a') as f:
+            f.write('# changed\n')
+        fingerprints.append(compute_config_fingerprint(config, str(ci)))
+    assert len(set(fingerprints)) == 3
+
+    # Untracked scripts and other files do not matter
+    with open(ci / 'local.sh', 'w') as f:
+        f.write('# local\n')
+    with open(ci / 'README.md', 'a') as f:
+        f.write('# changed\n')
+    assert compute_config_fingerprint(config, str(ci)) == fingerprints[-1]
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import json
+import threading
+import time
+
+import pytest
+
+from hbuild.scheduler import BuildScheduler, Task, RunCommandException
+from hbuild.output import ConsolePrinter
+from hbuild.taskcache import TaskCache
+
+class RecordingTask(Task):
+    def __init__(self, name, log, tag='test'):
+        Task.__init__(self, tag)
+        self.name = name
+        self.log = log
+
+    def run(self):
+        self.log.append(self.name)
+        return {}
+
+class BlockingTask(Task):
+    def __init__(self, event):
+        Task.__init__(self, None)
+        self.event = event
+
+    def run(self):
+        self.event.wait()
+        return {}
+
+def make_scheduler(tmp_path, durations, workers=1):
+    history = tmp_path / 'durations.json'
+    with open(history, 'w') as f:
+        json.dump({ 'tasks': durations, 'types': {} }, f)
+    return BuildScheduler(workers, str(tmp_path / 'build'), str(tmp_path / 'out'),
+        'test', ConsolePrinter(True), task_durations=str(history))
+
+def test_critical_path_first(tmp_path):
+    sched = make_scheduler(tmp_path, { 'short': 10, 'tail': 1000, 'long': 500 })
+    gate = threading.Event()
+    log = []
+
+    sched.submit("Gate", "gate", BlockingTask(gate))
+    sched.submit("Long", "long", RecordingTask('long', log), [ "gate" ])
+    sched.submit("Short", "short", RecordingTask('short', log), [ "gate" ])
+    sched.submit("Tail", "tail", RecordingTask('tail', log), [ "short" ])
+    gate.set()
+    sched.done()
+
+    assert log == [ 'short', 'tail', 'long' ]
+
+def test_durations_are_recorded(tmp_path):
+    sched = make_scheduler(tmp_path, {})
+    sched.submit("One", "one", RecordingTask('one', []))
+    sched.done()
+
+    with open(tmp_path / 'durations.json') as f:
+        history = json.load(f)
+    assert 'one' in history['tasks']
+    assert 'test' in history['types']
+
+class CachedTask(Task):
+    def __init__(self):
+        Task.__init__(self, 'test')
+
+    def get_cache_key(self):
+        return {}
+
+    def run(self):
+        time.sleep(0.2)
+        return {}
+
+def test_cache_hits_are_not_recorded(tmp_path):
+    sched = make_scheduler(tmp_path, {})
+    sched.cache = TaskCache(str(tmp_path / 'cache'))
+    sched.submit("Cached", "cached", CachedTask())
+    sched.done()
+    with open(tmp_path / 'durations.json') as f:
+        recorded = json.load(f)
+    assert recorded['tasks']['cached'] >= 200
+
+    sched = BuildScheduler(1, str(tmp_path / 'build'), str(tmp_path / 'out'),
+        'test', ConsolePrinter(True), task_durations=str(tmp_path / 'durations.json'),
+        task_cache=str(tmp_path / 'cache'))
+    sched.submit("Cached", "cached", CachedTask())
+    sched.done()
+    assert sched.cache.hits == 1
+    with open(tmp_path / 'durations.json') as f:
+        assert json.load(f) == recorded
+
+class FailingTask(Task):
+    def __init__(self):
+        Task.__init__(self, 'test')
+
+    def run(self):
+        return False
+
+class ExclusiveTask(Task):
+    def __init__(self, state):
+        Task.__init__(self, 'test')
+        self.state = state
+
+    def run(self):
+        with self.state['lock']:
+            self.state['inside'] = self.state['inside'] + 1
+            self.state['max'] = max(self.state['max'], self.state['inside'])
+        time.sleep(0.01)
+        with self.state['lock']:
+            self.state['inside'] = self.state['inside'] - 1
+        return {}
+
+def test_failed_dependency_skips_successors(tmp_path):
+    sched = make_scheduler(tmp_path, {})
+    log = []
+    sched.submit("Fail", "fail", FailingTask())
+    sched.submit("Child", "child", RecordingTask('child', log), [ "fail" ])
+    sched.submit("Grandchild", "grandchild", RecordingTask('grandchild', log), [ "child" ])
+    sched.submit("Other", "other", RecordingTask('other', log))
+    sched.done()
+
+    assert log == [ 'other' ]
+    assert sched.tasks['fail'].get_status() == 'fail'
+    assert sched.tasks['child'].get_status() == 'skip'
+    assert sched.tasks['grandchild'].get_status() == 'skip'
+
+def test_mutex_excludes_tasks(tmp_path):
+    sched = make_scheduler(tmp_path, {}, workers=4)
+    state = { 'lock': threading.Lock(), 'inside': 0, 'max': 0 }
+    for i in range(8):
+        sched.submit("Exclusive %d" % i, "excl-%d" % i, ExclusiveTask(state), [], [ 'vm' ])
+    log = []
+    for i in range(8):
+        sched.submit("Free %d" % i, "free-%d" % i, RecordingTask('free', log))
+    sched.done()
+
+    assert state['max'] == 1
+    assert len(log) == 8
+
+def test_submit_after_dependency_finished(tmp_path):
+    sched = make_scheduler(tmp_path, {})
+    log = []
+    sched.submit("First", "first", RecordingTask('first', log))
+    sched.barrier()
+    sched.submit("Second", "second", RecordingTask('second', log), [ "first" ])
+    sched.done()
+
+    assert log == [ 'first', 'second' ]
+
+class WeightedTask(ExclusiveTask):
+    def __init__(self, state, resources):
+        ExclusiveTask.__init__(self, state)
+        self.resources = resources
+
+    def get_resources(self):
+        return self.resources
+
+def test_resource_pool_capacity(tmp_path):
+    sched = BuildScheduler(8, str(tmp_path / 'build'), str(tmp_path / 'out'),
+        'test', ConsolePrinter(True), resources={ 'vm': 3 })
+    state = { 'lock': threading.Lock(), 'inside': 0, 'max': 0 }
+    for i in range(12):
+        sched.submit("VM %d" % i, "vm-%d" % i, ExclusiveTask(state), [], [ 'vm' ])
+    sched.done()
+
+    assert state['max'] == 3
+
+def test_cpu_weights(tmp_path):
+    sched = make_scheduler(tmp_path, {}, workers=4)
+    state = { 'lock': threading.Lock(), 'inside': 0, 'max': 0 }
+    for i in range(6):
+        sched.submit("Wide %d" % i, "wide-%d" % i, WeightedTask(state, { 'cpu': 3 }))
+    sched.done()
+
+    # Two tasks with 3 CPUs each never fit into 4 CPUs.
+    assert state['max'] == 1
+
+def test_unconfigured_resources_are_not_limited(tmp_path):
+    sched = make_scheduler(tmp_path, {}, workers=4)
+    sched.submit("Huge", "huge", WeightedTask({ 'lock': threading.Lock(), 'inside': 0, 'max': 0 },
+        { 'cpu': 100, 'ram_mb': 100000 }))
+    sched.done()
+
+    assert sched.tasks['huge'].get_status() == 'ok'
+    assert sched.tasks['huge'].demands == { 'cpu': 4 }
+
+def test_timeline_is_written(tmp_path):
+    sched = make_scheduler(tmp_path, {}, workers=2)
+    log = []
+    sched.submit("First", "first", RecordingTask('first', log), [], [ 'vm' ])
+    sched.submit("Second", "second", RecordingTask('second', log), [ 'first' ])
+    sched.submit("Broken", "broken", FailingTask())
+    sched.submit("Skipped", "skipped", RecordingTask('skipped', log), [ 'broken' ])
+    sched.done()
+
+    with open(tmp_path / 'out' / 'timeline.json') as f:
+        trace = json.load(f)
+    tasks = {}
+    counters = 0
+    for ev in trace['traceEvents']:
+        if ev['ph'] == 'X':
+            tasks[ev['args']['id']] = ev
+        elif ev['ph'] == 'C':
+            counters = counters + 1
+    assert sorted(tasks.keys()) == [ 'broken', 'first', 'second', 'skipped' ]
+    assert tasks['first']['args']['mutexes'] == [ 'vm' ]
+    assert tasks['broken']['args']['result'] == 'fail'
+    assert tasks['skipped']['args']['result'] == 'skip'
+    assert tasks['second']['ts'] >= tasks['first']['ts'] + tasks['first']['dur']
+    assert tasks['second']['args']['ready_ms'] >= tasks['second']['args']['submitted_ms']
+    assert counters > 0
+
+def test_timeline_covers_tasks_after_report(tmp_path):
+    sched = make_scheduler(tmp_path, {})
+    log = []
+    sched.submit("First", "first", RecordingTask('first', log))
+    sched.barrier()
+    sched.close_report()
+    sched.submit("Report", "report", RecordingTask('report', log))
+    sched.done()
+
+    with open(tmp_path / 'out' / 'timeline.json') as f:
+        trace = json.load(f)
+    tasks = [ ev['args']['id'] for ev in trace['traceEvents'] if ev['ph'] == 'X' ]
+    assert sorted(tasks) == [ 'first', 'report' ]
+    with open(tmp_path / 'durations.json') as f:
+        assert 'report' in json.load(f)['tasks']
+
+class CommandTask(Task):
+    def __init__(self, cmd):
+        Task.__init__(self, 'test')
+        self.cmd = cmd
+
+    def run(self):
+        self.ctl.run_command(self.cmd)
+        return {}
+
+def test_command_usage_is_reported(tmp_path):
+    sched = make_scheduler(tmp_path, {})
+    sched.submit("Busy", "busy", CommandTask([ 'sh', '-c', 'i=0; while [ $i -lt 200000 ]; do i=$((i+1)); done' ]))
+    sched.submit("Failing", "failing", CommandTask([ 'sh', '-c', 'exit 3' ]))
+    sched.done()
+
+    with open(tmp_path / 'out' / 'report.xml') as f:
+        report = f.read()
+    assert 'commands="1"' in report
+    assert 'result="fail"' in report
+
+    with open(tmp_path / 'out' / 'timeline.json') as f:
+        trace = json.load(f)
+    for ev in trace['traceEvents']:
+        if (ev['ph'] == 'X') and (ev['args']['id'] == 'busy'):
+            assert ev['args']['cpu-user'] > 0
+            assert ev['args']['max-rss'] > 0
+
+def test_log_tail_and_output(tmp_path, make_controller):
+    ctl = make_controller(kept_log_lines=3)
+    ctl.set_log_file('test.log')
+    res = ctl.run_command([ 'sh', '-c', 'for i in $(seq 1 5000); do echo line $i; done; printf last' ],
+        needs_output=True)
+    assert len(res['output']) == 5001
+    assert res['output'][0] == 'line 1'
+    assert ctl.get_log_tail() == [ 'line 4999', 'line 5000', 'last' ]
+
+    res = ctl.run_command([ 'sh', '-c', 'echo out; echo err >&2; echo out2' ],
+        needs_output=True, separate_stderr=True)
+    assert res['output'] == [ 'out', 'out2' ]
+    assert res['stderr'] == 'err'
+    ctl.done()
+
+    with open(tmp_path / 'out' / 'logs' / 'test.log') as f:
+        lines = f.read().split('\n')
+    assert lines[0] == 'line 1'
+    assert lines[5000] == 'last'
+    assert sorted(lines[5001:5004]) == [ 'err', 'out', 'out2' ]
+
+def test_log_from_several_threads(tmp_path, make_controller):
+    ctl = make_controller(kept_log_lines=3)
+    ctl.set_log_file('test.log')
+
+    def worker(name):
+        for i in range(2000):
+            ctl.append_line_to_log_file('%s %d' % ( name, i ))
+    threads = [ threading.Thread(target=worker, args=( 'worker-%d' % i, )) for i in range(4) ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(ctl.get_log_tail()) == 3
+    assert ctl.log_tail_newlines == sum([ n for ( _, n ) in ctl.log_tail_chunks ])
+    ctl.done()
+
+    with open(tmp_path / 'out' / 'logs' / 'test.log') as f:
+        lines = f.read().split('\n')
+    assert sorted(lines[:-1]) == sorted([ 'worker-%d %d' % ( w, i ) for w in range(4) for i in range(2000) ])
+
+def test_failure_message_uses_own_output(tmp_path, make_controller):
+    ctl = make_controller(kept_log_lines=3)
+    ctl.append_line_to_log_file('unrelated line')
+    with pytest.raises(RunCommandException) as e:
+        ctl.run_command([ 'sh', '-c', 'exit 1' ])
+    assert str(e.value) == "`sh -c exit 1' failed: "
+
+    with pytest.raises(RunCommandException) as e:
+        ctl.run_command([ 'sh', '-c', 'echo first; printf "no newline"; exit 2' ])
+    assert str(e.value).endswith('failed: no newline')
+    assert e.value.rc == 2
+    assert ctl.get_log_tail() == [ 'unrelated line', 'first', 'no newline' ]
+
+    with pytest.raises(RunCommandException) as e:
+        ctl.run_command([ 'sh', '-c', 'kill -9 $$' ])
+    assert e.value.rc == -9
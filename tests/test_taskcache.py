@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import json
+import os
+import shutil
+import threading
+
+import pytest
+
+from hbuild.scheduler import BuildScheduler, Task
+from hbuild.taskcache import TaskCache, parse_size
+from hbuild.output import ConsolePrinter
+from hbuild.cacheserver import CacheServer
+
+class ProducingTask(Task):
+    def __init__(self, key, runs):
+        Task.__init__(self, 'test')
+        self.key = key
+        self.runs = runs
+
+    def get_cache_key(self):
+        return { 'key': self.key }
+
+    def get_cache_outputs(self, data):
+        return [ data['dir'] ]
+
+    def run(self):
+        self.runs.append(self.key)
+        my_dir = self.ctl.make_temp_dir('product')
+        with open(os.path.join(my_dir, 'result.txt'), 'w') as f:
+            f.write(self.key)
+        self.ctl.add_downloadable_file('Result', 'result.txt', os.path.join(my_dir, 'result.txt'))
+        return { 'dir': my_dir }
+
+class ConsumingTask(Task):
+    def __init__(self, runs):
+        Task.__init__(self, 'test')
+        self.runs = runs
+
+    def get_cache_key(self):
+        return {}
+
+    def run(self):
+        self.runs.append('consumer')
+        with open(os.path.join(self.ctl.get_dependency_data('dir'), 'result.txt')) as f:
+            self.runs.append(f.read())
+        return {}
+
+def run_build(tmp_path, name, key, runs):
+    sched = BuildScheduler(2, str(tmp_path / name / 'build'), str(tmp_path / name / 'out'),
+        name, ConsolePrinter(True), task_cache=str(tmp_path / 'cache'))
+    sched.submit("Produce", "produce", ProducingTask(key, runs))
+    sched.submit("Consume", "consume", ConsumingTask(runs), [ "produce" ])
+    sched.done()
+    with open(tmp_path / name / 'out' / 'report.xml') as f:
+        report = f.read()
+    return ( sched, report )
+
+def test_cache_hit_restores_outputs(tmp_path):
+    runs = []
+    ( sched, report ) = run_build(tmp_path, 'first', 'A', runs)
+    assert runs == [ 'A', 'consumer', 'A' ]
+    assert 'cache="miss"' in report
+
+    # Outputs are restored into the build directory of the new run
+    shutil.rmtree(tmp_path / 'first')
+    runs = []
+    ( sched, report ) = run_build(tmp_path, 'second', 'A', runs)
+    assert runs == []
+    assert 'cache="hit"' in report
+    assert 'cache-hits="2" cache-misses="0"' in report
+    with open(tmp_path / 'second' / 'build' / 'product' / 'result.txt') as f:
+        assert f.read() == 'A'
+    assert not os.path.exists(tmp_path / 'first')
+    with open(tmp_path / 'second' / 'out' / 'result.txt') as f:
+        assert f.read() == 'A'
+
+def test_changed_key_invalidates_dependants(tmp_path):
+    runs = []
+    run_build(tmp_path, 'first', 'A', runs)
+    runs = []
+    run_build(tmp_path, 'second', 'B', runs)
+    assert runs == [ 'B', 'consumer', 'B' ]
+
+def test_restored_data_point_to_new_build_directory(tmp_path):
+    runs = []
+    sched = BuildScheduler(2, str(tmp_path / 'first' / 'build'), str(tmp_path / 'first' / 'out'),
+        'first', ConsolePrinter(True), task_cache=str(tmp_path / 'cache'))
+    sched.submit("Produce", "produce", ProducingTask('A', runs))
+    sched.done()
+    shutil.rmtree(tmp_path / 'first')
+
+    sched = BuildScheduler(2, str(tmp_path / 'second' / 'build'), str(tmp_path / 'second' / 'out'),
+        'second', ConsolePrinter(True), task_cache=str(tmp_path / 'cache'))
+    sched.submit("Produce", "produce", ProducingTask('A', runs))
+    sched.submit("Consume", "consume", ConsumingTask(runs), [ "produce" ])
+    sched.done()
+    assert runs == [ 'A', 'consumer', 'A' ]
+
+class StatefulTask(Task):
+    """
+    Builds into a shared (not cached) directory where its dependants
+    expect results of their dependencies.
+    """
+    def __init__(self, name, key, state, runs, requires=[]):
+        Task.__init__(self, 'test')
+        self.name = name
+        self.key = key
+        self.state = state
+        self.runs = runs
+        self.requires = requires
+
+    def get_cache_key(self):
+        return { 'name': self.name, 'key': self.key }
+
+    def needs_cached_dependants(self):
+        return True
+
+    def run(self):
+        for dep in self.requires:
+            if not os.path.exists(os.path.join(self.state, dep)):
+                raise Exception('%s not built' % dep)
+        self.runs.append(self.name)
+        with open(os.path.join(self.state, self.name), 'w') as f:
+            f.write(self.key)
+        return {}
+
+class GateTask(Task):
+    def __init__(self, event):
+        Task.__init__(self, None)
+        self.event = event
+
+    def run(self):
+        self.event.wait()
+        return {}
+
+def run_stateful_build(tmp_path, name, dependant_key, runs):
+    state = tmp_path / name / 'state'
+    os.makedirs(state)
+    sched = BuildScheduler(2, str(tmp_path / name / 'build'), str(tmp_path / name / 'out'),
+        name, ConsolePrinter(True), task_cache=str(tmp_path / 'cache'))
+    # Both tasks have to be known before the dependency starts
+    gate = threading.Event()
+    sched.submit("Gate", "gate", GateTask(gate))
+    sched.submit("Dependency", "dependency", StatefulTask('dependency', 'A', str(state), runs), [ "gate" ])
+    sched.submit("Dependant", "dependant", StatefulTask('dependant', dependant_key, str(state), runs, [ 'dependency' ]),
+        [ "dependency" ])
+    gate.set()
+    sched.done()
+
+def test_dependency_hit_is_run_for_dependant_miss(tmp_path):
+    runs = []
+    run_stateful_build(tmp_path, 'first', 'A', runs)
+    assert runs == [ 'dependency', 'dependant' ]
+
+    # Everything is cached, nothing is run
+    runs = []
+    run_stateful_build(tmp_path, 'second', 'A', runs)
+    assert runs == []
+
+    # The dependency would be a hit but the dependant needs its state
+    runs = []
+    run_stateful_build(tmp_path, 'third', 'B', runs)
+    assert runs == [ 'dependency', 'dependant' ]
+
+def test_unsafe_entry_is_rejected(tmp_path):
+    runs = []
+    run_build(tmp_path, 'first', 'A', runs)
+    cache = TaskCache(str(tmp_path / 'cache'))
+    ( digest, ) = [ name for prefix in os.listdir(tmp_path / 'cache') for name in os.listdir(tmp_path / 'cache' / prefix)
+        if os.path.exists(os.path.join(cache.get_entry_dir(name), 'outputs')) ]
+    meta_filename = os.path.join(cache.get_entry_dir(digest), TaskCache.META_FILENAME)
+    with open(meta_filename) as f:
+        meta = json.load(f)
+    meta['outputs'][0]['path'] = '../../escaped'
+    with open(meta_filename, 'w') as f:
+        json.dump(meta, f)
+
+    # Restore fails, the task is run instead
+    runs = []
+    ( sched, report ) = run_build(tmp_path, 'second', 'A', runs)
+    assert runs[0] == 'A'
+    assert not os.path.exists(tmp_path / 'escaped')
+
+    with pytest.raises(Exception):
+        cache.restore(digest, sched.ctl)
+
+def test_least_recently_used_entries_are_pruned(tmp_path):
+    assert parse_size('20G') == 20 * 1000 ** 3
+    assert parse_size('1Ki') == 1024
+    assert parse_size(4096) == 4096
+
+    runs = []
+    for key in [ 'A', 'B', 'C' ]:
+        sched = BuildScheduler(1, str(tmp_path / key / 'build'), str(tmp_path / key / 'out'),
+            key, ConsolePrinter(True), task_cache=str(tmp_path / 'cache'), task_cache_size='3')
+        sched.submit("Produce", "produce", ProducingTask(key, runs))
+        sched.done()
+    assert sched.cache.pruned > 0
+
+    # Only the latest entry fits (two bytes each)
+    runs = []
+    for key in [ 'C', 'A' ]:
+        sched = BuildScheduler(1, str(tmp_path / 'again' / key / 'build'), str(tmp_path / 'again' / key / 'out'),
+            key, ConsolePrinter(True), task_cache=str(tmp_path / 'cache'), task_cache_size='3')
+        sched.submit("Produce", "produce", ProducingTask(key, runs))
+        sched.done()
+    assert runs == [ 'A' ]
+
+def test_shared_tier_over_http(tmp_path):
+    server = CacheServer(str(tmp_path / 'server'), ('127.0.0.1', 0))
+    server.start_in_background()
+    try:
+        runs = []
+        sched = BuildScheduler(2, str(tmp_path / 'first' / 'build'), str(tmp_path / 'first' / 'out'),
+            'first', ConsolePrinter(True), task_cache=str(tmp_path / 'cache-first'),
+            task_cache_url=server.get_url())
+        sched.submit("Produce", "produce", ProducingTask('A', runs))
+        sched.done()
+        assert runs == [ 'A' ]
+        assert sched.cache.remote.uploads == 1
+
+        # Different local cache directory: only the shared tier can help
+        sched = BuildScheduler(2, str(tmp_path / 'second' / 'build'), str(tmp_path / 'second' / 'out'),
+            'second', ConsolePrinter(True), task_cache=str(tmp_path / 'cache-second'),
+            task_cache_url=server.get_url())
+        sched.submit("Produce", "produce", ProducingTask('A', runs))
+        sched.submit("Produce other", "produce-other", ProducingTask('B', runs))
+        sched.done()
+        assert runs == [ 'A', 'B' ]
+        assert sched.cache.remote.downloads == 1
+        with open(tmp_path / 'second' / 'out' / 'result.txt') as f:
+            assert f.read() in [ 'A', 'B' ]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_shared_tier_unreachable_is_a_miss(tmp_path):
+    runs = []
+    sched = BuildScheduler(2, str(tmp_path / 'build'), str(tmp_path / 'out'),
+        'offline', ConsolePrinter(True), task_cache=str(tmp_path / 'cache'),
+        task_cache_url='http://127.0.0.1:9/')
+    sched.submit("Produce", "produce", ProducingTask('A', runs))
+    sched.done()
+    assert runs == [ 'A' ]
+    assert sched.cache.remote.errors > 0
@@ -44,3 +44,28 @@ def test_format_command(expected, input):
 ])
 def test_format_command_pipe(expected, input):
     assert htest.utils.format_command_pipe(input) == expected
+
+def test_wait_for_event():
+    events = []
+    def wait_for_event(limit):
+        events.append(limit)
+    assert htest.utils.wait_for(lambda: len(events) == 3 and 'done', 10, wait_for_event=wait_for_event) == 'done'
+    assert len(events) == 3
+
+def test_wait_for_timeout_and_abort():
+    with pytest.raises(Exception) as e:
+        htest.utils.wait_for(lambda: False, 0.1, message='Nothing happened')
+    assert str(e.value) == 'Nothing happened'
+
+    with pytest.raises(Exception) as e:
+        htest.utils.wait_for(lambda: False, 10, message='Failed', abort=lambda: 'process exited')
+    assert str(e.value) == 'Failed (process exited)'
+
+def test_backoff():
+    backoff = htest.utils.Backoff(min_interval=0.01, max_interval=0.02, factor=2)
+    backoff.wait(1)
+    assert backoff.interval == 0.02
+    backoff.wait(1)
+    assert backoff.interval == 0.02
+    backoff.reset()
+    assert backoff.interval == 0.01
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import socket
+import threading
+
+import pytest
+
+from htest.vt100 import VT100Screen
+from htest.vm.controller import VMController
+from htest.vm.serial import SerialConsole
+
+def test_scrolling_and_wrapping():
+    term = VT100Screen(cols=10, rows=3)
+    term.feed(b'line 1\r\nline 2\r\n0123456789abc\r\n')
+    assert term.scrollback == [ 'line 1', 'line 2' ]
+    assert term.get_screen() == [ '0123456789', 'abc', '' ]
+    assert term.get_history() == [ 'line 1', 'line 2', '0123456789', 'abc' ]
+
+def test_line_editing():
+    term = VT100Screen(cols=20, rows=5)
+    term.feed(b'\x1b[1;32m/ # \x1b[0mls -x\x08\x08\x1b[K-l\r\n')
+    term.feed(b'progress 10%\rprogress 99%\r\n')
+    # UTF-8 sequence split between two reads
+    term.feed(b'\xc5')
+    term.feed(b'\xbelu\xc5\xa5ou\xc4\x8dk\xc3\xbd\r\n')
+    assert term.get_history() == [ '/ # ls -l', 'progress 99%', 'žluťoučký' ]
+
+def test_clear_screen_keeps_history():
+    term = VT100Screen(cols=20, rows=5)
+    term.feed(b'first\r\nsecond\r\n\x1b[2J\x1b[Hthird\x1b[3;5Hx')
+    assert term.get_screen() == [ 'third', '', '    x', '', '' ]
+    assert term.get_history() == [ 'first', 'second', 'third', '', '    x' ]
+
+class StreamVMController(VMController):
+    def __init__(self, console):
+        VMController.__init__(self, 'test')
+        self.console = console
+
+    def capture_vterm(self):
+        self.update_vterm_from_history(self.console.get_history())
+
+    def get_vterm_event_waiter(self, max_interval):
+        return self.console.poll
+
+    def get_abort_reason(self):
+        return 'closed' if self.console.closed else None
+
+def test_serial_console():
+    guest, host = socket.socketpair()
+    console = SerialConsole(host)
+    machine = StreamVMController(console)
+
+    guest.sendall(b'Welcome\r\n/ # ')
+    machine.capture_vterm()
+    assert machine.full_vterm == [ 'Welcome', '/ #' ]
+
+    # Typed text goes to the guest
+    console.write('ls\r')
+    assert guest.recv(10) == b'ls\r'
+
+    machine.vterm = []
+    threading.Timer(0.1, lambda: guest.sendall(b'ls\r\napp\r\n/ # ')).start()
+    def command_finished():
+        machine.capture_vterm()
+        return 'app' in machine.vterm
+    machine.wait_for_vterm(command_finished, 5, 'test', 'No output')
+    # The last line is always reported again
+    assert machine.vterm == [ '/ # ls', 'app', '/ #' ]
+    assert machine.full_vterm == [ 'Welcome', '/ # ls', 'app', '/ #' ]
+
+    guest.close()
+    with pytest.raises(Exception) as e:
+        machine.wait_for_vterm(lambda: False, 5, 'test', 'No output')
+    assert str(e.value) == 'No output (closed)'
+    console.close()
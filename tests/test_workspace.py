@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+#
+# Copyright (c) 2026 HelenOS CI contributors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# - Redistributions of source code must retain the above copyright
+#   notice, this list of conditions and the following disclaimer.
+# - Redistributions in binary form must reproduce the above copyright
+#   notice, this list of conditions and the following disclaimer in the
+#   documentation and/or other materials provided with the distribution.
+# - The name of the author may not be used to endorse or promote products
+#   derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import os
+import shutil
+import subprocess
+
+from hbuild.workspace import create_workspace, update_tree
+from hbuild.builders.helenos import make_source_view
+
+def make_source(tmp_path):
+    src = tmp_path / 'src'
+    os.makedirs(src / 'kernel')
+    with open(src / 'kernel' / 'main.c', 'w') as f:
+        f.write('int main(void) { return 0; }\n')
+    with open(src / 'README', 'w') as f:
+        f.write('HelenOS\n')
+    return src
+
+def test_hardlink_fallback(tmp_path, make_controller):
+    src = make_source(tmp_path)
+    ctl = make_controller()
+    info = create_workspace(ctl, str(src), str(tmp_path / 'dest'), [ 'worktree', 'hardlink' ])
+    assert info['method'] == 'hardlink'
+    assert info['saved'] == info['size']
+    dest_file = tmp_path / 'dest' / 'kernel' / 'main.c'
+    assert os.stat(dest_file).st_ino == os.stat(src / 'kernel' / 'main.c').st_ino
+
+
+    # Changed files are replaced, the source tree stays untouched
+    changed = make_source(tmp_path / 'changed')
+    with open(changed / 'kernel' / 'main.c', 'a') as f:
+        f.write('/* modified */\n')
+    assert update_tree(str(changed), str(tmp_path / 'dest')) == 1
+    with open(dest_file) as f:
+        assert 'modified' in f.read()
+    with open(src / 'kernel' / 'main.c') as f:
+        assert not 'modified' in f.read()
+
+def test_git_worktree(tmp_path, make_controller):
+    src = make_source(tmp_path)
+    git = [ 'git', '-c', 'user.name=test', '-c', 'user.email=test@localhost' ]
+    subprocess.run(git + [ 'init', '-q' ], cwd=src, check=True)
+    subprocess.run(git + [ 'add', '.' ], cwd=src, check=True)
+    subprocess.run(git + [ 'commit', '-q', '-m', 'Initial' ], cwd=src, check=True)
+
+    ctl = make_controller()
+    info = create_workspace(ctl, str(src), str(tmp_path / 'dest'), [ 'worktree' ])
+    assert info['method'] == 'worktree'
+    with open(tmp_path / 'dest' / 'README') as f:
+        assert f.read() == 'HelenOS\n'
+
+def test_source_view(tmp_path):
+    src = make_source(tmp_path)
+    os.makedirs(src / 'build')
+    view = tmp_path / 'view'
+    os.makedirs(view / 'kernel')
+    make_source_view(str(src), str(view))
+    assert sorted(os.listdir(view)) == [ 'README', 'kernel' ]
+    assert os.readlink(view / 'kernel') == str(src / 'kernel')
+
+def test_update_tree_keeps_unchanged_files(tmp_path, make_controller):
+    src = make_source(tmp_path)
+    dest = tmp_path / 'dest'
+    create_workspace(make_controller(), str(src), str(dest), [ 'hardlink' ])
+    os.makedirs(dest / 'build')
+    with open(dest / 'build' / 'build.ninja', 'w') as f:
+        f.write('')
+    old_time = 1000000000
+    os.utime(dest / 'README', ( old_time, old_time ))
+
+    # New checkout: same README (but new timestamp), changed main.c
+    shutil.rmtree(src)
+    src = make_source(tmp_path)
+    with open(src / 'kernel' / 'main.c', 'a') as f:
+        f.write('/* changed */\n')
+    with open(src / 'NEWS', 'w') as f:
+        f.write('new\n')
+    os.makedirs(dest / 'obsolete')
+
+    assert update_tree(str(src), str(dest), [ 'build' ]) == 3
+    assert os.stat(dest / 'README').st_mtime == old_time
+    with open(dest / 'kernel' / 'main.c') as f:
+        assert 'changed' in f.read()
+    assert os.path.exists(dest / 'NEWS')
+    assert not os.path.exists(dest / 'obsolete')
+    assert os.path.exists(dest / 'build' / 'build.ninja')
+    assert update_tree(str(src), str(dest), [ 'build' ]) == 0
+
+def test_update_tree_skips_git_metadata(tmp_path):
+    src = make_source(tmp_path)
+    os.makedirs(src / '.git' / 'objects')
+    with open(src / '.git' / 'HEAD', 'w') as f:
+        f.write('ref: refs/heads/master\n')
+    dest = tmp_path / 'dest'
+    os.makedirs(dest / '.git')
+    with open(dest / '.git' / 'HEAD', 'w') as f:
+        f.write('0123456789abcdef\n')
+
+    assert update_tree(str(src), str(dest)) == 2
+    with open(dest / '.git' / 'HEAD') as f:
+        assert f.read() == '0123456789abcdef\n'
+    assert not os.path.exists(dest / '.git' / 'objects')